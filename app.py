@@ -1,9 +1,12 @@
 from io import BytesIO
-from flask import Flask, jsonify, request, render_template, Response, send_file, session, redirect, url_for
+from flask import Flask, jsonify, request, render_template, Response, send_file, session, redirect, url_for, g
+from flask.json.provider import DefaultJSONProvider
 from functools import wraps
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, date, timezone
+import hashlib
+import hmac
 
 from logic_handler import (
     generate_all_clients_pdf,
@@ -11,7 +14,11 @@ from logic_handler import (
     generate_master_pdf_report,
     get_all_clients_data,
     get_client_details,
-    get_dashboard_counts,
+    get_dashboard_counts, get_dashboard_counter_status, reconcile_dashboard_counters,
+    start_dashboard_reconciler,
+    stream_all_records, stream_roster_pdf, parse_bulk_rows, bulk_import,
+    get_invoices_for_batch, stream_invoice_batch_pdf, stream_invoice_batch_zip, INVOICE_BATCH_LIMIT,
+    get_ar_aging, generate_ar_aging_pdf, reconcile_all_invoices,
     # Clients
     add_new_client, get_all_clients, delete_client,
     # Projects
@@ -35,14 +42,67 @@ from logic_handler import (
     get_all_materials, add_new_material, delete_material, get_material_details,
     generate_material_pdf, get_all_materials_data, generate_all_materials_pdf,
     # Login
-    verify_admin_credentials
+    verify_admin_credentials,
+    LIST_TABLES
 )
+from database_connector import get_pool_stats
+from query_metrics import query_metrics
+from request_tracing import REQUEST_TIMING, TracingMiddleware, current_trace, slow_requests, span
+from pdf_jobs import jobs, JobQueueFull
+from invoice_financials import json_value
+from pdf_cache import pdf_cache
+from pdf_assets import images
+from table_versions import table_versions
+from compression import compress_response
+from schema import migrate as migrate_schema
+import multiprocessing
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
 load_dotenv()
 app.secret_key = os.getenv("SECRET_KEY") or "your_super_secret_key"
 
+# Per-request timing: db, render, serialize, compress and send spans, reported
+# in a Server-Timing header and kept for the slowest requests of each route
+# (see /api/slowRequests). The header cannot include the send time, which is
+# only known once the response is out.
+class TracedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+if REQUEST_TIMING:
+    app.wsgi_app = TracingMiddleware(app.wsgi_app)
+    app.json = TracedJSONProvider(app)
+
+# after_request hooks run in reverse order of registration: this one runs last,
+# after compression
+@app.after_request
+def add_server_timing(response):
+    trace = current_trace()
+    if trace is not None:
+        trace.route = request.url_rule.rule if request.url_rule else None
+        response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+# Compress JSON and PDF responses (gzip, or brotli when installed). Registered
+# early so it sees each response with every other header already in place.
+@app.after_request
+def compress(response):
+    with span('compress'):
+        return compress_response(request, response)
+
+# Keep the materialized dashboard counters in line with the tables
+# (only in the serving process, not in PDF worker processes)
+if multiprocessing.parent_process() is None:
+    # Create missing tables and indexes (no-op once the schema is current)
+    if os.getenv("SCHEMA_MIGRATE_ON_STARTUP", "1") == "1":
+        migrate_schema()
+    start_dashboard_reconciler()
+
+# Decode the branding images once instead of on every invoice/receipt
+images.preload()
+
 # Login Required Decorator
 def login_required(f):
     @wraps(f)
@@ -52,6 +112,85 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# --- Conditional GETs ---
+# Tables each GET endpoint reads. Their responses carry an ETag and Last-Modified
+# derived from the table versions that the write paths bump, and a request that
+# still holds the current ones gets an empty 304 before the view runs, without
+# touching the database.
+CONDITIONAL_GET_TABLES = {
+    'get_counts_api': ('clients', 'projects', 'employees', 'invoices'),
+    'get_clients_api': ('clients',),
+    'download_client': ('clients',),
+    'download_all_clients': ('clients',),
+    'get_projects_api': ('projects',),
+    'download_project': ('projects',),
+    'download_all_projects': ('projects',),
+    'get_employees_api': ('employees',),
+    'download_employee': ('employees', 'projects'),
+    'download_all_employees': ('employees',),
+    'get_suppliers_api': ('suppliers',),
+    'download_supplier': ('suppliers',),
+    'download_all_suppliers': ('suppliers',),
+    'get_invoices_api': ('invoices',),
+    'get_invoice_api': ('invoices', 'clients'),
+    'download_invoice': ('invoices', 'clients'),
+    'download_invoices_batch': ('invoices', 'clients'),
+    'ar_aging_api': ('invoices', 'payments', 'clients'),
+    'download_ar_aging': ('invoices', 'payments', 'clients'),
+    'get_payments_api': ('payments',),
+    'download_payment': ('payments',),
+    'get_services_api': ('services',),
+    'get_materials_api': ('materials',),
+    'download_material': ('materials',),
+    'download_all_materials': ('materials',),
+    'download_master_report': ('projects', 'clients', 'employees'),
+}
+# Endpoints whose output also depends on today's date
+DATED_ENDPOINTS = {'ar_aging_api', 'download_ar_aging', 'download_payment'}
+
+@app.before_request
+def answer_conditional_get():
+    tables = CONDITIONAL_GET_TABLES.get(request.endpoint)
+    if request.method != 'GET' or tables is None:
+        return None
+
+    token, last_modified = table_versions.current(tables)
+    parts = [request.endpoint, request.full_path, token]
+    if request.endpoint in DATED_ENDPOINTS:
+        parts.append(date.today().isoformat())
+        last_modified = None
+    etag = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+    # Only whole seconds are sent, so a write later in the current second would
+    # not show as newer; leave Last-Modified out until that second has passed.
+    if last_modified and last_modified >= datetime.now(timezone.utc).replace(microsecond=0):
+        last_modified = None
+    g.validators = (etag, last_modified)
+
+    # The login check has to run first, so anonymous requests always reach the view
+    if not session.get('logged_in'):
+        return None
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        not_modified = bool(last_modified and request.if_modified_since
+                            and last_modified <= request.if_modified_since)
+    if not_modified:
+        return Response(status=304)
+    return None
+
+@app.after_request
+def add_validators(response):
+    validators = g.pop('validators', None)
+    if validators and response.status_code in (200, 304):
+        etag, last_modified = validators
+        # Weak: the same version may be sent with different content encodings
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        # The browser may keep the copy but has to revalidate it on every use
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # --- HTML Page Routes ---
 @app.route('/')
 @app.route('/index.html')
@@ -108,6 +247,28 @@ def serve_about():
     return render_template('about.html')
 
 # --- API Endpoints ---
+def list_args(table):
+    """
+    Reads keyset pagination parameters from the query string:
+    ?limit=50&cursor=<next_cursor>&sort=-invoice_date&<column>=<value>
+    Parameters naming one of the table's filter columns (see LIST_TABLES) are
+    exact-match filters; any other parameter, such as a cache-buster, is ignored.
+    """
+    args = request.args
+    filters = {column: args[column] for column in LIST_TABLES[table]['filters'] if column in args}
+    return {
+        'limit': args.get('limit'),
+        'page_cursor': args.get('cursor'),
+        'sort': args.get('sort'),
+        'filters': filters or None,
+    }
+
+def list_response(result):
+    """JSON response for a list endpoint; invalid paging, sort or filter arguments get a 400."""
+    if result.pop('invalid', False):
+        return jsonify(result), 400
+    return jsonify(result)
+
 # Login
 @app.route('/api/login', methods=['POST'])
 def login():
@@ -133,12 +294,123 @@ def get_counts_api():
     counts = get_dashboard_counts()
     return jsonify(counts)
 
+@app.route('/api/counts/status', methods=['GET'])
+@login_required
+def get_counts_status_api():
+    return jsonify(get_dashboard_counter_status())
+
+@app.route('/api/counts/reconcile', methods=['POST'])
+@login_required
+def reconcile_counts_api():
+    drift = reconcile_dashboard_counters()
+    return jsonify({"success": True, "drift": {key: list(pair) for key, pair in drift.items()}})
+
+def stream_records_response(table):
+    """
+    Streams a whole table for ?stream=json (a chunked {"<table>": [...]} document,
+    same shape as the regular response) or ?stream=ndjson (one JSON object per line).
+    Rows are read from the database in batches while the response is being sent.
+    """
+    fmt = request.args.get('stream')
+    if fmt not in ('json', 'ndjson'):
+        return jsonify({"success": False, "message": "stream must be 'json' or 'ndjson'"}), 400
+
+    rows, message = stream_all_records(table)
+    if rows is None:
+        return jsonify({"success": False, "message": message}), 500
+
+    dumps = app.json.dumps
+    if fmt == 'ndjson':
+        def generate():
+            for row in rows:
+                yield dumps(row) + "\n"
+        mimetype = 'application/x-ndjson'
+    else:
+        def generate():
+            yield '{"%s": [' % table
+            separator = ''
+            for row in rows:
+                yield separator + dumps(row)
+                separator = ','
+            yield ']}'
+        mimetype = 'application/json'
+
+    response = Response(generate(), mimetype=mimetype)
+    # Closing the response releases the connection even if the client disconnects early
+    response.call_on_close(rows.close)
+    return response
+
+def stream_roster_pdf_response(table, filename):
+    """
+    Sends a roster PDF for ?stream=1, writing each page to the client as soon as it
+    is rendered instead of building the whole document in memory first.
+    """
+    chunks, message = stream_roster_pdf(table)
+    if chunks is None:
+        return jsonify({"success": False, "message": message}), 404
+
+    response = Response(chunks, mimetype='application/pdf')
+    response.headers.set("Content-Disposition", "attachment", filename=filename)
+    return response
+
+# Database pool metrics
+@app.route('/api/dbPoolStats', methods=['GET'])
+@login_required
+def get_db_pool_stats_api():
+    return jsonify(get_pool_stats())
+
+# Slowest recent requests per route, with their timing breakdown (this process only)
+@app.route('/api/slowRequests', methods=['GET'])
+@login_required
+def get_slow_requests_api():
+    return jsonify(slow_requests.slowest(request.args.get('route')))
+
+# Query metrics in Prometheus text format. A scraper cannot log in, so it sends
+# "Authorization: Bearer <METRICS_TOKEN>" instead; without a token set, only a
+# logged-in session can read them. Figures are per process.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    authorized = session.get('logged_in') or (
+        METRICS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}")
+    )
+    if not authorized:
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(query_metrics.render(get_pool_stats()), mimetype='text/plain; version=0.0.4')
+
+# Bulk import
+@app.route('/api/bulkImport/<entity>', methods=['POST'])
+@login_required
+def handle_bulk_import(entity):
+    """
+    Imports a batch of clients, projects, employees, materials or invoices.
+    Send JSON (a list of objects or {"rows": [...]}), a text/csv body, or a
+    multipart upload with the CSV/JSON file in the 'file' field.
+    """
+    upload = request.files.get('file')
+    if upload:
+        content_type = 'text/csv' if upload.filename.lower().endswith('.csv') else upload.mimetype
+        rows, message = parse_bulk_rows(upload.read(), content_type)
+    else:
+        rows, message = parse_bulk_rows(request.get_data(), request.content_type)
+    if rows is None:
+        return jsonify({"success": False, "message": message}), 400
+
+    result = bulk_import(entity, rows)
+    if result['success']:
+        return jsonify(result), 201
+    if result['inserted']:
+        return jsonify(result), 207
+    return jsonify(result), 400
+
 # Clients
 @app.route('/api/clients', methods=['GET'])
 @login_required
 def get_clients_api():
-    clients = get_all_clients()
-    return jsonify(clients)
+    if request.args.get('stream'):
+        return stream_records_response('clients')
+    return list_response(get_all_clients(**list_args('clients')))
 
 @app.route('/api/addClient', methods=['POST'])
 @login_required
@@ -167,8 +439,9 @@ def delete_client_api(client_id):
 @app.route('/api/projects', methods=['GET'])
 @login_required
 def get_projects_api():
-    projects = get_all_projects()
-    return jsonify(projects)
+    if request.args.get('stream'):
+        return stream_records_response('projects')
+    return list_response(get_all_projects(**list_args('projects')))
 
 @app.route('/api/addProject', methods=['POST'])
 @login_required
@@ -208,6 +481,8 @@ def download_project(project_id):
 @app.route('/api/downloadAllProjects', methods=['GET'])
 @login_required
 def download_all_projects():
+    if request.args.get('stream'):
+        return stream_roster_pdf_response('projects', "all_projects_report.pdf")
     projects_data, message = get_all_projects_data()
     if projects_data:
         pdf_content = generate_all_projects_pdf(projects_data)
@@ -224,8 +499,9 @@ def download_all_projects():
 @app.route('/api/employees', methods=['GET'])
 @login_required
 def get_employees_api():
-    employees = get_all_employees()
-    return jsonify(employees)
+    if request.args.get('stream'):
+        return stream_records_response('employees')
+    return list_response(get_all_employees(**list_args('employees')))
 
 @app.route('/api/addEmployee', methods=['POST'])
 @login_required
@@ -267,6 +543,8 @@ def download_employee(employee_id):
 @app.route('/api/downloadAllEmployees', methods=['GET'])
 @login_required
 def download_all_employees():
+    if request.args.get('stream'):
+        return stream_roster_pdf_response('employees', f"Employee_Roster_{datetime.now().strftime('%Y%m%d')}.pdf")
     employees_data, message = get_all_employees_data()
     if employees_data:
         pdf_content = generate_all_employees_pdf(employees_data)
@@ -281,8 +559,9 @@ def download_all_employees():
 @app.route('/api/suppliers', methods=['GET'])
 @login_required
 def get_suppliers_api():
-    suppliers = get_all_suppliers()
-    return jsonify(suppliers)
+    if request.args.get('stream'):
+        return stream_records_response('suppliers')
+    return list_response(get_all_suppliers(**list_args('suppliers')))
 
 @app.route('/api/addSupplier', methods=['POST'])
 @login_required
@@ -323,6 +602,8 @@ def download_supplier(supplier_id):
 @app.route('/api/downloadAllSuppliers', methods=['GET'])
 @login_required
 def download_all_suppliers():
+    if request.args.get('stream'):
+        return stream_roster_pdf_response('suppliers', "all_suppliers_data.pdf")
     suppliers_data, message = get_all_suppliers_data()
     if suppliers_data:
         pdf_content = generate_all_suppliers_pdf(suppliers_data)
@@ -337,8 +618,9 @@ def download_all_suppliers():
 @app.route('/api/invoices', methods=['GET'])
 @login_required
 def get_invoices_api():
-    invoices = get_all_invoices()
-    return jsonify(invoices)
+    if request.args.get('stream'):
+        return stream_records_response('invoices')
+    return list_response(get_all_invoices(**list_args('invoices')))
 
 @app.route('/api/generateInvoice', methods=['POST'])
 @login_required
@@ -376,12 +658,109 @@ def download_invoice(invoice_id):
         return jsonify({"success": False, "message": "Failed to generate PDF."}), 500
     return jsonify({"success": False, "message": message}), 404
 
+@app.route('/api/invoices/<invoice_id>', methods=['GET'])
+@login_required
+def get_invoice_api(invoice_id):
+    """One invoice with its client details and computed figures (ISO dates, amounts as decimal strings)."""
+    invoice_data, message = get_invoice_details(invoice_id)
+    if invoice_data:
+        return jsonify(json_value(invoice_data))
+    if invoice_data is None and message != "Success":
+        return jsonify({"success": False, "message": message}), 500
+    return jsonify({"success": False, "message": "Invoice not found."}), 404
+
+@app.route('/api/invoices/reconcile', methods=['POST'])
+@login_required
+def reconcile_invoices_api():
+    """Recomputes every invoice's amount_paid and status from the payments table."""
+    updated, message = reconcile_all_invoices()
+    if updated is None:
+        return jsonify({"success": False, "message": message}), 500
+    return jsonify({"success": True, "updated": updated})
+
+@app.route('/api/downloadInvoices', methods=['GET'])
+@login_required
+def download_invoices_batch():
+    """
+    Downloads many invoices at once. Filters: from/to (invoice date, YYYY-MM-DD,
+    inclusive), client_id and project_id. format=zip (default) returns one PDF per
+    invoice in a ZIP archive; format=pdf returns a single bookmarked PDF.
+    """
+    fmt = request.args.get('format', 'zip')
+    if fmt not in ('zip', 'pdf'):
+        return jsonify({"success": False, "message": "format must be 'zip' or 'pdf'"}), 400
+
+    start_date, end_date = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (start_date, end_date):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"success": False, "message": "from/to must be dates in YYYY-MM-DD format"}), 400
+
+    invoices, message = get_invoices_for_batch(start_date, end_date,
+                                               request.args.get('client_id'), request.args.get('project_id'))
+    if invoices is None:
+        return jsonify({"success": False, "message": message}), 500
+    if not invoices:
+        return jsonify({"success": False, "message": "No invoices match the filters."}), 404
+    if len(invoices) > INVOICE_BATCH_LIMIT:
+        return jsonify({"success": False,
+                        "message": f"More than {INVOICE_BATCH_LIMIT} invoices match; narrow the date range or filters."}), 400
+
+    if fmt == 'pdf':
+        response = Response(stream_invoice_batch_pdf(invoices), mimetype='application/pdf')
+        filename = "invoices.pdf"
+    else:
+        response = Response(stream_invoice_batch_zip(invoices), mimetype='application/zip')
+        filename = "invoices.zip"
+    response.headers.set("Content-Disposition", "attachment", filename=filename)
+    return response
+
+def aging_args():
+    """Reads as_of (YYYY-MM-DD) and client_id; raises ValueError on a malformed date."""
+    as_of = request.args.get('as_of')
+    if as_of:
+        datetime.strptime(as_of, '%Y-%m-%d')
+    return as_of, request.args.get('client_id')
+
+@app.route('/api/arAging', methods=['GET'])
+@login_required
+def ar_aging_api():
+    """
+    Outstanding balances per client in Current / 1-30 / 31-60 / 61-90 / 90+ days
+    past due buckets. Optional: as_of (YYYY-MM-DD, default today), client_id.
+    """
+    try:
+        as_of, client_id = aging_args()
+    except ValueError:
+        return jsonify({"success": False, "message": "as_of must be a date in YYYY-MM-DD format"}), 400
+    report, message = get_ar_aging(as_of, client_id)
+    if report is None:
+        return jsonify({"success": False, "message": message}), 500
+    return jsonify(report)
+
+@app.route('/api/downloadArAging', methods=['GET'])
+@login_required
+def download_ar_aging():
+    try:
+        as_of, client_id = aging_args()
+    except ValueError:
+        return jsonify({"success": False, "message": "as_of must be a date in YYYY-MM-DD format"}), 400
+    report, message = get_ar_aging(as_of, client_id)
+    if report is None:
+        return jsonify({"success": False, "message": message}), 500
+    response = Response(generate_ar_aging_pdf(report), mimetype='application/pdf')
+    response.headers.set("Content-Disposition", "attachment", filename=f"AR_Aging_{report['as_of']}.pdf")
+    return response
+
 # Payments
 @app.route('/api/payments', methods=['GET'])
 @login_required
 def get_payments_api():
-    payments = get_all_payments()
-    return jsonify(payments)
+    if request.args.get('stream'):
+        return stream_records_response('payments')
+    return list_response(get_all_payments(**list_args('payments')))
 
 @app.route('/api/recordPayment', methods=['POST'])
 @login_required
@@ -453,8 +832,9 @@ def delete_service_api(service_id):
 @app.route('/api/materials', methods=['GET'])
 @login_required
 def get_materials_api():
-    materials = get_all_materials()
-    return jsonify(materials)
+    if request.args.get('stream'):
+        return stream_records_response('materials')
+    return list_response(get_all_materials(**list_args('materials')))
 
 @app.route('/api/addMaterial', methods=['POST'])
 @login_required
@@ -495,6 +875,8 @@ def download_material(material_id):
 @app.route('/api/downloadAllMaterials', methods=['GET'])
 @login_required
 def download_all_materials():
+    if request.args.get('stream'):
+        return stream_roster_pdf_response('materials', "all_materials_data.pdf")
     materials_data, message = get_all_materials_data()
     if materials_data:
         pdf_content = generate_all_materials_pdf(materials_data)
@@ -506,6 +888,62 @@ def download_all_materials():
     return jsonify({"success": False, "message": message}), 404
 
 
+@app.route('/api/pdfCacheStats', methods=['GET'])
+@login_required
+def get_pdf_cache_stats_api():
+    return jsonify(pdf_cache.stats())
+
+# Background PDF jobs
+@app.route('/api/jobs', methods=['POST'])
+@login_required
+def submit_pdf_job():
+    if not request.is_json:
+        return jsonify({"success": False, "message": "Request must be JSON"}), 400
+
+    data = request.get_json()
+    try:
+        job, message = jobs.submit(data.get('report'), data.get('id'))
+    except JobQueueFull as e:
+        response = jsonify({"success": False, "message": str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    if job is None:
+        return jsonify({"success": False, "message": message}), 400
+    return jsonify({
+        "success": True,
+        "message": message,
+        "job_id": job.id,
+        "status_url": url_for('get_pdf_job', job_id=job.id),
+        "download_url": url_for('download_pdf_job', job_id=job.id),
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_pdf_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_pdf_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "Job not found."}), 404
+    if job.status == 'failed':
+        return jsonify({"success": False, "message": job.error}), 500
+    if job.status != 'done':
+        return jsonify({"success": False, "message": f"Job is {job.status}."}), 409
+
+    content = jobs.result(job.id)
+    if content is None:
+        return jsonify({"success": False, "message": "Job result has expired."}), 404
+
+    response = Response(content, mimetype='application/pdf')
+    response.headers.set("Content-Disposition", "attachment", filename=job.filename)
+    return response
+
 @app.route('/living')
 def living():
     return render_template('living.html')
@@ -557,6 +995,8 @@ def download_client(client_id):
 # Route for downloading ALL clients' PDF
 @app.route('/api/downloadAllClients', methods=['GET'])
 def download_all_clients():
+    if request.args.get('stream'):
+        return stream_roster_pdf_response('clients', "client_roster_report.pdf")
     clients_data, message = get_all_clients_data()
     if clients_data:
         pdf_content = generate_all_clients_pdf(clients_data)
@@ -0,0 +1,470 @@
+"""
+Benchmarks for the CMS data paths: list queries, inserts, PDF generation, the
+dashboard counts and the master report, at several table sizes.
+
+Every run seeds its own data: N clients, projects, employees, invoices and
+project assignments, plus payments, suppliers, materials and services in
+proportion, built from the same kind of records as the add_existing_* seed
+data. Results are written as JSON so runs on different commits can be compared.
+
+    python benchmark.py                              embedded SQLite, 1k/10k/100k rows
+    python benchmark.py --sizes 1000 --repeat 5      one size, more repetitions
+    python benchmark.py --only pdf --output a.json   only benchmarks whose name contains "pdf"
+    python benchmark.py --backend mysql --mysql-database cms_bench
+
+The default SQLite backend (DB_BACKEND=sqlite, see sqlite_backend) needs no
+server; each size gets a fresh database file. The MySQL backend uses the DB_*
+settings with a separate, scratch database, whose tables are emptied.
+"""
+import argparse
+import gc
+import inspect
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import partial
+
+from sqlite_backend import SqliteConnection
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 3
+# Inserts timed per add_new_* function (bounded so the largest size stays quick)
+INSERTS_PER_SIZE = 0.02
+MIN_INSERTS = 50
+MAX_INSERTS = 500
+COUNTS_REQUESTS = 50
+SEED_BATCH = 5000
+
+
+# --- Seed data ---
+FIRST_NAMES = ('Bharat', 'Sushank', 'Rambhau', 'Pandurang', 'Rupchand', 'Ashok', 'Datta')
+LAST_NAMES = ('Gharat', 'Kirdak', 'Ingole')
+ROLES = ('Project Manager', 'Civil Engineer', 'Site Supervisor')
+CLIENT_TYPES = ('Government', 'Private', 'Corporate')
+PROJECT_STATUSES = ('Working', 'Pending', 'Completed')
+INVOICE_STATUSES = ('Paid', 'Partially Paid', 'Unpaid')
+PAYMENT_METHODS = ('Bank Transfer', 'Cheque', 'UPI')
+CITIES = ('Navi Mumbai', 'Panvel', 'Uran', 'Pune', 'Alibag')
+MATERIALS = ('Cement', 'Steel Bars', 'Sand', 'Aggregate', 'Bricks', 'Paint')
+SERVICES = ('Excavation', 'Road Work', 'Drainage', 'Plastering', 'Painting')
+
+
+def seed_rows(n, rng):
+    """Builds the rows for a database of `n` clients, projects, employees and invoices."""
+    today = date.today()
+    ref_count = max(10, n // 10)
+    rows = {}
+    rows['clients'] = [
+        (f"C_{i:03d}", f"{rng.choice(LAST_NAMES)} Constructions {i}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+         f"98{i:08d}"[-10:], f"client{i}@example.com", f"Plot {i}, {rng.choice(CITIES)}", rng.choice(CLIENT_TYPES))
+        for i in range(1, n + 1)
+    ]
+    rows['projects'] = []
+    for i in range(1, n + 1):
+        start = today - timedelta(days=rng.randint(30, 1500))
+        budget = Decimal(rng.randint(100, 5000) * 1000)
+        rows['projects'].append((
+            f"P_{i:03d}", f"C_{rng.randint(1, n):03d}", f"{rng.choice(CITIES)} site {i}", rng.choice(CITIES),
+            start, start + timedelta(days=rng.randint(90, 720)), rng.choice(PROJECT_STATUSES),
+            budget, budget * Decimal('0.8'), budget * Decimal('1.1'), "Road and drainage work"
+        ))
+    rows['employees'] = [
+        (f"E_{i:03d}", rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(ROLES), f"98{i:08d}"[-10:],
+         f"employee{i}@omenter.com", today - timedelta(days=rng.randint(30, 3000)), Decimal(rng.randint(25, 90) * 1000), 'Active')
+        for i in range(1, n + 1)
+    ]
+    rows['project_assignments'] = [
+        (f"P_{rng.randint(1, n):03d}", f"E_{i:03d}", rng.choice(ROLES), today - timedelta(days=rng.randint(0, 600)), None)
+        for i in range(1, n + 1)
+    ]
+    rows['invoices'] = []
+    rows['payments'] = []
+    for i in range(1, n + 1):
+        invoice_id = str(1000 + i)
+        issued = today - timedelta(days=rng.randint(0, 400))
+        amount = Decimal(rng.randint(10, 500) * 1000)
+        status = rng.choice(INVOICE_STATUSES)
+        paid = amount if status == 'Paid' else (amount / 2 if status == 'Partially Paid' else Decimal(0))
+        project = rng.randint(1, n)
+        rows['invoices'].append((invoice_id, f"P_{project:03d}", f"C_{rng.randint(1, n):03d}", issued,
+                                 issued + timedelta(days=30), amount, paid, status))
+        if paid:
+            rows['payments'].append((f"PY_{len(rows['payments']) + 1:03d}", invoice_id,
+                                     datetime.combine(issued + timedelta(days=rng.randint(1, 40)), datetime.min.time()),
+                                     paid, rng.choice(PAYMENT_METHODS), f"TRN{i:09d}"))
+    rows['suppliers'] = [
+        (f"S_{i:03d}", f"{rng.choice(MATERIALS)} Traders {i}", f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+         f"97{i:08d}"[-10:], f"supplier{i}@example.com", rng.choice(CITIES), rng.choice(MATERIALS))
+        for i in range(1, ref_count + 1)
+    ]
+    rows['materials'] = [
+        (f"M_{i:03d}", rng.choice(MATERIALS), f"S_{rng.randint(1, ref_count):03d}", f"{rng.choice(LAST_NAMES)} Industries",
+         Decimal(rng.randint(50, 5000)), rng.choice(('Bag', 'Ton', 'Piece')), Decimal(rng.randint(0, 1000)), "Bulk supply")
+        for i in range(1, ref_count + 1)
+    ]
+    rows['services'] = [
+        (f"SV_{i:03d}", f"{rng.choice(SERVICES)} {i}", Decimal(rng.randint(1, 100) * 100))
+        for i in range(1, min(ref_count, 200) + 1)
+    ]
+    return rows
+
+
+SEED_COLUMNS = {
+    'clients': "client_id, client_name, contact_person, phone, email, address, client_type",
+    'projects': "project_id, client_id, project_name, project_location, start_date, end_date, status, budget, actual_cost, contract_value, description",
+    'employees': "employee_id, first_name, last_name, role, contact_phone, email, hire_date, salary, status",
+    'project_assignments': "project_id, employee_id, assignment_role, assignment_start_date, assignment_end_date",
+    'invoices': "invoice_id, project_id, client_id, invoice_date, due_date, amount_due, amount_paid, status",
+    'payments': "payment_id, invoice_id, payment_date, amount, payment_method, transaction_id",
+    'suppliers': "supplier_id, supplier_name, contact_person, phone, email, address, supplier_type",
+    'materials': "material_id, material_name, supplier_id, manufacturer, unit_price, unit_of_measure, stock_quantity, description",
+    'services': "service_id, service_name, unit_price",
+}
+
+
+def seed(conn, n, rng):
+    """Inserts the seed rows in batches. Returns the number of rows inserted."""
+    cursor = conn.cursor()
+    total = 0
+    try:
+        for table, rows in seed_rows(n, rng).items():
+            columns = SEED_COLUMNS[table]
+            placeholders = ', '.join(['%s'] * len(columns.split(',')))
+            sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
+            for start in range(0, len(rows), SEED_BATCH):
+                cursor.executemany(sql, rows[start:start + SEED_BATCH])
+            total += len(rows)
+        conn.commit()
+    finally:
+        cursor.close()
+    return total
+
+
+# --- Measurement ---
+def _row_count(result):
+    """Rows in a logic_handler result: a list, a (list, message) pair or a {'name': list} dict."""
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        for value in result.values():
+            if isinstance(value, list):
+                return len(value)
+    return None
+
+
+def measure(func, repeat, memory=True, rows=None):
+    """
+    Calls func() `repeat` times and returns its timings (seconds), plus the
+    peak traced allocation of one extra call when `memory` is set.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - started)
+    stats = {
+        'median_s': round(statistics.median(times), 6),
+        'min_s': round(min(times), 6),
+        'mean_s': round(statistics.fmean(times), 6),
+        'repeat': repeat,
+    }
+    rows = rows if rows is not None else _row_count(result)
+    if rows:
+        stats['rows'] = rows
+        stats['rows_per_s'] = round(rows / statistics.median(times), 1) if statistics.median(times) else None
+    if isinstance(result, (bytes, bytearray)):
+        stats['output_bytes'] = len(result)
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            stats['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return stats
+
+
+def measure_latency(func, count):
+    times = []
+    for _ in range(count):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return {
+        'requests': count,
+        'p50_ms': round(times[len(times) // 2] * 1000, 3),
+        'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 3),
+        'mean_ms': round(statistics.fmean(times) * 1000, 3),
+    }
+
+
+def measure_inserts(add, payloads):
+    started = time.perf_counter()
+    failures = 0
+    for payload in payloads:
+        ok, _ = add(payload)
+        failures += not ok
+    elapsed = time.perf_counter() - started
+    return {
+        'inserts': len(payloads),
+        'failures': failures,
+        'seconds': round(elapsed, 6),
+        'inserts_per_s': round(len(payloads) / elapsed, 1) if elapsed else None,
+    }
+
+
+# --- Suite ---
+def _insert_payloads(rng, count):
+    today = date.today().isoformat()
+    return {
+        'add_new_client': [{'client_name': f"Bench Client {i}", 'contact_person': rng.choice(FIRST_NAMES),
+                            'phone': '9800000000', 'email': 'bench@example.com', 'address': rng.choice(CITIES),
+                            'client_type': rng.choice(CLIENT_TYPES)} for i in range(count)],
+        'add_new_project': [{'client_id': 'C_001', 'project_name': f"Bench Project {i}", 'project_location': rng.choice(CITIES),
+                             'start_date': today, 'end_date': today, 'status': rng.choice(PROJECT_STATUSES),
+                             'budget': 100000, 'actual_cost': 0, 'contract_value': 120000,
+                             'description': 'Benchmark'} for i in range(count)],
+        'add_new_employee': [{'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+                              'role': rng.choice(ROLES), 'contact_phone': '9800000000', 'email': 'bench@omenter.com',
+                              'hire_date': today, 'salary': 50000, 'status': 'Active'} for _ in range(count)],
+        'add_new_supplier': [{'supplier_name': f"Bench Supplier {i}", 'contact_person': rng.choice(FIRST_NAMES),
+                              'phone': '9700000000', 'email': 'bench@example.com', 'address': rng.choice(CITIES)}
+                             for i in range(count)],
+        # Materials and services take the ID from the caller
+        'add_new_material': [{'material_id': f"MB_{i:03d}", 'material_name': rng.choice(MATERIALS), 'supplier_id': 'S_001', 'manufacturer': 'Bench',
+                              'unit_price': 100, 'stock_quantity': 10} for i in range(count)],
+        'add_new_service': [{'service_id': f"SVB_{i:03d}", 'service_name': f"Bench Service {i}", 'unit_price': 500} for i in range(count)],
+    }
+
+
+def run_suite(n, repeat, memory, selected, rng):
+    """Runs every selected benchmark against the database seeded with `n` rows."""
+    import logic_handler as lh
+    from app import app
+    from reference_cache import reference_cache
+
+    results = {}
+
+    def run(name, benchmark, **kwargs):
+        if not selected(name):
+            return
+        print(f"  {name} ...", flush=True)
+        try:
+            results[name] = benchmark(**kwargs)
+        except Exception as e:
+            results[name] = {'error': f"{type(e).__name__}: {e}"}
+
+    def uncached(table, loader):
+        reference_cache.invalidate(table)
+        return loader()
+
+    # List queries, unpaged and first page
+    for table in ('clients', 'projects', 'employees', 'invoices', 'payments', 'suppliers', 'materials', 'services'):
+        list_all = getattr(lh, f"get_all_{table}")
+        if table in lh.REFERENCE_LOADERS:
+            run(f"get_all_{table}", measure, func=partial(uncached, table, list_all), repeat=repeat, memory=memory)
+        else:
+            run(f"get_all_{table}", measure, func=list_all, repeat=repeat, memory=memory)
+        if table != 'services':
+            run(f"get_all_{table}[page]", measure, func=partial(list_all, limit=50), repeat=repeat, memory=False)
+
+    # Single-record PDFs, rendered without the PDF cache
+    samples = {
+        'client': (lh.get_client_details, 'C_001'),
+        'project': (lh.get_project_details, 'P_001'),
+        'employee': (lh.get_employee_details, 'E_001'),
+        'supplier': (lh.get_supplier_details, 'S_001'),
+        'invoice': (lh.get_invoice_details, '1001'),
+        'payment': (lh.get_payment_details, 'PY_001'),
+        'material': (lh.get_material_details, 'M_001'),
+    }
+    for entity, (details, record_id) in samples.items():
+        render = inspect.unwrap(getattr(lh, f"generate_{entity}_pdf"))
+        data, _ = details(record_id)
+        run(f"generate_{entity}_pdf", measure, func=partial(render, data), repeat=repeat, memory=memory, rows=1)
+
+    # Whole-table PDFs
+    for table in ('clients', 'projects', 'employees', 'suppliers', 'materials'):
+        render = getattr(lh, f"generate_all_{table}_pdf")
+        data_loader = getattr(lh, f"get_all_{table}_data")
+
+        def render_all(render=render, data_loader=data_loader):
+            data = data_loader()
+            return render(data[0] if isinstance(data, tuple) else data)
+        run(f"generate_all_{table}_pdf", measure, func=render_all, repeat=repeat, memory=memory)
+    run("generate_ar_aging_pdf", measure, func=lambda: lh.generate_ar_aging_pdf(lh.get_ar_aging()[0]),
+        repeat=repeat, memory=memory)
+    run("generate_master_pdf_report", measure, func=lh.generate_master_pdf_report, repeat=repeat, memory=memory)
+
+    # Dashboard counts: the aggregate query, and /api/counts served from the counter store
+    run("compute_dashboard_counts", measure, func=lh.compute_dashboard_counts, repeat=repeat, memory=False)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    run("api_counts", measure_latency, func=lambda: client.get('/api/counts').close(), count=COUNTS_REQUESTS)
+
+    # Inserts last, so they do not change the data the other benchmarks see
+    count = min(MAX_INSERTS, max(MIN_INSERTS, int(n * INSERTS_PER_SIZE)))
+    for name, payloads in _insert_payloads(rng, count).items():
+        run(name, measure_inserts, add=getattr(lh, name), payloads=payloads)
+    return results
+
+
+# --- Backends ---
+def _tables():
+    from schema import CREATE_TABLES
+    return [re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", sql).group(1) for sql in CREATE_TABLES]
+
+
+def prepare_sqlite(directory, n):
+    """Creates a fresh SQLite database for size `n` and points the connection pool at it."""
+    from database_connector import init_pool
+    from schema import migrate
+
+    path = os.path.join(directory, f"cms_bench_{n}.db")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    init_pool(connect=partial(SqliteConnection, path), pre_ping=False)
+    applied, message = migrate()
+    if applied is None:
+        raise RuntimeError(message)
+    return SqliteConnection(path)
+
+
+def prepare_mysql(database):
+    """Points the pool at the scratch database, creates the schema and empties every table."""
+    import mysql.connector
+    import database_connector
+    from schema import migrate
+
+    settings = {k: v for k, v in database_connector.DB_CONFIG.items() if k != 'database'}
+    server = mysql.connector.connect(**settings)
+    try:
+        server.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+    finally:
+        server.close()
+    database_connector.DB_CONFIG['database'] = database
+    database_connector.init_pool()
+    applied, message = migrate()
+    if applied is None:
+        raise RuntimeError(message)
+
+    conn = database_connector.get_db_connection()
+    if conn is None:
+        raise RuntimeError("Database connection failed.")
+    cursor = conn.cursor()
+    for table in _tables():
+        cursor.execute(f"DELETE FROM {table}")
+    conn.commit()
+    cursor.close()
+    return conn
+
+
+def reset_process_state():
+    """Forgets what the previous size left in memory: ID blocks, counters, caches."""
+    import logic_handler as lh
+    from id_allocator import IdAllocator
+    from reference_cache import reference_cache
+    from table_versions import table_versions
+
+    lh.allocator = IdAllocator()
+    for table in lh.REFERENCE_LOADERS:
+        reference_cache.invalidate(table)
+    # The seed rows bypass the write paths, so no table version was bumped
+    table_versions.bump(*lh.COUNTED_TABLES)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CMS data paths and write the results as JSON.")
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--mysql-database', default='cms_bench', help="scratch database for --backend mysql (emptied)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="rows per main table")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed calls per benchmark")
+    parser.add_argument('--only', action='append', help="run benchmarks whose name contains this text (repeatable)")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced peak-memory runs")
+    parser.add_argument('--seed', type=int, default=42, help="random seed for the generated data")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="cms_bench_")
+    # The application reads these at import: keep the run's state out of the
+    # real caches, and no background jobs or slow-query EXPLAINs during timing.
+    os.environ.setdefault('TABLE_VERSIONS_DIR', os.path.join(work_dir, 'versions'))
+    os.environ.setdefault('PDF_CACHE_DIR', os.path.join(work_dir, 'pdf_cache'))
+    os.environ['SCHEMA_MIGRATE_ON_STARTUP'] = '0'
+    os.environ['DASHBOARD_RECONCILE_INTERVAL'] = '0'
+    os.environ['SLOW_QUERY_SECONDS'] = '0'
+    os.environ['DB_BACKEND'] = args.backend
+
+    if args.backend == 'mysql':
+        from database_connector import DB_CONFIG
+        if args.mysql_database == DB_CONFIG['database']:
+            print(f"Refusing to benchmark against '{args.mysql_database}', the application's database: its tables would be emptied.")
+            return 1
+
+    selected = (lambda name: any(part in name for part in args.only)) if args.only else (lambda name: True)
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'backend': args.backend,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'sizes': {},
+    }
+
+    for n in args.sizes:
+        print(f"Size {n}: seeding ...", flush=True)
+        rng = random.Random(args.seed)
+        conn = prepare_mysql(args.mysql_database) if args.backend == 'mysql' else prepare_sqlite(work_dir, n)
+        started = time.perf_counter()
+        rows = seed(conn, n, rng)
+        seed_seconds = time.perf_counter() - started
+        conn.close()
+        reset_process_state()
+
+        report['sizes'][str(n)] = {
+            'seed': {'rows': rows, 'seconds': round(seed_seconds, 3), 'rows_per_s': round(rows / seed_seconds, 1)},
+            'benchmarks': run_suite(n, args.repeat, not args.no_memory, selected, rng),
+        }
+
+    output = json.dumps(report, indent=2, sort_keys=True, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f"Results written to {args.output}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
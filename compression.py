@@ -0,0 +1,133 @@
+import os
+import zlib
+
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+load_dotenv()
+
+# Bodies smaller than this are sent as they are: the saving would not pay for the work
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+# A streamed body is flushed to the client after about this many input bytes.
+# Flushing every small chunk (e.g. each NDJSON row) would ruin the compression.
+COMPRESS_FLUSH_BYTES = int(os.getenv("COMPRESS_FLUSH_BYTES", str(16 * 1024)))
+# PDFs are included: FPDF compresses page content but not the fonts, cross-reference
+# table and object dictionaries, which still shrink noticeably.
+COMPRESS_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/pdf',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+}
+
+
+class _GzipStream:
+    def __init__(self):
+        # wbits 31 writes a gzip header and trailer around the deflate data
+        self._compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _choose_encoding(accept_encodings):
+    """Picks br or gzip from the request's Accept-Encoding, or None."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _new_stream(encoding):
+    return _BrotliStream() if encoding == 'br' else _GzipStream()
+
+
+def _compress_chunks(chunks, encoding):
+    """
+    Compresses a streamed body as it is produced, flushing every
+    COMPRESS_FLUSH_BYTES of input so the client can decode what has arrived so far.
+    """
+    stream = _new_stream(encoding)
+    pending = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if not chunk:
+            continue
+        data = stream.compress(chunk)
+        pending += len(chunk)
+        if pending >= COMPRESS_FLUSH_BYTES:
+            data += stream.flush()
+            pending = 0
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def compress_response(request, response):
+    """
+    Compresses a response with brotli (when installed and accepted) or gzip.
+    Buffered bodies below COMPRESS_MIN_SIZE are left alone; streamed bodies are
+    compressed as they are produced.
+    """
+    if response.mimetype not in COMPRESS_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200 or request.method == 'HEAD'
+            or 'Content-Encoding' in response.headers):
+        return response
+    encoding = _choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        length = response.content_length
+        if length is not None and length < COMPRESS_MIN_SIZE:
+            return response
+        chunks = response.response
+        if hasattr(chunks, 'close'):
+            # The original body still has to be closed (it may hold a database cursor)
+            response.call_on_close(chunks.close)
+        response.direct_passthrough = False
+        response.response = _compress_chunks(chunks, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        stream = _new_stream(encoding)
+        response.set_data(stream.compress(data) + stream.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    return response
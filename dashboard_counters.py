@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Optional JSON file the counters are persisted to, so a restarted worker can
+# serve the dashboard without recomputing while the tables are unchanged.
+COUNTERS_FILE = os.getenv("DASHBOARD_COUNTERS_FILE")
+# Seconds between reconciliations against the real tables (0 disables the job)
+RECONCILE_INTERVAL = float(os.getenv("DASHBOARD_RECONCILE_INTERVAL", "300"))
+
+# Tables the dashboard is computed from; their versions (see table_versions)
+# decide whether the stored values are still current
+COUNTED_TABLES = ('clients', 'projects', 'employees', 'invoices')
+
+NAME_SEPARATOR = '; '
+EMPTY_NAMES = 'None'
+
+
+class CounterStore:
+    """
+    Version-invalidated cache of the dashboard values, in the same shape that
+    /api/counts returns, together with the version token of the counted tables
+    they were computed at. Writes do not update the values in place; they only
+    retire them, and the next read recomputes them from the tables.
+
+    Values are only served while that token is still the current one. Every
+    write through the application bumps the table versions, which are shared
+    by all worker processes, so a write in any worker makes every worker
+    recompute on its next read. The periodic reconciliation catches changes
+    made outside the application, which do not bump a version.
+    """
+
+    def __init__(self, persist_path=None):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._version = None
+        self.persist_path = persist_path
+        self.last_reconciled = None
+        self.last_drift = {}
+        if persist_path:
+            self._load_file()
+
+    def get(self, version):
+        """Returns a copy of the values if they were computed at `version`, else None."""
+        with self._lock:
+            if self._version is None or self._version != version:
+                return None
+            return dict(self._values)
+
+    def replace(self, values, version, reconciled=False):
+        """
+        Stores values computed at `version`, which must have been read before
+        the values were queried: a write committing meanwhile then leaves the
+        stored token behind the current one instead of hiding the write.
+
+        When reconciling, returns the keys that differed from the values stored
+        for the same version as {key: (stored, actual)}.
+        """
+        with self._lock:
+            drift = {}
+            if reconciled and self._version == version:
+                for key, actual in values.items():
+                    stored = self._values.get(key)
+                    if not _same_value(key, stored, actual):
+                        drift[key] = (stored, actual)
+            self._values = dict(values)
+            self._version = version
+            if reconciled:
+                self.last_reconciled = datetime.now().isoformat(timespec='seconds')
+                self.last_drift = drift
+            self._save_file()
+            return drift
+
+    def status(self, version=None):
+        with self._lock:
+            return {
+                'current': self._version is not None and self._version == version,
+                'last_reconciled': self.last_reconciled,
+                'last_drift': {key: list(pair) for key, pair in self.last_drift.items()},
+            }
+
+    # --- Persistence ---
+    def _load_file(self):
+        try:
+            with open(self.persist_path, 'r') as f:
+                state = json.load(f)
+            # The values are used only while their version is still current
+            self._values = state['values']
+            self._version = state['version']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading dashboard counters: {e}")
+
+    def _save_file(self):
+        if not self.persist_path:
+            return
+        # Unique temporary name: several workers may save at the same moment
+        tmp_path = f"{self.persist_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': self._version, 'values': self._values}, f)
+            os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            print(f"Error saving dashboard counters: {e}")
+
+
+def _split_names(value):
+    if not value or value == EMPTY_NAMES:
+        return []
+    return value.split(NAME_SEPARATOR)
+
+def _same_value(key, stored, actual):
+    # GROUP_CONCAT has no defined order, so name lists compare as multisets
+    if key.endswith('_names'):
+        return sorted(_split_names(stored)) == sorted(_split_names(actual))
+    return stored == actual
+
+
+counters = CounterStore(COUNTERS_FILE)
+
+
+def start_reconciler(reconcile, interval=RECONCILE_INTERVAL):
+    """
+    Runs reconcile() every `interval` seconds on a daemon thread.
+    Returns the thread, or None when the interval is 0.
+    """
+    if not interval:
+        return None
+
+    def run():
+        stop = threading.Event()
+        while not stop.wait(interval):
+            try:
+                reconcile()
+            except Exception as e:
+                print(f"Dashboard counter reconciliation failed: {e}")
+
+    thread = threading.Thread(target=run, name="dashboard-reconciler", daemon=True)
+    thread.start()
+    return thread
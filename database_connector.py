@@ -1,18 +1,53 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import errorcode
+from dotenv import load_dotenv
 
-def get_db_connection():
+from query_metrics import InstrumentedCursor, query_metrics
+from request_tracing import add_span
+from sqlite_backend import SqliteConnection
+
+load_dotenv()
+
+# Storage backend: "mysql" (default) or "sqlite", an embedded database file
+# for sites without a database server. logic_handler runs unchanged on either.
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "cms.db")
+
+# Errors raised by either backend, for `except DB_ERRORS as err:`
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+# Connection settings. The defaults match the original hard-coded values so an
+# existing install keeps working without a .env change.
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "onkar"),
+    "database": os.getenv("DB_NAME", "cms_db"),
+}
+
+# Pool settings
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))                 # connections kept open when idle
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))  # extra connections allowed under load
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))         # seconds to wait for a free connection
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") not in ("0", "false", "False")
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))          # max age (seconds) of a connection
+
+
+def _open_mysql_connection():
     """
-    Establishes and returns a connection object to the MySQL database.
-    This function does NOT return a cursor.
+    Opens a brand-new physical connection to the MySQL database.
+    Returns None if the connection could not be established.
     """
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="onkar",
-            database="cms_db"
-        )
+        conn = mysql.connector.connect(**DB_CONFIG)
         print("Database connection successful!")
         return conn
     except mysql.connector.Error as err:
@@ -22,4 +57,310 @@ def get_db_connection():
             print("Error: Database does not exist.")
         else:
             print(f"Error: {err}")
-        return None
\ No newline at end of file
+        return None
+
+
+def _open_sqlite_connection():
+    """
+    Opens a connection to the SQLite database file (created if missing).
+    Returns None if the file cannot be opened.
+    """
+    try:
+        return SqliteConnection(SQLITE_PATH)
+    except sqlite3.Error as err:
+        print(f"Error: {err}")
+        return None
+
+
+def open_connection():
+    """Opens a physical connection to the configured backend, or returns None."""
+    if DB_BACKEND == 'sqlite':
+        return _open_sqlite_connection()
+    return _open_mysql_connection()
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a physical connection checked out of the pool.
+    Behaves like the underlying connection, except that close() hands the
+    connection back to the pool instead of dropping it, and cursor() returns a
+    cursor whose statements are timed (see query_metrics).
+
+    A wrapper that is garbage collected without close() still returns its
+    connection, with a warning, so a missed close() cannot shrink the pool.
+    """
+
+    def __init__(self, pool, raw_conn, created_at):
+        self._pool = pool
+        self._raw = raw_conn
+        self._created_at = created_at
+        self._released = False
+        # Must not reference self, or the wrapper would never be collected
+        self._finalizer = weakref.finalize(self, pool._reclaim, raw_conn, created_at, time.monotonic())
+        self._finalizer.atexit = False
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._finalizer.detach()
+        self._pool._release(self._raw, self._created_at)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._raw.cursor(*args, **kwargs), query_metrics)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    A small thread-safe connection pool.
+
+    - pool_size:     connections kept open while idle
+    - max_overflow:  temporary connections allowed above pool_size under load
+    - timeout:       seconds a caller waits for a connection before giving up
+    - pre_ping:      check a connection is alive before handing it out
+    - recycle:       connections older than this (seconds) are reopened
+    """
+
+    def __init__(self, connect=open_connection, pool_size=POOL_SIZE,
+                 max_overflow=POOL_MAX_OVERFLOW, timeout=POOL_TIMEOUT,
+                 pre_ping=POOL_PRE_PING, recycle=POOL_RECYCLE):
+        self._connect = connect
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.recycle = recycle
+
+        self._idle = deque()          # (raw_conn, created_at)
+        self._open = 0                # physical connections currently open
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+        self._connects = 0
+        self._recycled = 0
+        self._invalidated = 0
+        self._reclaimed = 0
+
+    # --- Checkout / checkin ---
+    def acquire(self):
+        """
+        Returns a PooledConnection, or None if no connection could be obtained
+        (database down or checkout timeout).
+        """
+        started = time.monotonic()
+        waited = False
+        raw, created_at = None, None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._open < self.pool_size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._waits += 1
+                    self._wait_time += time.monotonic() - started
+                    print(f"Error: Timed out after {self.timeout}s waiting for a database connection.")
+                    return None
+                waited = True
+                self._cond.wait(remaining)
+
+            if waited:
+                self._waits += 1
+                self._wait_time += time.monotonic() - started
+
+        if raw is not None:
+            raw, created_at = self._validate(raw, created_at)
+        else:
+            raw, created_at = self._new_connection()
+
+        if raw is None:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            return None
+
+        with self._cond:
+            self._checkouts += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _new_connection(self):
+        raw = self._connect()
+        if raw is None:
+            return None, None
+        with self._cond:
+            self._connects += 1
+        return raw, time.monotonic()
+
+    def _validate(self, raw, created_at):
+        """Recycles stale connections and pings idle ones before reuse."""
+        if self.recycle and time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            self._close_quietly(raw)
+            return self._new_connection()
+
+        if self.pre_ping:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._invalidated += 1
+                self._close_quietly(raw)
+                return self._new_connection()
+
+        return raw, created_at
+
+    def _release(self, raw, created_at):
+        # Never hand a connection with an open transaction to the next caller
+        try:
+            if getattr(raw, "in_transaction", False):
+                raw.rollback()
+        except Exception:
+            with self._cond:
+                self._invalidated += 1
+                self._open -= 1
+                self._cond.notify()
+            self._close_quietly(raw)
+            return
+
+        with self._cond:
+            if len(self._idle) < self.pool_size:
+                self._idle.append((raw, created_at))
+                raw = None
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._close_quietly(raw)
+
+    def _reclaim(self, raw, created_at, checked_out_at):
+        """Called when a PooledConnection is garbage collected without being closed."""
+        with self._cond:
+            self._reclaimed += 1
+        held = time.monotonic() - checked_out_at
+        print(f"Warning: a database connection checked out {held:.1f}s ago was never closed; "
+              "returning it to the pool.")
+        self._release(raw, created_at)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def dispose(self):
+        """Closes every idle connection. Checked-out connections close on release."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "active": self._open - idle,
+                "idle": idle,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_seconds": round(self._wait_time, 6),
+                "timeouts": self._timeouts,
+                "connects": self._connects,
+                "recycled": self._recycled,
+                "invalidated": self._invalidated,
+                "reclaimed": self._reclaimed,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(**settings):
+    """
+    (Re)creates the process-wide pool. Accepts the ConnectionPool keyword
+    arguments to override the environment configuration.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.dispose()
+        _pool = ConnectionPool(**settings)
+        return _pool
+
+
+def get_pool():
+    """Returns the process-wide pool, creating it on first use (and after a fork)."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool._pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool._pid != os.getpid():
+            # A forked worker must not share sockets with its parent
+            _pool = ConnectionPool()
+        return _pool
+
+
+def get_db_connection():
+    """
+    Returns a pooled connection object to the database, or None on failure.
+    This function does NOT return a cursor. Calling close() on the returned
+    connection gives it back to the pool.
+    """
+    started = time.perf_counter()
+    conn = get_pool().acquire()
+    elapsed = time.perf_counter() - started
+    query_metrics.observe_acquire(elapsed, ok=conn is not None)
+    add_span('db', elapsed)
+    return conn
+
+
+@contextmanager
+def db_connection():
+    """
+    Context manager around get_db_connection() that always returns the
+    connection to the pool. Yields None if the database is unavailable.
+
+        with db_connection() as conn:
+            if conn is None:
+                return {'error': 'Database connection failed'}
+            ...
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def get_pool_stats():
+    """Returns checkout/wait counters and active/idle sizes for the pool."""
+    return get_pool().stats()
@@ -0,0 +1,102 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from database_connector import db_connection
+
+load_dotenv()
+
+# How many IDs a process reserves per trip to the database. IDs are handed out
+# from the reserved block in memory, so a block that is not used up before the
+# process exits leaves a gap in the numbering (never a duplicate).
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "20"))
+
+CREATE_SEQUENCES_TABLE = """
+CREATE TABLE IF NOT EXISTS id_sequences (
+    prefix VARCHAR(10) NOT NULL PRIMARY KEY,
+    next_value BIGINT UNSIGNED NOT NULL
+)
+"""
+
+
+class IdAllocator:
+    """
+    Hands out prefixed IDs such as C_001 or PY_012.
+
+    Each prefix has a row in id_sequences. A process reserves a block of
+    numbers with one atomic UPDATE and serves IDs from that block until it is
+    used up, so allocation is constant-time and safe across gunicorn workers.
+    """
+
+    def __init__(self, block_size=ID_BLOCK_SIZE):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}        # prefix -> [next_value, end_value)
+        self._seeded = set()     # prefixes whose sequence row is known to exist
+        self._table_ready = False
+
+    def allocate(self, prefix, table_name, id_column):
+        """
+        Returns the next ID for `prefix`, or None if no block could be reserved.
+        Reserving takes a pooled connection for one short transaction, so do not
+        call this while holding another connection.
+        """
+        with self._lock:
+            block = self._blocks.get(prefix)
+            if block is None or block[0] >= block[1]:
+                block = self._reserve_block(prefix, table_name, id_column)
+                if block is None:
+                    return None
+                self._blocks[prefix] = block
+            value = block[0]
+            block[0] += 1
+        return f"{prefix}_{value:03d}"
+
+    def _reserve_block(self, prefix, table_name, id_column):
+        with db_connection() as conn:
+            if conn is None:
+                return None
+
+            cursor = conn.cursor()
+            try:
+                if not self._table_ready:
+                    cursor.execute(CREATE_SEQUENCES_TABLE)
+                    self._table_ready = True
+
+                if prefix not in self._seeded:
+                    # First use of the prefix: start after the highest existing ID
+                    # so rows created before the sequence existed are never reused.
+                    cursor.execute(
+                        f"""
+                        INSERT IGNORE INTO id_sequences (prefix, next_value)
+                        SELECT %s, COALESCE(MAX(CAST(SUBSTRING({id_column}, %s) AS UNSIGNED)), 0) + 1
+                        FROM {table_name}
+                        WHERE {id_column} LIKE %s
+                        """,
+                        (prefix, len(prefix) + 2, f"{prefix}\\_%")
+                    )
+                    self._seeded.add(prefix)
+
+                # LAST_INSERT_ID(expr) makes the new value readable on this connection only,
+                # and the row lock serialises concurrent reservations.
+                cursor.execute(
+                    "UPDATE id_sequences SET next_value = LAST_INSERT_ID(next_value + %s) WHERE prefix = %s",
+                    (self.block_size, prefix)
+                )
+                if cursor.rowcount == 0:
+                    self._seeded.discard(prefix)
+                    raise RuntimeError(f"No id_sequences row for prefix '{prefix}'.")
+                cursor.execute("SELECT LAST_INSERT_ID()")
+                end_value = cursor.fetchone()[0]
+                conn.commit()
+                return [end_value - self.block_size, end_value]
+            except Exception as e:
+                conn.rollback()
+                print(f"Error reserving ID block for {prefix}: {e}")
+                return None
+            finally:
+                cursor.close()
+
+
+allocator = IdAllocator()
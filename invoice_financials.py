@@ -0,0 +1,152 @@
+import os
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# GST on project services, split equally between the centre and the state
+CGST_RATE = Decimal('0.09')
+SGST_RATE = Decimal('0.09')
+
+PAISE = Decimal('0.01')
+RUPEE = Decimal('1')
+
+# Round the grand total to the nearest rupee, showing the difference as the
+# round-off. Off by default, so totals match the invoices already issued
+ROUND_TO_RUPEE = os.getenv("INVOICE_ROUND_TO_RUPEE", "0") in ("1", "true", "True")
+
+
+def to_decimal(value):
+    """Converts a database or form value to Decimal; missing or invalid values count as zero."""
+    if value is None or value == '':
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        return Decimal('0')
+
+
+def compute_financials(net_amount, amount_paid=0):
+    """
+    Derives every figure printed on an invoice from its net (pre-tax) amount.
+
+    Each tax line is rounded to the paisa. With INVOICE_ROUND_TO_RUPEE set, the
+    grand total is rounded to the nearest rupee with the difference shown as
+    the round-off. All values are Decimals with two decimal places.
+    """
+    net = to_decimal(net_amount).quantize(PAISE, ROUND_HALF_UP)
+    paid = to_decimal(amount_paid).quantize(PAISE, ROUND_HALF_UP)
+
+    cgst = (net * CGST_RATE).quantize(PAISE, ROUND_HALF_UP)
+    sgst = (net * SGST_RATE).quantize(PAISE, ROUND_HALF_UP)
+    total_tax = cgst + sgst
+    subtotal = net + total_tax
+    total = subtotal.quantize(RUPEE, ROUND_HALF_UP).quantize(PAISE) if ROUND_TO_RUPEE else subtotal
+
+    return {
+        'net_amount': net,
+        'cgst_rate': CGST_RATE,
+        'cgst': cgst,
+        'sgst_rate': SGST_RATE,
+        'sgst': sgst,
+        'total_tax': total_tax,
+        'subtotal': subtotal,
+        'round_off': total - subtotal,
+        'total': total,
+        'amount_paid': paid,
+        'balance_due': total - paid,
+        'tax_included': False,
+    }
+
+
+def gross_financials(gross_amount, amount_paid=0):
+    """
+    Figures for an invoice recorded by its gross amount only (amount_due with
+    no bill_amount). The tax is already included in that amount and is not
+    itemised, so nothing is added on top of it.
+    """
+    total = to_decimal(gross_amount).quantize(PAISE, ROUND_HALF_UP)
+    paid = to_decimal(amount_paid).quantize(PAISE, ROUND_HALF_UP)
+    zero = Decimal('0.00')
+
+    return {
+        'net_amount': total,
+        'cgst_rate': CGST_RATE,
+        'cgst': zero,
+        'sgst_rate': SGST_RATE,
+        'sgst': zero,
+        'total_tax': zero,
+        'subtotal': total,
+        'round_off': zero,
+        'total': total,
+        'amount_paid': paid,
+        'balance_due': total - paid,
+        'tax_included': True,
+    }
+
+
+def total_sql(net):
+    """
+    SQL expression for the grand total compute_financials() gives for the net
+    amount in `net`, so reports aggregated in the database match the invoices.
+    MySQL's ROUND() on DECIMAL rounds half away from zero, like ROUND_HALF_UP.
+    """
+    net = f"ROUND(COALESCE({net}, 0), 2)"
+    return f"ROUND({net} + ROUND({net} * {CGST_RATE}, 2) + ROUND({net} * {SGST_RATE}, 2), {0 if ROUND_TO_RUPEE else 2})"
+
+
+# --- The invoice total and the amount paid, as used by every report ---
+# An invoice row carries either bill_amount, the net amount that tax is added
+# to, or only amount_due, its gross amount as entered. What counts as paid is
+# the larger of its amount_paid and the sum of its payments: the two can
+# record the same money, so they are never added together.
+
+def invoice_total_sql(alias=''):
+    """SQL expression for the grand total of the invoices row `alias` (e.g. 'i.')."""
+    return (f"CASE WHEN {alias}bill_amount IS NULL THEN COALESCE({alias}amount_due, 0) "
+            f"ELSE {total_sql(alias + 'bill_amount')} END")
+
+
+def invoice_paid_sql(payments, alias=''):
+    """SQL expression for the amount paid on the invoices row `alias`, given the sum of its `payments`."""
+    return f"GREATEST(COALESCE({alias}amount_paid, 0), COALESCE({payments}, 0))"
+
+
+def invoice_financials(invoice):
+    """
+    Returns the figures for an invoice row, computing them only if the row does not
+    already carry them under 'financials'.
+    """
+    financials = invoice.get('financials')
+    if financials is None:
+        net = invoice.get('bill_amount')
+        if net is None or net == '':
+            financials = gross_financials(invoice.get('amount_due'), invoice.get('amount_paid'))
+        else:
+            financials = compute_financials(net, invoice.get('amount_paid'))
+    return financials
+
+
+def json_value(value):
+    """
+    Value of an invoice field for a JSON response: dates in ISO format and
+    amounts as strings with at least two decimal places.
+    """
+    if isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    if isinstance(value, Decimal):
+        return str(value) if value.as_tuple().exponent < -2 else f"{value:.2f}"
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def attach_financials(invoices):
+    """Adds a 'financials' entry to each invoice row (in place) and returns the rows."""
+    for invoice in invoices or []:
+        invoice['financials'] = invoice_financials(invoice)
+    return invoices
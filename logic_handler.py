@@ -1,48 +1,30 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
-from database_connector import get_db_connection
-import mysql
+from database_connector import get_db_connection, db_connection, DB_BACKEND, DB_ERRORS
+from dashboard_counters import counters, start_reconciler, COUNTED_TABLES
+from id_allocator import allocator
+from pdf_cache import cached_pdf
+from pdf_stream import StreamingFPDF, ChunkWriter, pdf_bytes, render_pdf_bytes, stream_pdf
+from request_tracing import span, traced
+from pdf_assets import images, LOGO
+from invoice_financials import invoice_financials, attach_financials, to_decimal, invoice_total_sql, invoice_paid_sql
+from reference_cache import reference_cache
+from table_versions import table_versions
+from report_layout import TableLayout, Column, company_header, section_title, report_footer, field, FAST_PATH
 from fpdf import FPDF
-import mysql.connector
 import os
 from dotenv import load_dotenv
 from datetime import datetime, date, timedelta
 import decimal
 import math
+import json
+import base64
+import csv
+import io
+import zipfile
 from functools import wraps
-
-def get_dashboard_counts():
-    """
-    Handles the logic for fetching dashboard counts.
-    It calls the database connector, executes queries, and returns the results.
-    """
-    conn = get_db_connection()
-    if conn is None:
-        return {'error': 'Database connection failed'}
-
-    cursor = conn.cursor()
-    counts = {}
-
-    try:
-        cursor.execute("SELECT COUNT(*) FROM Clients")
-        counts['clients'] = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM Projects")
-        counts['projects'] = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM Employees")
-        counts['employees'] = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(*) FROM Invoices")
-        counts['invoices'] = cursor.fetchone()[0]
-        
-        return counts
-    except Exception as e:
-        print(f"Logic Handler Error: {e}")
-        return {'error': 'Failed to retrieve counts due to a query error.'}
-    finally:
-        cursor.close()
-        conn.close()
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 
 def add_new_client(client_data):
     """
@@ -77,48 +59,46 @@ def add_new_client(client_data):
         cursor.close()
         conn.close()
 
-# You would add more functions here for other logic, like getting a list of clients, etc.
+# Table -> ID column for the prefixed IDs handed out by the allocator
+ID_COLUMNS = {
+    'clients': 'client_id',
+    'projects': 'project_id',
+    'employees': 'employee_id',
+    'payments': 'payment_id',
+    'suppliers': 'supplier_id',
+}
+
 def generate_new_id(prefix, table_name):
-    """Generates a new ID based on the count of existing records."""
-    conn = get_db_connection()
-    if conn is None:
-        return None
+    """
+    Generates a new ID such as C_001 from the shared ID sequence.
+    Unlike a COUNT(*)-based ID, it never repeats after deletes or under concurrent inserts.
 
-    cursor = conn.cursor()
-    try:
-        # Use a parameterized query to avoid SQL injection
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        count = cursor.fetchone()[0]
-        new_id = f"{prefix}_{count + 1:03d}"
-        return new_id
-    except Exception as e:
-        print(f"Error generating ID: {e}")
-        return None
-    finally:
-        cursor.close()
-        conn.close()
+    A new block of IDs is reserved on a pooled connection of its own, so call this
+    before checking out the connection for the insert: a caller holding one
+    connection while waiting for a second can exhaust the pool under load.
+    """
+    return allocator.allocate(prefix, table_name, ID_COLUMNS[table_name])
 
 def add_new_client(client_data):
     """
     Handles the logic for adding a new client with robust error checking.
     """
+    # Step 1: Check for required fields to prevent NOT NULL errors
+    if not client_data.get('client_name'):
+        return False, "Client Name is a required field."
+
+    # Step 2: Allocate a new ID in the 'C_001' pattern
+    client_id = generate_new_id('C', 'clients')
+    if client_id is None:
+        return False, "Could not allocate a new client ID."
+
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
 
     cursor = conn.cursor()
 
-    # Step 1: Check for required fields to prevent NOT NULL errors
-    if not client_data.get('client_name'):
-        return False, "Client Name is a required field."
-
     try:
-        # Step 2: Get the current count to generate a new ID
-        cursor.execute("SELECT COUNT(*) FROM clients")
-        count = cursor.fetchone()[0]
-        # Format the ID to match your 'C_001' pattern
-        client_id = f"C_{count + 1:03d}"
-        
         # Step 3: Insert the new client record
         sql_insert = """
         INSERT INTO clients (client_id, client_name, contact_person, phone, email, address, client_type)
@@ -136,9 +116,10 @@ def add_new_client(client_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('clients')
         return True, "Client added successfully!"
 
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         # Return a more specific error from the database
         return False, f"Database Error: {err}"
@@ -149,8 +130,236 @@ def add_new_client(client_data):
         cursor.close()
         conn.close()
 
-def get_all_clients():
+# --- Keyset pagination for the list endpoints ---
+# Per table: primary key (the tie-breaker), sortable columns and filterable columns.
+# Only whitelisted names are ever interpolated into SQL.
+LIST_TABLES = {
+    'clients': {
+        'key': 'client_id',
+        'sort': ('client_id', 'client_name', 'client_type'),
+        'filters': ('client_name', 'client_type', 'contact_person'),
+    },
+    'projects': {
+        'key': 'project_id',
+        'sort': ('project_id', 'project_name', 'start_date', 'end_date', 'status', 'contract_value'),
+        'filters': ('client_id', 'status', 'project_location'),
+    },
+    'employees': {
+        'key': 'employee_id',
+        'sort': ('employee_id', 'first_name', 'last_name', 'role', 'hire_date', 'salary', 'status'),
+        'filters': ('role', 'status'),
+    },
+    'invoices': {
+        'key': 'invoice_id',
+        'sort': ('invoice_id', 'invoice_date', 'due_date', 'amount_due', 'status'),
+        'filters': ('project_id', 'client_id', 'status'),
+    },
+    'payments': {
+        'key': 'payment_id',
+        'sort': ('payment_id', 'payment_date', 'amount'),
+        'filters': ('invoice_id', 'payment_method'),
+    },
+    'materials': {
+        'key': 'material_id',
+        'sort': ('material_id', 'material_name', 'unit_price', 'stock_quantity'),
+        'filters': ('supplier_id', 'manufacturer'),
+    },
+    'suppliers': {
+        'key': 'supplier_id',
+        'sort': ('supplier_id', 'supplier_name'),
+        'filters': ('supplier_name', 'contact_person'),
+    },
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort, values):
+    """Encodes the sort key and the last row's (sort value, primary key) as an opaque token."""
+    payload = json.dumps([sort, values], default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    """Returns (sort, values) from a token created by encode_cursor()."""
+    try:
+        sort, values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        return sort, values
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+def get_records_page(table, limit=None, page_cursor=None, sort=None, filters=None):
+    """
+    Fetches one page of `table` using keyset (cursor) pagination.
+
+    :param limit: Page size (default 50, max 500).
+    :param page_cursor: next_cursor token returned by the previous page.
+    :param sort: Column to sort by; prefix with '-' for descending order.
+    :param filters: {column: value} exact-match filters.
+    :return: {table: rows, 'next_cursor': token or None}, or {'error': message};
+             errors caused by the arguments also carry 'invalid': True.
+    """
+    config = LIST_TABLES[table]
+    key = config['key']
+
+    try:
+        limit = min(DEFAULT_PAGE_SIZE if limit in (None, '') else int(limit), MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except (TypeError, ValueError):
+        return {'error': 'limit must be a positive integer.', 'invalid': True}
+
+    sort = sort or key
+    sort_column = sort.lstrip('-')
+    descending = sort.startswith('-')
+    if sort_column not in config['sort']:
+        return {'error': f"Cannot sort {table} by '{sort_column}'.", 'invalid': True}
+
+    where, params = [], []
+    for column, value in (filters or {}).items():
+        if column not in config['filters']:
+            return {'error': f"Cannot filter {table} by '{column}'.", 'invalid': True}
+        where.append(f"{column} = %s")
+        params.append(value)
+
+    if page_cursor:
+        try:
+            cursor_sort, (last_value, last_key) = decode_cursor(page_cursor)
+        except ValueError as e:
+            return {'error': str(e), 'invalid': True}
+        if cursor_sort != sort:
+            return {'error': 'Cursor does not match the requested sort.', 'invalid': True}
+        op = '<' if descending else '>'
+        if sort_column == key:
+            where.append(f"{key} {op} %s")
+            params.append(last_key)
+        elif last_value is None:
+            # NULLs sort first ascending and last descending (MySQL and SQLite
+            # alike): after a NULL come the remaining NULLs, then, ascending, every value
+            if descending:
+                where.append(f"({sort_column} IS NULL AND {key} < %s)")
+            else:
+                where.append(f"(({sort_column} IS NULL AND {key} > %s) OR {sort_column} IS NOT NULL)")
+            params.append(last_key)
+        else:
+            # Comparisons with NULL are never true, so NULLs still to come
+            # (descending order) need their own branch
+            null_rows = f" OR {sort_column} IS NULL" if descending else ""
+            where.append(f"({sort_column} {op} %s OR ({sort_column} = %s AND {key} {op} %s){null_rows})")
+            params.extend([last_value, last_value, last_key])
+
+    direction = 'DESC' if descending else 'ASC'
+    sql_query = f"SELECT * FROM {table}"
+    if where:
+        sql_query += " WHERE " + " AND ".join(where)
+    if sort_column == key:
+        sql_query += f" ORDER BY {key} {direction}"
+    else:
+        sql_query += f" ORDER BY {sort_column} {direction}, {key} {direction}"
+    # One extra row tells us whether another page exists
+    sql_query += " LIMIT %s"
+    params.append(limit + 1)
+
+    with db_connection() as conn:
+        if conn is None:
+            return {'error': 'Database connection failed'}
+
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(sql_query, tuple(params))
+            rows = cursor.fetchall()
+        except Exception as e:
+            print(f"Logic Handler Error (get_records_page {table}): {e}")
+            return {'error': f'Failed to retrieve {table}.'}
+        finally:
+            cursor.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, [last[sort_column], last[key]])
+    return {table: rows, 'next_cursor': next_cursor}
+
+# --- Streaming full-table exports ---
+STREAM_BATCH_SIZE = 500
+# Fields computed for the paged list responses, added to each streamed row as well
+STREAM_ROW_HOOKS = {
+    'invoices': lambda row: attach_financials([row])[0],
+}
+
+class RecordStream:
+    """
+    Iterates the rows of one SELECT in batches from an unbuffered (server-side) cursor,
+    so only `batch_size` rows are held in memory at a time. The stream owns a pooled
+    connection until it is exhausted or close() is called.
+    """
+
+    def __init__(self, conn, cursor, batch_size, row_hook=None):
+        self._conn = conn
+        self._cursor = cursor
+        self._batch_size = batch_size
+        self._row_hook = row_hook
+        self._batch = []
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._batch:
+            if self._closed:
+                raise StopIteration
+            self._batch = self._cursor.fetchmany(self._batch_size)
+            if not self._batch:
+                self.close()
+                raise StopIteration
+            self._batch.reverse()
+        row = self._batch.pop()
+        return self._row_hook(row) if self._row_hook else row
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._batch = []
+        try:
+            self._cursor.close()
+        except Exception:
+            # Stopped mid-result (e.g. client disconnected): mysql.connector only closes the
+            # cursor once the rest of the result is drained. SQLite has no such method.
+            if hasattr(self._conn, 'consume_results'):
+                self._conn.consume_results()
+                self._cursor.close()
+        finally:
+            self._conn.close()
+
+def stream_all_records(table, batch_size=STREAM_BATCH_SIZE):
+    """
+    Opens a streaming export of every row in `table`.
+    Returns (RecordStream, "Success") or (None, error message).
+    """
+    if table not in LIST_TABLES:
+        return None, f"Streaming is not supported for '{table}'."
+
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed."
+
+    # mysql.connector cursors are unbuffered unless buffered=True is requested
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT * FROM {table} ORDER BY {LIST_TABLES[table]['key']}")
+    except Exception as e:
+        print(f"Logic Handler Error (stream_all_records {table}): {e}")
+        cursor.close()
+        conn.close()
+        return None, str(e)
+    return RecordStream(conn, cursor, batch_size, STREAM_ROW_HOOKS.get(table)), "Success"
+
+def get_all_clients(limit=None, page_cursor=None, sort=None, filters=None):
     """Retrieves all client records from the database."""
+    if limit or page_cursor or sort or filters:
+        return get_records_page('clients', limit, page_cursor, sort, filters)
+
     conn = get_db_connection()
     if conn is None:
         return {'error': 'Database connection failed'}
@@ -185,6 +394,7 @@ def delete_client(client_id):
         cursor.execute(sql_delete, (client_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('clients')
             return True, "Client deleted successfully!"
         else:
             return False, "Client not found."
@@ -215,6 +425,8 @@ def get_client_details(client_id):
         cursor.close()
         conn.close()
 
+@traced('render')
+@cached_pdf('client')
 def generate_client_pdf(client_data):
     """Generates a professional single-client PDF report."""
     if not client_data:
@@ -222,55 +434,22 @@ def generate_client_pdf(client_data):
 
     pdf = FPDF()
     pdf.add_page()
-    
-    # --- COMPANY HEADER ---
-    pdf.set_fill_color(0, 77, 153)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 20)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    pdf.set_font("Arial", '', 10)
-    pdf.cell(0, 5, 'Client Profile Report', 0, 1, 'C', 0)
-    pdf.ln(10)
+    company_header(pdf, 'Client Profile Report', title_size=20, subtitle_size=10)
     
     # --- CLIENT IDENTIFICATION ---
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, f"CLIENT: {client_data.get('client_name', 'N/A').upper()}", 0, 1, 'L')
-    pdf.set_line_width(0.5)
-    pdf.set_draw_color(0, 77, 153)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
+    section_title(pdf, f"CLIENT: {client_data.get('client_name', 'N/A').upper()}")
 
     # Details Layout
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(50, 7, 'Client ID:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 7, f"{client_data.get('client_id', 'N/A')}", 0, 1, 'L')
-    
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(50, 7, 'Client Type:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 7, f"{client_data.get('client_type', 'N/A')}", 0, 1, 'L')
+    field(pdf, 'Client ID:', client_data.get('client_id', 'N/A'))
+    field(pdf, 'Client Type:', client_data.get('client_type', 'N/A'))
     pdf.ln(5)
 
     # --- CONTACT INFORMATION ---
     pdf.set_font("Arial", 'B', 14)
     pdf.cell(0, 10, 'Contact Information', 0, 1, 'L')
-    
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(50, 7, 'Contact Person:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 7, f"{client_data.get('contact_person', 'N/A')}", 0, 1, 'L')
-    
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(50, 7, 'Phone:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 7, f"{client_data.get('phone', 'N/A')}", 0, 1, 'L')
-    
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(50, 7, 'Email:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 7, f"{client_data.get('email', 'N/A')}", 0, 1, 'L')
+    field(pdf, 'Contact Person:', client_data.get('contact_person', 'N/A'))
+    field(pdf, 'Phone:', client_data.get('phone', 'N/A'))
+    field(pdf, 'Email:', client_data.get('email', 'N/A'))
 
     pdf.set_font("Arial", 'B', 12)
     pdf.cell(50, 7, 'Address:', 0, 0, 'L')
@@ -278,12 +457,8 @@ def generate_client_pdf(client_data):
     pdf.multi_cell(0, 7, f"{client_data.get('address', 'N/A')}", 0, 'L')
     pdf.ln(10)
     
-     # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'This document is a confidential Client Profile generated by the CMS System.', 0, 1, 'C')
-   
-    return pdf.output(dest='S').encode('latin1')
+    report_footer(pdf, 'This document is a confidential Client Profile generated by the CMS System.')
+    return pdf_bytes(pdf)
 
 def get_all_clients_data():
     """Fetches all client records to generate a master PDF."""
@@ -309,66 +484,30 @@ def generate_all_clients_pdf(clients_data):
     """Generates a single, professional PDF report for all clients."""
     if not clients_data:
         return None
-
-    pdf = FPDF()
+    return render_pdf_bytes(_render_all_clients, clients_data)
+
+CLIENT_ROSTER_TABLE = TableLayout([
+    Column('ID', 15, 'client_id', 'C'),
+    Column('Name', 45, 'client_name'),
+    Column('Contact Person', 40, 'contact_person'),
+    Column('Phone', 30, 'phone'),
+    Column('Type', 40, 'client_type'),
+])
+
+def _render_all_clients(pdf, clients_data):
+    """Draws the client roster, yielding after each row so pages can be streamed."""
     pdf.add_page()
-    
-    # --- GLOBAL HEADER ---
-    pdf.set_fill_color(0, 77, 153)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 20)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 5, 'Comprehensive Client Roster', 0, 1, 'C', 0)
-    pdf.ln(10)
-    
-    # --- TABLE SETUP ---
-    pdf.set_text_color(0, 0, 0)
-    pdf.set_font('Arial', 'B', 10)
-    pdf.set_fill_color(220, 220, 220)
-    
-    # Define Column Widths
-    col_widths = [15, 45, 40, 30, 40]
-    
-    # Table Headers
-    pdf.cell(col_widths[0], 7, 'ID', 1, 0, 'C', 1)
-    pdf.cell(col_widths[1], 7, 'Name', 1, 0, 'L', 1)
-    pdf.cell(col_widths[2], 7, 'Contact Person', 1, 0, 'L', 1)
-    pdf.cell(col_widths[3], 7, 'Phone', 1, 0, 'L', 1)
-    pdf.cell(col_widths[4], 7, 'Type', 1, 1, 'L', 1)
-    
-    # Table Data
-    pdf.set_font('Arial', '', 9)
-    for client in clients_data:
-        # Check if new page is needed
-        if pdf.get_y() > 270:
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 10)
-            pdf.set_fill_color(220, 220, 220)
-            pdf.cell(col_widths[0], 7, 'ID', 1, 0, 'C', 1)
-            pdf.cell(col_widths[1], 7, 'Name', 1, 0, 'L', 1)
-            pdf.cell(col_widths[2], 7, 'Contact Person', 1, 0, 'L', 1)
-            pdf.cell(col_widths[3], 7, 'Phone', 1, 0, 'L', 1)
-            pdf.cell(col_widths[4], 7, 'Type', 1, 1, 'L', 1)
-            pdf.set_font('Arial', '', 9)
-
-        pdf.cell(col_widths[0], 6, client.get('client_id', 'N/A'), 1, 0, 'C', 0)
-        pdf.cell(col_widths[1], 6, client.get('client_name', 'N/A'), 1, 0, 'L', 0)
-        pdf.cell(col_widths[2], 6, client.get('contact_person', 'N/A'), 1, 0, 'L', 0)
-        pdf.cell(col_widths[3], 6, client.get('phone', 'N/A'), 1, 0, 'L', 0)
-        pdf.cell(col_widths[4], 6, client.get('client_type', 'N/A'), 1, 1, 'L', 0)
-    
-     # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
-
-    return pdf.output(dest='S').encode('latin1')
+    company_header(pdf, 'Comprehensive Client Roster', title_size=20)
+    yield from CLIENT_ROSTER_TABLE.render(pdf, clients_data)
+    report_footer(pdf)
 
-def get_all_projects():
+def get_all_projects(limit=None, page_cursor=None, sort=None, filters=None):
     """
     Retrieves all project records from the Projects table using snake_case.
     """
+    if limit or page_cursor or sort or filters:
+        return get_records_page('projects', limit, page_cursor, sort, filters)
+
     conn = get_db_connection()
     if conn is None:
         return {'error': 'Database connection failed'}
@@ -391,6 +530,10 @@ def add_new_project(project_data):
     """
     Handles the logic for adding a new project using snake_case.
     """
+    project_id = project_data.get('project_id') or generate_new_id('P', 'projects')
+    if project_id is None:
+        return False, "Could not allocate a new project ID."
+
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
@@ -403,7 +546,7 @@ def add_new_project(project_data):
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         values = (
-            project_data.get('project_id'),
+            project_id,
             project_data.get('client_id'),
             project_data.get('project_name'),
             project_data.get('project_location'),
@@ -418,6 +561,7 @@ def add_new_project(project_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('projects')
         return True, "Project added successfully!"
     except Exception as e:
         conn.rollback()
@@ -441,6 +585,7 @@ def delete_project(project_id):
         cursor.execute(sql_delete, (project_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('projects')
             return True, "Project deleted successfully!"
         else:
             return False, "Project not found."
@@ -471,6 +616,8 @@ def get_project_details(project_id):
         cursor.close()
         conn.close()
         
+@traced('render')
+@cached_pdf('project')
 def generate_project_pdf(project_data):
     """Generates a professional project details PDF with improved styling."""
     if not project_data:
@@ -478,46 +625,17 @@ def generate_project_pdf(project_data):
 
     pdf = FPDF()
     pdf.add_page()
-    
-    # --- COMPANY HEADER (OM Enterprises Branding) ---
-    pdf.set_fill_color(0, 77, 153) # Dark Blue background (004D99 in hex)
-    pdf.set_text_color(255, 255, 255) # White text
-    pdf.set_font("Arial", 'B', 20)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_font("Arial", '', 10)
-    pdf.cell(0, 5, 'Contractor Management System | Project Report', 0, 1, 'C', 0)
-    pdf.ln(8)
+    company_header(pdf, 'Contractor Management System | Project Report',
+                   title_size=20, subtitle_size=10, gap=8)
     
     # --- PROJECT IDENTIFICATION ---
-    pdf.set_text_color(0, 0, 0) # Black text
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(0, 10, f"PROJECT: {project_data.get('project_name', 'N/A').upper()}", 0, 1, 'L')
-    pdf.set_line_width(0.5)
-    pdf.set_draw_color(0, 77, 153)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(3)
+    section_title(pdf, f"PROJECT: {project_data.get('project_name', 'N/A').upper()}", size=14, gap=3)
 
     # Two-Column Detail Layout
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(40, 6, 'Project ID:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 11)
-    pdf.cell(50, 6, f"{project_data.get('project_id', 'N/A')}", 0, 0, 'L')
-    
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(40, 6, 'Client ID:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 11)
-    pdf.cell(0, 6, f"{project_data.get('client_id', 'N/A')}", 0, 1, 'L')
-
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(40, 6, 'Location:', 0, 0, 'L')
-    pdf.set_font("Arial", '', 11)
-    pdf.cell(50, 6, f"{project_data.get('project_location', 'N/A')}", 0, 0, 'L')
-    
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(40, 6, 'Status:', 0, 0, 'L')
-    pdf.set_font("Arial", 'B', 11)
-    pdf.cell(0, 6, f"{project_data.get('status', 'N/A').upper()}", 0, 1, 'L')
+    field(pdf, 'Project ID:', project_data.get('project_id', 'N/A'), 40, 6, 11, value_width=50, ln=0)
+    field(pdf, 'Client ID:', project_data.get('client_id', 'N/A'), 40, 6, 11)
+    field(pdf, 'Location:', project_data.get('project_location', 'N/A'), 40, 6, 11, value_width=50, ln=0)
+    field(pdf, 'Status:', f"{project_data.get('status', 'N/A')}".upper(), 40, 6, 11, value_style='B')
     pdf.ln(5)
 
     # --- FINANCIAL SUMMARY TABLE ---
@@ -547,13 +665,8 @@ def generate_project_pdf(project_data):
     pdf.multi_cell(0, 6, f"{project_data.get('description', 'No description provided.')}", 1, 'L')
     
     pdf.ln(15)
-
-    # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
-    
-    return pdf.output(dest='S').encode('latin1')
+    report_footer(pdf)
+    return pdf_bytes(pdf)
 
 def get_all_projects_data():
     """Fetches all project records to generate a PDF."""
@@ -579,22 +692,13 @@ def generate_all_projects_pdf(projects_data):
     """Generates a single, professional PDF report for all projects."""
     if not projects_data:
         return None
+    return render_pdf_bytes(_render_all_projects, projects_data)
 
-    pdf = FPDF()
+
+def _render_all_projects(pdf, projects_data):
+    """Draws the project report, yielding after each project so pages can be streamed."""
     pdf.add_page()
-    
-    # --- Company Header ---
-    pdf.set_fill_color(0, 77, 153)  # Dark Blue background
-    pdf.set_text_color(255, 255, 255)  # White text
-    pdf.set_font("Arial", 'B', 24)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 5, 'Comprehensive Project Report', 0, 1, 'C', 0)
-    pdf.ln(10)
-    
-    # --- Content ---
-    pdf.set_text_color(0, 0, 0)  # Black text
+    company_header(pdf, 'Comprehensive Project Report')
     
     for project in projects_data:
         # Project Main Title
@@ -630,9 +734,7 @@ def generate_all_projects_pdf(projects_data):
         # Separator Line for Next Project
         pdf.line(10, pdf.get_y(), 200, pdf.get_y())
         pdf.ln(3)
-        
-
-    return pdf.output(dest='S').encode('latin1')
+        yield
 
 # Function to add existing employees from the project synopsis
 def add_existing_employees():
@@ -645,19 +747,19 @@ def add_existing_employees():
 
     # The data from your project synopsis 
     existing_employees = [
-        ('E_001', 'Bharat', 'Gharat', 'Project Manager', '7 Years', None, 'Active', '9876543210', 'bharat.g@omenter.com', '2018-01-15', 75000.00),
-        ('E_002', 'Sushank', 'Kirdak', 'Civil Engineer', '7 Years', None, 'Active', '9876543211', 'sushank.k@omenter.com', '2018-01-15', 75000.00),
-        ('E_003', 'Rambhau', 'Gharat', 'Site Supervisor', '10 Years', None, 'Active', '9876543212', 'rambhau.g@omenter.com', '2018-01-15', 75000.00),
-        ('E_004', 'Pandurang', 'Kirdak', 'Site Supervisor', '10 Years', None, 'Active', '9876543213', 'pandurang.k@omenter.com', '2018-01-15', 75000.00),
-        ('E_005', 'Rupchand', 'Gharat', 'Site Supervisor', '12 Years', None, 'Active', '9876543214', 'rupchand.g@omenter.com', '2018-01-15', 75000.00),
-        ('E_006', 'Ashok', 'Kirdak', 'Site Supervisor', '10 Years', None, 'Active', '9876543215', 'ashok.k@omenter.com', '2018-01-15', 75000.00),
-        ('E_007', 'Datta', 'Ingole', 'Site Supervisor', '10 Years', None, 'Active', '9876543216', 'datta.i@omenter.com', '2018-01-15', 75000.00)
+        ('E_001', 'Bharat', 'Gharat', 'Project Manager', '7 Years', 'Active', '9876543210', 'bharat.g@omenter.com', '2018-01-15', 75000.00),
+        ('E_002', 'Sushank', 'Kirdak', 'Civil Engineer', '7 Years', 'Active', '9876543211', 'sushank.k@omenter.com', '2018-01-15', 75000.00),
+        ('E_003', 'Rambhau', 'Gharat', 'Site Supervisor', '10 Years', 'Active', '9876543212', 'rambhau.g@omenter.com', '2018-01-15', 75000.00),
+        ('E_004', 'Pandurang', 'Kirdak', 'Site Supervisor', '10 Years', 'Active', '9876543213', 'pandurang.k@omenter.com', '2018-01-15', 75000.00),
+        ('E_005', 'Rupchand', 'Gharat', 'Site Supervisor', '12 Years', 'Active', '9876543214', 'rupchand.g@omenter.com', '2018-01-15', 75000.00),
+        ('E_006', 'Ashok', 'Kirdak', 'Site Supervisor', '10 Years', 'Active', '9876543215', 'ashok.k@omenter.com', '2018-01-15', 75000.00),
+        ('E_007', 'Datta', 'Ingole', 'Site Supervisor', '10 Years', 'Active', '9876543216', 'datta.i@omenter.com', '2018-01-15', 75000.00)
     ]
     
     # This query uses snake_case to match your database schema
     sql_insert = """
-    INSERT INTO employees (employee_id, first_name, last_name, role, experience_years, contact_phone, email, hire_date, salary, status)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    INSERT INTO employees (employee_id, first_name, last_name, role, experience_years, status, contact_phone, email, hire_date, salary)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
 
     try:
@@ -667,6 +769,7 @@ def add_existing_employees():
         if count == 0:
             cursor.executemany(sql_insert, existing_employees)
             conn.commit()
+            table_versions.bump('employees')
             print(f"Successfully added {cursor.rowcount} existing employees.")
         else:
             print("Employee table is not empty. Skipping population.")
@@ -678,10 +781,13 @@ def add_existing_employees():
         cursor.close()
         conn.close()
 
-def get_all_employees():
+def get_all_employees(limit=None, page_cursor=None, sort=None, filters=None):
     """
     Retrieves all employee records from the database.
     """
+    if limit or page_cursor or sort or filters:
+        return get_records_page('employees', limit, page_cursor, sort, filters)
+
     conn = get_db_connection()
     if conn is None:
         return {'error': 'Database connection failed'}
@@ -704,6 +810,10 @@ def add_new_employee(employee_data):
     """
     Handles the logic for adding a new employee.
     """
+    employee_id = employee_data.get('employee_id') or generate_new_id('E', 'employees')
+    if employee_id is None:
+        return False, "Could not allocate a new employee ID."
+
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
@@ -716,7 +826,7 @@ def add_new_employee(employee_data):
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         values = (
-            employee_data.get('employee_id'),
+            employee_id,
             employee_data.get('first_name'),
             employee_data.get('last_name'),
             employee_data.get('role'),
@@ -729,6 +839,7 @@ def add_new_employee(employee_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('employees')
         return True, "Employee added successfully!"
     except Exception as e:
         conn.rollback()
@@ -752,6 +863,7 @@ def delete_employee(employee_id):
         cursor.execute(sql_delete, (employee_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('employees')
             return True, "Employee deleted successfully!"
         else:
             return False, "Employee not found."
@@ -841,6 +953,7 @@ def get_employee_details(employee_id):
         cursor.close()
         conn.close()
 
+@traced('render')
 def generate_employee_pdf(employee_data):
     """Generates a professional single-employee PDF report with Project ID and Client ID."""
     if not employee_data:
@@ -969,85 +1082,32 @@ def generate_employee_pdf(employee_data):
     pdf.cell(0, 10, f"Report generated by CMS System on {datetime.now().strftime('%Y-%m-%d')}", 0, 1, 'C')
     
     # CRITICAL FIX APPLIED: Removed .encode('latin1')
-    return pdf.output(dest='S').encode('latin1')
+    return pdf_bytes(pdf)
 
 def generate_all_employees_pdf(employees_data):
     """Generates a single, professional PDF report for all employees."""
     if not employees_data:
         return None
+    return render_pdf_bytes(_render_all_employees, employees_data)
 
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    # --- GLOBAL COMPANY HEADER ---
-    pdf.set_fill_color(0, 77, 153) # Dark Blue background (004D99)
-    pdf.set_text_color(255, 255, 255) # White text
-    pdf.set_font("Arial", 'B', 24)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_fill_color(0, 77, 153) # Dark Blue background (004D99)
-    pdf.set_text_color(255, 255, 255) # White text
-    pdf.set_font("Arial", 'B', 12)
-    pdf.cell(0, 5, 'Official Employee Roster Report', 0, 1, 'C', 0)
-    pdf.ln(10)
-    
-    pdf.set_text_color(0, 0, 0) # Reset to Black text
-    
-    # --- TABLE HEADER ---
-    pdf.set_font('Arial', 'B', 10)
-    pdf.set_fill_color(220, 220, 220) # Light Gray background for header
-    
-    # Define Column Widths
-    col_widths = [15, 30, 35, 25, 40, 25, 20] 
-    
-    # Print Table Headers
-    pdf.cell(col_widths[0], 7, 'ID', 1, 0, 'C', 1)
-    pdf.cell(col_widths[1], 7, 'Full Name', 1, 0, 'L', 1)
-    pdf.cell(col_widths[2], 7, 'Role', 1, 0, 'L', 1)
-    pdf.cell(col_widths[3], 7, 'Status', 1, 0, 'C', 1)
-    pdf.cell(col_widths[4], 7, 'Email', 1, 0, 'L', 1)
-    pdf.cell(col_widths[5], 7, 'Hire Date', 1, 0, 'C', 1)
-    pdf.cell(col_widths[6], 7, 'Salary (Rs)', 1, 1, 'R', 1)
-
-    # --- TABLE BODY ---
-    pdf.set_font('Arial', '', 9)
-    pdf.set_fill_color(255, 255, 255) # White background for rows
-    
-    for emp in employees_data:
-        # Check for page break
-        if pdf.get_y() > 270:
-            pdf.add_page()
-            pdf.set_font('Arial', 'B', 10)
-            pdf.set_fill_color(220, 220, 220)
-            # Reprint Headers on new page
-            pdf.cell(col_widths[0], 7, 'ID', 1, 0, 'C', 1)
-            pdf.cell(col_widths[1], 7, 'Full Name', 1, 0, 'L', 1)
-            pdf.cell(col_widths[2], 7, 'Role', 1, 0, 'L', 1)
-            pdf.cell(col_widths[3], 7, 'Status', 1, 0, 'C', 1)
-            pdf.cell(col_widths[4], 7, 'Email', 1, 0, 'L', 1)
-            pdf.cell(col_widths[5], 7, 'Hire Date', 1, 0, 'C', 1)
-            pdf.cell(col_widths[6], 7, 'Salary (Rs)', 1, 1, 'R', 1)
-            pdf.set_font('Arial', '', 9)
-
-
-        full_name = f"{emp.get('first_name', '')} {emp.get('last_name', '')}"
-        
-        pdf.cell(col_widths[0], 6, emp.get('employee_id', 'N/A'), 1, 0, 'C')
-        pdf.cell(col_widths[1], 6, full_name, 1, 0, 'L')
-        pdf.cell(col_widths[2], 6, emp.get('role', 'N/A'), 1, 0, 'L')
-        pdf.cell(col_widths[3], 6, emp.get('status', 'N/A'), 1, 0, 'C')
-        pdf.cell(col_widths[4], 6, emp.get('email', 'N/A'), 1, 0, 'L')
-        pdf.cell(col_widths[5], 6, str(emp.get('hire_date', 'N/A')), 1, 0, 'C') # Convert Date object to string
-        pdf.cell(col_widths[6], 6, f"{emp.get('salary', '0.00'):.2f}", 1, 1, 'R')
-        
 
-     # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
+EMPLOYEE_ROSTER_TABLE = TableLayout([
+    Column('ID', 15, 'employee_id', 'C'),
+    Column('Full Name', 30, lambda emp: f"{emp.get('first_name', '')} {emp.get('last_name', '')}"),
+    Column('Role', 35, 'role'),
+    Column('Status', 25, 'status', 'C'),
+    Column('Email', 40, 'email'),
+    Column('Hire Date', 25, 'hire_date', 'C'),
+    Column('Salary (Rs)', 20, lambda emp: f"{emp.get('salary') or 0:.2f}", 'R'),
+])
 
-    return pdf.output(dest='S').encode('latin1')
+def _render_all_employees(pdf, employees_data):
+    """Draws the employee roster, yielding after each row so pages can be streamed."""
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    company_header(pdf, 'Official Employee Roster Report', subtitle_style='B')
+    yield from EMPLOYEE_ROSTER_TABLE.render(pdf, employees_data)
+    report_footer(pdf)
 
 # Function to add existing suppliers from the project synopsis
 def add_existing_suppliers():
@@ -1066,7 +1126,7 @@ def add_existing_suppliers():
 
     # This query uses snake_case to match your database schema
     sql_insert = """
-    INSERT INTO suppliers (supplier_id, name, contact_person, phone, email, address, supplier_type)
+    INSERT INTO suppliers (supplier_id, supplier_name, contact_person, phone, email, address, supplier_type)
     VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
 
@@ -1077,18 +1137,27 @@ def add_existing_suppliers():
         if count == 0:
             cursor.executemany(sql_insert, existing_suppliers)
             conn.commit()
+            table_versions.bump('suppliers')
             print(f"Successfully added {cursor.rowcount} existing suppliers.")
         else:
             print("Supplier table is not empty. Skipping population.")
         return True, "Existing suppliers processed."
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         return False, str(err)
     finally:
         cursor.close()
         conn.close()
 
-def get_all_suppliers():
+def get_all_suppliers(limit=None, page_cursor=None, sort=None, filters=None):
+    """
+    Retrieves all supplier records, from the reference-data cache when it is fresh.
+    """
+    if limit or page_cursor or sort or filters:
+        return get_records_page('suppliers', limit, page_cursor, sort, filters)
+    return get_reference_data('suppliers')[0]
+
+def _load_all_suppliers():
     """
     Retrieves all supplier records from the database.
     """
@@ -1114,6 +1183,10 @@ def add_new_supplier(supplier_data):
     """
     Handles the logic for adding a new supplier.
     """
+    supplier_id = supplier_data.get('supplier_id') or generate_new_id('SP', 'suppliers')
+    if supplier_id is None:
+        return False, "Could not allocate a new supplier ID."
+
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
@@ -1127,7 +1200,7 @@ def add_new_supplier(supplier_data):
         VALUES (%s, %s, %s, %s, %s, %s)
         """
         values = (
-            supplier_data.get('supplier_id'),
+            supplier_id,
             supplier_data.get('supplier_name'),
             supplier_data.get('contact_person'),
             supplier_data.get('phone'),
@@ -1137,6 +1210,7 @@ def add_new_supplier(supplier_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('suppliers')
         return True, "Supplier added successfully!"
     except Exception as e:
         conn.rollback()
@@ -1160,6 +1234,7 @@ def delete_supplier(supplier_id):
         cursor.execute(sql_delete, (supplier_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('suppliers')
             return True, "Supplier deleted successfully!"
         else:
             return False, "Supplier not found."
@@ -1197,8 +1272,10 @@ def generate_all_suppliers_pdf(suppliers_data):
     """
     if not suppliers_data:
         return None
+    return render_pdf_bytes(_render_all_suppliers, suppliers_data)
 
-    pdf = FPDF()
+def _render_all_suppliers(pdf, suppliers_data):
+    """Draws the supplier listing, yielding after each supplier so pages can be streamed."""
     pdf.add_page()
     pdf.set_font("Arial", size=12)
     
@@ -1214,8 +1291,7 @@ def generate_all_suppliers_pdf(suppliers_data):
         pdf.cell(200, 10, txt=f"Address: {supplier.get('address', 'N/A')}", ln=True, align="L")
         pdf.cell(200, 10, txt=f"Supplier Type: {supplier.get('supplier_type', 'N/A')}", ln=True, align="L")
         pdf.ln(5)
-    
-    return pdf.output(dest='S').encode('latin1')
+        yield
 
 def get_supplier_details(supplier_id):
     """
@@ -1239,6 +1315,7 @@ def get_supplier_details(supplier_id):
         cursor.close()
         conn.close()
         
+@traced('render')
 def generate_supplier_pdf(supplier_data):
     """
     Generates a supplier details PDF.
@@ -1259,7 +1336,7 @@ def generate_supplier_pdf(supplier_data):
     pdf.cell(200, 10, txt=f"Address: {supplier_data.get('address', 'N/A')}", ln=True, align="L")
     pdf.cell(200, 10, txt=f"Supplier Type: {supplier_data.get('supplier_type', 'N/A')}", ln=True, align="L")
     
-    return pdf.output(dest='S').encode('latin1')
+    return pdf_bytes(pdf)
 
 # Function to add existing invoices from the project synopsis
 def add_existing_invoices():
@@ -1286,21 +1363,27 @@ def add_existing_invoices():
         if count == 0:
             cursor.executemany(sql_insert, existing_invoices)
             conn.commit()
+            table_versions.bump('invoices')
             print(f"Successfully added {cursor.rowcount} existing invoices.")
         else:
             print("Invoices table is not empty. Skipping population.")
         return True, "Existing invoices processed."
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         return False, str(err)
     finally:
         cursor.close()
         conn.close()
 
-def get_all_invoices():
+def get_all_invoices(limit=None, page_cursor=None, sort=None, filters=None):
     """
     Retrieves all invoice records from the database.
     """
+    if limit or page_cursor or sort or filters:
+        page = get_records_page('invoices', limit, page_cursor, sort, filters)
+        attach_financials(page.get('invoices'))
+        return page
+
     conn = get_db_connection()
     if conn is None:
         return {'error': 'Database connection failed'}
@@ -1311,7 +1394,7 @@ def get_all_invoices():
     try:
         cursor.execute("SELECT * FROM invoices")
         invoices = cursor.fetchall()
-        return {'invoices': invoices}
+        return {'invoices': attach_financials(invoices)}
     except Exception as e:
         print(f"Logic Handler Error (get_all_invoices): {e}")
         return {'error': 'Failed to retrieve invoices.'}
@@ -1331,8 +1414,8 @@ def generate_new_invoice(invoice_data):
     
     try:
         sql_insert = """
-        INSERT INTO invoices (invoice_id, project_id, client_id, invoice_date, due_date, amount_due, amount_paid, status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        INSERT INTO invoices (invoice_id, project_id, client_id, invoice_date, due_date, bill_amount, amount_due, amount_paid, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         values = (
             invoice_data.get('invoice_id'),
@@ -1340,6 +1423,7 @@ def generate_new_invoice(invoice_data):
             invoice_data.get('client_id'),
             invoice_data.get('invoice_date'),
             invoice_data.get('due_date'),
+            invoice_data.get('bill_amount') or None,
             invoice_data.get('amount_due'),
             invoice_data.get('amount_paid'),
             invoice_data.get('status')
@@ -1347,6 +1431,7 @@ def generate_new_invoice(invoice_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('invoices')
         return True, "Invoice generated successfully!"
     except Exception as e:
         conn.rollback()
@@ -1370,6 +1455,7 @@ def delete_invoice(invoice_id):
         cursor.execute(sql_delete, (invoice_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('invoices')
             return True, "Invoice deleted successfully!"
         else:
             return False, "Invoice not found."
@@ -1381,7 +1467,10 @@ def delete_invoice(invoice_id):
         conn.close()
 
 def get_invoice_details(invoice_id):
-    # ... (Code remains the same, fetches data via JOIN) ...
+    """
+    Fetches one invoice with its client name and address, plus its computed
+    figures (tax lines, totals, balance) under 'financials'.
+    """
     conn = get_db_connection()
     if conn is None:
         return None, "Database connection failed."
@@ -1402,9 +1491,7 @@ def get_invoice_details(invoice_id):
         invoice_data = cursor.fetchone()
         
         if invoice_data:
-            for key, value in invoice_data.items():
-                if isinstance(value, (date, decimal.Decimal)):
-                    invoice_data[key] = str(value)
+            invoice_data['financials'] = invoice_financials(invoice_data)
             
         return invoice_data, "Success"
     except Exception as e:
@@ -1414,6 +1501,8 @@ def get_invoice_details(invoice_id):
         cursor.close()
         conn.close()
 
+@traced('render')
+@cached_pdf('invoice')
 def generate_invoice_pdf(invoice_data):
     """
     Generates a professional invoice PDF with proper table alignment and clear data visibility,
@@ -1423,39 +1512,21 @@ def generate_invoice_pdf(invoice_data):
         return None
 
     pdf = FPDF('P', 'mm', 'A4')
+    _render_invoice(pdf, invoice_data)
+    return pdf_bytes(pdf)
+
+def _render_invoice(pdf, invoice_data):
+    """Draws one invoice on a new page of `pdf`."""
     pdf.add_page()
     pdf.set_auto_page_break(False)
     
-    # --- Data Conversion and Calculation ---
-    def safe_float(key, default=0.00):
-        try:
-            # Use the 'bill_amount' for the NET amount, and 'amount_paid' for payments.
-            return float(invoice_data.get(key, default))
-        except (TypeError, ValueError, decimal.InvalidOperation):
-            return default
-            
-    # CRITICAL CHANGE: Use 'bill_amount' as the Net Amount (Base for Tax)
-    bill_amount_num = safe_float('bill_amount')
-    amount_paid_num = safe_float('amount_paid')
+    # --- Figures (computed once per invoice, in Decimal) ---
+    figures = invoice_financials(invoice_data)
+
+    def text(key, default='N/A'):
+        value = invoice_data.get(key)
+        return default if value is None else str(value)
 
-    tax_rate = 0.09
-    
-    # Calculate tax based on the new bill_amount_num
-    tax_amount = round(bill_amount_num * tax_rate, 2)
-    total_tax_amt = round(tax_amount * 2, 2)
-    subtotal_with_tax = bill_amount_num + total_tax_amt
-    
-    # Assuming a 0.00 round-off for simplicity, as per the code's pattern
-    round_off = 0.00 
-    final_total = round(subtotal_with_tax + round_off, 2)
-    balance_due_num = final_total - amount_paid_num
-        
-    
-    # Calculate final amounts
-    subtotal_with_tax = bill_amount_num + total_tax_amt
-    round_off = 0.58 
-    final_total = round(subtotal_with_tax + round_off, 2) 
-    balance_due_num = final_total - amount_paid_num
     # --- PDF GENERATION START (Header/Details remain the same) ---
     
     # 1. Company Header and Logo (Medium Size)
@@ -1463,7 +1534,7 @@ def generate_invoice_pdf(invoice_data):
     
     # Logo Placeholder - Increased width to 70mm for better visibility
     try:
-        pdf.image('Logo.jpg', x=10, y=10, w=95) 
+        images.place(pdf, LOGO, x=10, y=10, w=95)
     except RuntimeError:
         pdf.set_font('Arial', 'B', 16)
         pdf.cell(70, 10, 'Om Enterprises (LOGO PLACEHOLDER)', 0, 0, 'L')
@@ -1496,26 +1567,26 @@ def generate_invoice_pdf(invoice_data):
     pdf.set_x(x_start_details)
     pdf.cell(30, 5, 'INVOICE NO:', 1, 0, 'L', 1)
     pdf.set_font('Arial', '', 9)
-    pdf.cell(40, 5, invoice_data.get('invoice_id', 'N/A'), 1, 0, 'L', 0)
+    pdf.cell(40, 5, text('invoice_id'), 1, 0, 'L', 0)
     
     pdf.set_x(x_start_details + 80)
     pdf.set_font('Arial', 'B', 9)
     pdf.cell(30, 5, 'DATE:', 1, 0, 'L', 1)
     pdf.set_font('Arial', '', 9)
-    pdf.cell(40, 5, invoice_data.get('invoice_date', 'N/A'), 1, 1, 'L', 0)
+    pdf.cell(40, 5, text('invoice_date'), 1, 1, 'L', 0)
     
     # Row 2: Project ID and Client ID
     pdf.set_x(x_start_details)
     pdf.set_font('Arial', 'B', 9)
     pdf.cell(30, 5, 'PROJECT ID:', 1, 0, 'L', 1)
     pdf.set_font('Arial', '', 9)
-    pdf.cell(40, 5, invoice_data.get('project_id', 'N/A'), 1, 0, 'L', 0)
+    pdf.cell(40, 5, text('project_id'), 1, 0, 'L', 0)
     
     pdf.set_x(x_start_details + 80)
     pdf.set_font('Arial', 'B', 9)
     pdf.cell(30, 5, 'CLIENT ID:', 1, 0, 'L', 1)
     pdf.set_font('Arial', '', 9)
-    pdf.cell(40, 5, invoice_data.get('client_id', 'N/A'), 1, 1, 'L', 0)
+    pdf.cell(40, 5, text('client_id'), 1, 1, 'L', 0)
     
     # Row 3: Status
     pdf.set_x(x_start_details)
@@ -1523,7 +1594,7 @@ def generate_invoice_pdf(invoice_data):
     pdf.cell(30, 5, 'STATUS:', 1, 0, 'L', 1)
     pdf.set_font('Arial', 'B', 9)
     pdf.set_text_color(200, 0, 0)
-    pdf.cell(40, 5, invoice_data.get('status', 'PENDING').upper(), 1, 1, 'L', 0)
+    pdf.cell(40, 5, text('status', 'PENDING').upper(), 1, 1, 'L', 0)
     pdf.set_text_color(0, 0, 0) # Reset color
     pdf.ln(5)
 
@@ -1536,8 +1607,8 @@ def generate_invoice_pdf(invoice_data):
     pdf.cell(95, 6, 'Service To Party', 1, 1, 'C', 1)
     
     # Content Block (Names and Addresses)
-    client_name = invoice_data.get('client_name', 'N/A')
-    client_address = invoice_data.get('client_address', 'N/A')
+    client_name = text('client_name')
+    client_address = text('client_address')
 
     pdf.set_font('Arial', 'B', 8)
     pdf.set_x(10)
@@ -1573,7 +1644,7 @@ def generate_invoice_pdf(invoice_data):
     pdf.cell(15, 6, '01', 1, 0, 'C')
     pdf.cell(125, 6, 'General Project Services (See Project ID)', 1, 0, 'L')
     pdf.cell(25, 6, 'L.S.', 1, 0, 'C') 
-    pdf.cell(25, 6, f"{bill_amount_num:.2f}", 1, 1, 'R')
+    pdf.cell(25, 6, f"{figures['net_amount']:.2f}", 1, 1, 'R')
     
     # Empty space (to match height)
     y_line_items_end = pdf.get_y()
@@ -1620,33 +1691,39 @@ def generate_invoice_pdf(invoice_data):
     pdf.set_font('Arial', 'B', 9)
     pdf.cell(summary_label_width, 6, 'Bill Amount Rs.', 1, 0, 'L', 1)
     pdf.set_font('Arial', '', 9)
-    pdf.cell(summary_value_width, 6, f"Rs. {bill_amount_num:.2f}", 1, 1, 'R', 1) # Now using bill_amount_num
+    pdf.cell(summary_value_width, 6, f"Rs. {figures['net_amount']:.2f}", 1, 1, 'R', 1)
+
+    # Tax already included in a gross-only bill amount is not added again
+    add = '' if figures['tax_included'] else 'Add: '
+
+    def tax_value(key):
+        return 'Incl.' if figures['tax_included'] else f"Rs. {figures[key]:.2f}"
 
     # Row 2: CGST
     pdf.set_x(summary_start_x)
     pdf.set_fill_color(255, 255, 255) 
     pdf.set_font('Arial', '', 9)
-    pdf.cell(summary_label_width, 6, 'Add: CGST @9.00% Rs.', 1, 0, 'L', 0)
-    pdf.cell(summary_value_width, 6, f"Rs. {tax_amount:.2f}", 1, 1, 'R', 0)
+    pdf.cell(summary_label_width, 6, f"{add}CGST @{figures['cgst_rate'] * 100:.2f}% Rs.", 1, 0, 'L', 0)
+    pdf.cell(summary_value_width, 6, tax_value('cgst'), 1, 1, 'R', 0)
     
     # Row 3: SGST
     pdf.set_x(summary_start_x)
-    pdf.cell(summary_label_width, 6, 'Add: SGST @9.00% Rs.', 1, 0, 'L', 0)
-    pdf.cell(summary_value_width, 6, f"Rs. {tax_amount:.2f}", 1, 1, 'R', 0) 
+    pdf.cell(summary_label_width, 6, f"{add}SGST @{figures['sgst_rate'] * 100:.2f}% Rs.", 1, 0, 'L', 0)
+    pdf.cell(summary_value_width, 6, tax_value('sgst'), 1, 1, 'R', 0) 
     
     # Row 4: Total Tax Amount (Sum of CGST + SGST)
     pdf.set_x(summary_start_x)
     pdf.set_fill_color(180, 200, 180) 
     pdf.set_font('Arial', 'B', 9)
     pdf.cell(summary_label_width, 6, 'Total Tax Amt. Rs.', 1, 0, 'L', 1)
-    pdf.cell(summary_value_width, 6, f"Rs. {total_tax_amt:.2f}", 1, 1, 'R', 1) 
+    pdf.cell(summary_value_width, 6, tax_value('total_tax'), 1, 1, 'R', 1) 
 
-    # Row 5: Round Off Amount (0.00 for clean total)
+    # Row 5: Round Off Amount (to the nearest rupee)
     pdf.set_x(summary_start_x)
     pdf.set_fill_color(255, 255, 255) 
     pdf.set_font('Arial', '', 9)
     pdf.cell(summary_label_width, 6, 'Round Off Amt. Rs.', 1, 0, 'L', 0)
-    pdf.cell(summary_value_width, 6, f"0.00", 1, 1, 'R', 0) 
+    pdf.cell(summary_value_width, 6, f"{figures['round_off']:.2f}", 1, 1, 'R', 0) 
 
     # Row 6: Total Bill Amt. With Tax (GRAND TOTAL)
     # Final Total Row
@@ -1654,20 +1731,20 @@ def generate_invoice_pdf(invoice_data):
     pdf.set_fill_color(180, 200, 180) 
     pdf.set_font('Arial', 'B', 10)
     pdf.cell(summary_label_width, 6, 'Total Bill Amt. With Tax Rs.', 1, 0, 'L', 1)
-    pdf.cell(summary_value_width, 6, f"Rs. {final_total:.2f}", 1, 1, 'R', 1) # Final total is calculated correctly
+    pdf.cell(summary_value_width, 6, f"Rs. {figures['total']:.2f}", 1, 1, 'R', 1)
 
     # Row 7: AMOUNT PAID 
     pdf.set_x(summary_start_x)
     pdf.set_fill_color(255, 255, 255)
     pdf.set_font('Arial', 'B', 10)
     pdf.cell(summary_label_width, 6, 'AMOUNT PAID', 1, 0, 'L', 0)
-    pdf.cell(summary_value_width, 6, f"Rs. {amount_paid_num:.2f}", 1, 1, 'R', 0)
+    pdf.cell(summary_value_width, 6, f"Rs. {figures['amount_paid']:.2f}", 1, 1, 'R', 0)
     
     # Row 8: Balance Due (Prominent)
     pdf.set_x(summary_start_x)
     pdf.set_fill_color(255, 230, 230) 
     pdf.cell(summary_label_width, 6, 'BALANCE DUE', 1, 0, 'L', 1)
-    pdf.cell(summary_value_width, 6, f"Rs. {balance_due_num:.2f}", 1, 1, 'R', 1)
+    pdf.cell(summary_value_width, 6, f"Rs. {figures['balance_due']:.2f}", 1, 1, 'R', 1)
 
     pdf.set_y(pdf.get_y() + 10) 
     pdf.set_x(10)
@@ -1682,8 +1759,277 @@ def generate_invoice_pdf(invoice_data):
     # Print the "AUTHORISED SIGNATORY." line
     pdf.set_x(200 - signature_width - 10)
     pdf.cell(signature_width, 5, 'AUTHORISED SIGNATORY.', 0, 1, 'R')
-    
-    return pdf.output(dest='S').encode('latin1')
+
+# --- Batch invoice downloads ---
+# Most invoices a single batch may contain
+INVOICE_BATCH_LIMIT = int(os.getenv("INVOICE_BATCH_LIMIT", "1000"))
+# Below this many invoices, worker start-up costs more than rendering in-process
+INVOICE_BATCH_PARALLEL_MIN = int(os.getenv("INVOICE_BATCH_PARALLEL_MIN", "20"))
+INVOICE_BATCH_WORKERS = int(os.getenv("INVOICE_BATCH_WORKERS", str(os.cpu_count() or 2)))
+# Registered up front, in this order, in every invoice document so page streams
+# rendered separately can be combined into one file
+INVOICE_FONTS = (('Arial', 'B'), ('Arial', ''), ('Arial', 'I'))
+_invoice_batch_executor = None
+
+def get_invoices_for_batch(start_date=None, end_date=None, client_id=None, project_id=None):
+    """
+    Fetches the invoices matching the filters, with the client columns the invoice
+    PDF needs, in one query. Dates are inclusive ISO dates. At most
+    INVOICE_BATCH_LIMIT + 1 rows are returned, so callers can reject oversized batches.
+    Returns (list of invoices, "Success") or (None, error message).
+    """
+    conditions, params = [], []
+    if start_date:
+        conditions.append("i.invoice_date >= %s")
+        params.append(start_date)
+    if end_date:
+        conditions.append("i.invoice_date <= %s")
+        params.append(end_date)
+    if client_id:
+        conditions.append("i.client_id = %s")
+        params.append(client_id)
+    if project_id:
+        conditions.append("i.project_id = %s")
+        params.append(project_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed."
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        sql_query = f"""
+        SELECT 
+            i.*, 
+            c.client_name, 
+            c.address AS client_address 
+        FROM invoices i
+        LEFT JOIN clients c ON i.client_id = c.client_id
+        {where}
+        ORDER BY i.invoice_date, i.invoice_id
+        LIMIT %s
+        """
+        # One extra row tells the caller the batch is over the limit
+        cursor.execute(sql_query, (*params, INVOICE_BATCH_LIMIT + 1))
+        invoices = cursor.fetchall()
+
+        # Same shape as get_invoice_details, so cached PDFs are shared
+        return attach_financials(invoices), "Success"
+    except Exception as e:
+        print(f"Error fetching invoices for batch: {e}")
+        return None, str(e)
+    finally:
+        cursor.close()
+        conn.close()
+
+def _new_invoice_batch_pdf(pdf_class=FPDF):
+    pdf = pdf_class('P', 'mm', 'A4')
+    for family, style in INVOICE_FONTS:
+        pdf.set_font(family, style, 10)
+    try:
+        images.register(pdf, LOGO)
+    except RuntimeError:
+        pass  # the invoices fall back to the text placeholder
+    return pdf
+
+def render_invoice_pages(invoice_data):
+    """
+    Renders one invoice and returns its page streams for merging.
+    Top-level so it can run in a worker process.
+    """
+    pdf = _new_invoice_batch_pdf()
+    _render_invoice(pdf, invoice_data)
+    pdf._endpage()
+    return [pdf.pages[n] for n in range(1, pdf.page + 1)]
+
+def _get_invoice_batch_executor():
+    global _invoice_batch_executor
+    if _invoice_batch_executor is None:
+        _invoice_batch_executor = ProcessPoolExecutor(
+            max_workers=INVOICE_BATCH_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _invoice_batch_executor
+
+def _map_invoices(render, invoices):
+    """Renders the invoices in order, on the worker pool when the batch is large enough."""
+    if len(invoices) < INVOICE_BATCH_PARALLEL_MIN:
+        return map(render, invoices)
+    chunksize = max(1, len(invoices) // (INVOICE_BATCH_WORKERS * 4))
+    return _get_invoice_batch_executor().map(render, invoices, chunksize=chunksize)
+
+@traced('render')
+def stream_invoice_batch_pdf(invoices):
+    """
+    Yields one PDF containing every invoice, each starting on a new page and
+    bookmarked with its number. Pages are sent as soon as they are merged.
+
+    Merging page streams relies on FPDF internals, so with an untested FPDF
+    version (see report_layout.FAST_PATH) the invoices are drawn one after
+    another into a plain FPDF document, sent whole and without bookmarks.
+    """
+    if not FAST_PATH:
+        pdf = FPDF('P', 'mm', 'A4')
+        for invoice_data in invoices:
+            _render_invoice(pdf, invoice_data)
+        yield pdf_bytes(pdf)
+        return
+
+    pdf = _new_invoice_batch_pdf(StreamingFPDF)
+    for invoice_data, pages in zip(invoices, _map_invoices(render_invoice_pages, invoices)):
+        for i, content in enumerate(pages):
+            pdf.add_page()
+            pdf.pages[pdf.page] = content
+            if i == 0:
+                pdf.add_bookmark(f"Invoice {invoice_data.get('invoice_id')} - {invoice_data.get('client_name') or invoice_data.get('client_id')}")
+        data = pdf.drain()
+        if data:
+            yield data
+    yield from pdf.iter_output()
+
+@traced('render')
+def stream_invoice_batch_zip(invoices):
+    """Yields a ZIP archive with one invoice_<id>.pdf per invoice, written as each PDF is ready."""
+    output = ChunkWriter()
+    # PDF content is already compressed, so the entries are stored as-is
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for invoice_data, content in zip(invoices, _map_invoices(generate_invoice_pdf, invoices)):
+            archive.writestr(f"invoice_{invoice_data.get('invoice_id')}.pdf", content)
+            yield output.drain()
+    yield output.drain()
+
+# --- Accounts-receivable aging ---
+# (key, label, lowest and highest days past due; None = open-ended)
+AR_AGING_BUCKETS = (
+    ('current', 'Current', None, 0),
+    ('days_1_30', '1-30 Days', 1, 30),
+    ('days_31_60', '31-60 Days', 31, 60),
+    ('days_61_90', '61-90 Days', 61, 90),
+    ('days_over_90', '90+ Days', 91, None),
+)
+
+def _aging_bucket_sql(low, high):
+    if low is None:
+        condition = f"o.days_overdue <= {high}"
+    elif high is None:
+        condition = f"o.days_overdue >= {low}"
+    else:
+        condition = f"o.days_overdue BETWEEN {low} AND {high}"
+    return f"SUM(CASE WHEN {condition} THEN o.balance ELSE 0 END)"
+
+_AGING_BUCKET_COLUMNS = ',\n    '.join(
+    f"{_aging_bucket_sql(low, high)} AS `{key}`" for key, _, low, high in AR_AGING_BUCKETS
+)
+
+# Served by idx_invoices_aging and idx_payments_invoice_amount (see schema.py).
+# The invoice total and the amount paid follow the same rules as the printed
+# invoice and the reconciliation (invoice_total_sql and invoice_paid_sql in
+# invoice_financials), so a balance is the same before and after reconciling.
+AR_AGING_SQL = f"""
+SELECT
+    o.client_id,
+    MAX(c.client_name) AS client_name,
+    COUNT(*) AS open_invoices,
+    MAX(o.days_overdue) AS oldest_days_overdue,
+    {_AGING_BUCKET_COLUMNS},
+    SUM(o.balance) AS total
+FROM (
+    SELECT
+        i.client_id,
+        DATEDIFF(%s, COALESCE(i.due_date, i.invoice_date)) AS days_overdue,
+        {invoice_total_sql('i.')} - {invoice_paid_sql(
+            '(SELECT SUM(p.amount) FROM payments p WHERE p.invoice_id = i.invoice_id)', 'i.')} AS balance
+    FROM invoices i
+    WHERE (i.status IS NULL OR i.status <> 'Paid')
+      AND i.invoice_date <= %s
+      {{client_filter}}
+) o
+LEFT JOIN clients c ON c.client_id = o.client_id
+WHERE o.balance > 0
+GROUP BY o.client_id
+ORDER BY total DESC, o.client_id
+"""
+
+def get_ar_aging(as_of=None, client_id=None):
+    """
+    Outstanding invoice balances per client, split by days past due as of `as_of`
+    (an ISO date, default today). Invoices marked Paid or fully paid are left out.
+    Returns ({'as_of', 'buckets', 'clients', 'totals'}, "Success") or (None, error message).
+    """
+    as_of = as_of or date.today().isoformat()
+    params = [as_of, as_of]
+    client_filter = ""
+    if client_id:
+        client_filter = "AND i.client_id = %s"
+        params.append(client_id)
+
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed."
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        cursor.execute(AR_AGING_SQL.format(client_filter=client_filter), params)
+        clients = cursor.fetchall()
+
+        keys = [key for key, _, _, _ in AR_AGING_BUCKETS] + ['total']
+        totals = dict.fromkeys(keys, decimal.Decimal('0.00'))
+        totals['open_invoices'] = 0
+        for row in clients:
+            for key in keys:
+                row[key] = to_decimal(row[key]).quantize(decimal.Decimal('0.01'))
+                totals[key] += row[key]
+            row['open_invoices'] = int(row['open_invoices'])
+            row['oldest_days_overdue'] = int(row['oldest_days_overdue'])
+            totals['open_invoices'] += row['open_invoices']
+
+        report = {
+            'as_of': as_of,
+            'buckets': [{'key': key, 'label': label} for key, label, _, _ in AR_AGING_BUCKETS],
+            'clients': clients,
+            'totals': totals,
+        }
+        return report, "Success"
+    except Exception as e:
+        print(f"Logic Handler Error (get_ar_aging): {e}")
+        return None, str(e)
+    finally:
+        cursor.close()
+        conn.close()
+
+def _aging_amount(key):
+    return lambda row: f"{row[key]:,.2f}"
+
+AR_AGING_TABLE = TableLayout(
+    [Column('Client ID', 20, 'client_id'), Column('Client Name', 44, 'client_name')]
+    + [Column(label, 21, _aging_amount(key), align='R', header_align='C') for key, label, _, _ in AR_AGING_BUCKETS]
+    + [Column('Total', 21, _aging_amount('total'), align='R', header_align='C')],
+    header_font=('Arial', 'B', 9), body_font=('Arial', '', 8),
+)
+
+def generate_ar_aging_pdf(report):
+    """Renders the aging report from get_ar_aging() as a one-table PDF."""
+    return render_pdf_bytes(_render_ar_aging, report)
+
+def _render_ar_aging(pdf, report):
+    pdf.add_page()
+    company_header(pdf, f"Accounts Receivable Aging as of {report['as_of']}")
+    section_title(pdf, "Outstanding Balances by Client")
+    yield from AR_AGING_TABLE.render(pdf, report['clients'])
+
+    # Totals row, in bold, under the table
+    totals = report['totals']
+    pdf.set_font("Arial", 'B', 8)
+    columns = AR_AGING_TABLE.columns
+    pdf.cell(columns[0].width + columns[1].width, 6, f"Total ({totals['open_invoices']} invoices)", 1, 0, 'L')
+    for i, (key, _, _, _) in enumerate(AR_AGING_BUCKETS):
+        pdf.cell(columns[i + 2].width, 6, f"{totals[key]:,.2f}", 1, 0, 'R')
+    pdf.cell(columns[-1].width, 6, f"{totals['total']:,.2f}", 1, 1, 'R')
+
+    pdf.ln(5)
+    report_footer(pdf)
 
 def add_existing_payments():
     """Adds existing payment data from the project document."""
@@ -1705,19 +2051,23 @@ def add_existing_payments():
         if count == 0:
             cursor.executemany(sql_insert, existing_payments)
             conn.commit()
+            table_versions.bump('payments')
             print(f"Successfully added {cursor.rowcount} existing payments.")
         else:
             print("Payments table is not empty. Skipping population.")
         return True, "Existing payments processed."
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         return False, str(err)
     finally:
         cursor.close()
         conn.close()
 
-def get_all_payments():
+def get_all_payments(limit=None, page_cursor=None, sort=None, filters=None):
     """Retrieves all payment records from the database."""
+    if limit or page_cursor or sort or filters:
+        return get_records_page('payments', limit, page_cursor, sort, filters)
+
     conn = get_db_connection()
     if conn is None:
         return {'error': 'Database connection failed'}
@@ -1734,19 +2084,126 @@ def get_all_payments():
         cursor.close()
         conn.close()
 
+# --- Invoice/payment reconciliation ---
+# Reconciling never lowers an invoice's amount_paid: it becomes the larger of
+# the stored amount and the sum of its payments (invoice_paid_sql, the rule the
+# aging report uses too), and the status follows from that against the invoice
+# total (invoice_total_sql). Every reconciliation path applies this same rule.
+INVOICE_PAID = 'Paid'
+INVOICE_PARTIALLY_PAID = 'Partially Paid'
+INVOICE_UNPAID = 'Unpaid'
+
+def _invoice_status_sql(paid, alias=''):
+    """SQL expression for the status of the invoices row `alias` with `paid` paid against it."""
+    return (f"CASE WHEN {paid} >= {invoice_total_sql(alias)} THEN '{INVOICE_PAID}' "
+            f"WHEN {paid} > 0 THEN '{INVOICE_PARTIALLY_PAID}' ELSE '{INVOICE_UNPAID}' END")
+
+# MySQL sees the new amount_paid in the status expression, SQLite the old one;
+# GREATEST() gives the same result either way
+RECONCILE_INVOICE_SQL = f"""
+UPDATE invoices
+SET amount_paid = {invoice_paid_sql('%s')}, status = {_invoice_status_sql(invoice_paid_sql('%s'))}
+WHERE invoice_id = %s
+"""
+
+# Run before a payment is deleted: takes its amount back out of amount_paid
+# when that amount is exactly the payments' sum, i.e. it came from them. An
+# amount entered on the invoice itself is left as it is.
+RELEASE_PAYMENT_SQL = """
+UPDATE invoices
+SET amount_paid = amount_paid - %s
+WHERE invoice_id = %s
+  AND ROUND(amount_paid, 2) = (SELECT ROUND(SUM(amount), 2) FROM payments WHERE invoice_id = %s)
+"""
+
+# Re-derives every invoice in one statement from one grouped pass over payments,
+# with the same figures reconcile_invoice() computes for a single invoice.
+RECONCILE_ALL_INVOICES_SQL = f"""
+UPDATE invoices i
+LEFT JOIN (
+    SELECT invoice_id, SUM(amount) AS paid
+    FROM payments
+    GROUP BY invoice_id
+) p ON p.invoice_id = i.invoice_id
+SET i.amount_paid = {invoice_paid_sql('p.paid', 'i.')},
+    i.status = {_invoice_status_sql(invoice_paid_sql('p.paid', 'i.'), 'i.')}
+"""
+if DB_BACKEND == 'sqlite':
+    # SQLite has no multi-table UPDATE: the same figures from a correlated subquery
+    _PAID_SQL = invoice_paid_sql("(SELECT SUM(amount) FROM payments p WHERE p.invoice_id = invoices.invoice_id)")
+    RECONCILE_ALL_INVOICES_SQL = f"""
+UPDATE invoices
+SET amount_paid = {_PAID_SQL},
+    status = {_invoice_status_sql(_PAID_SQL)}
+"""
+
+def _lock_invoice(cursor, invoice_id):
+    """
+    Locks the invoice row until the transaction ends, so concurrent payments
+    against the same invoice are reconciled one after the other.
+    Returns False if there is no such invoice.
+    """
+    cursor.execute("SELECT invoice_id FROM invoices WHERE invoice_id = %s FOR UPDATE", (invoice_id,))
+    return cursor.fetchone() is not None
+
+def reconcile_invoice(cursor, invoice_id):
+    """
+    Recomputes one invoice's amount_paid and status from its payments, inside the
+    caller's transaction (see the rule above). Uses idx_payments_invoice_amount, so the cost depends on
+    the invoice's own payments only.
+    """
+    cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM payments WHERE invoice_id = %s", (invoice_id,))
+    paid = cursor.fetchone()[0]
+    cursor.execute(RECONCILE_INVOICE_SQL, (paid, paid, paid, invoice_id))
+
+def reconcile_all_invoices():
+    """
+    Re-reconciles every invoice against the payments table in a single grouped
+    UPDATE, e.g. after payments were changed outside the application.
+    Returns (number of invoices changed, "Success") or (None, error message).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None, "Database connection failed."
+    cursor = conn.cursor()
+    try:
+        cursor.execute(RECONCILE_ALL_INVOICES_SQL)
+        conn.commit()
+        if cursor.rowcount:
+            table_versions.bump('invoices')
+        return cursor.rowcount, "Success"
+    except Exception as e:
+        conn.rollback()
+        print(f"Logic Handler Error (reconcile_all_invoices): {e}")
+        return None, str(e)
+    finally:
+        cursor.close()
+        conn.close()
+
 def record_new_payment(payment_data):
-    """Records a new payment record and saves it to the database."""
+    """
+    Records a new payment and, in the same transaction, updates the paid amount
+    and status of the invoice it pays.
+    """
+    # Reserved before the invoice is locked, too: the reservation commits on
+    # its own connection, which SQLite would block behind this transaction
+    payment_id = payment_data.get('payment_id') or generate_new_id('PY', 'payments')
+    if payment_id is None:
+        return False, "Could not allocate a new payment ID."
+
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
     cursor = conn.cursor()
+    invoice_id = payment_data.get('invoice_id')
     try:
+        invoice_exists = invoice_id is not None and _lock_invoice(cursor, invoice_id)
         sql_insert = """
         INSERT INTO payments (payment_id, transaction_id, invoice_id, payment_date, amount, payment_method)
         VALUES (%s, %s, %s, %s, %s, %s)
         """
         values = (
-            payment_data.get('payment_id'),
+            payment_id,
             payment_data.get('transaction_id'),
             payment_data.get('invoice_id'),
             payment_data.get('payment_date'),
@@ -1754,7 +2211,10 @@ def record_new_payment(payment_data):
             payment_data.get('payment_method')
         )
         cursor.execute(sql_insert, values)
+        if invoice_exists:
+            reconcile_invoice(cursor, invoice_id)
         conn.commit()
+        table_versions.bump('payments', 'invoices')
         return True, "Payment recorded successfully!"
     except Exception as e:
         conn.rollback()
@@ -1764,16 +2224,27 @@ def record_new_payment(payment_data):
         conn.close()
 
 def delete_payment(payment_id):
-    """Handles the logic for deleting a payment."""
+    """Deletes a payment and, in the same transaction, re-reconciles the invoice it paid."""
     conn = get_db_connection()
     if conn is None:
         return False, "Database connection failed."
     cursor = conn.cursor()
     sql_delete = "DELETE FROM payments WHERE payment_id = %s"
     try:
+        cursor.execute("SELECT invoice_id, amount FROM payments WHERE payment_id = %s", (payment_id,))
+        row = cursor.fetchone()
+        invoice_id, amount = row if row else (None, None)
+        invoice_exists = invoice_id is not None and _lock_invoice(cursor, invoice_id)
+        if invoice_exists and amount is not None:
+            cursor.execute(RELEASE_PAYMENT_SQL, (amount, invoice_id, invoice_id))
+
         cursor.execute(sql_delete, (payment_id,))
+        deleted = cursor.rowcount
+        if deleted > 0 and invoice_exists:
+            reconcile_invoice(cursor, invoice_id)
         conn.commit()
-        if cursor.rowcount > 0:
+        if deleted > 0:
+            table_versions.bump('payments', 'invoices')
             return True, "Payment deleted successfully!"
         else:
             return False, "Payment not found."
@@ -1809,7 +2280,7 @@ class PDF(FPDF):
     def header(self):
         """Custom header with logo and gray line."""
         try:
-            self.image("Logo.jpg", x=10, y=10, w=95)  # Company logo on top-left
+            images.place(self, LOGO, x=10, y=10, w=95)  # Company logo on top-left
         except:
             self.set_font("Arial", "B", 14)
             self.cell(0, 10, "Company Name", ln=True, align="L")
@@ -1828,6 +2299,9 @@ class PDF(FPDF):
         self.cell(0, 10, "This is a system-generated receipt. No signature required.", 0, 1, "C")
 
 
+# The receipt prints today's date, so the cached copy is only reused on the same day
+@traced('render')
+@cached_pdf('payment', extra_key=lambda: date.today().isoformat())
 def generate_payment_pdf(payment_data):
     """Generate a clean, professional payment receipt."""
     if not payment_data:
@@ -1897,9 +2371,15 @@ def generate_payment_pdf(payment_data):
     pdf.cell(0, 10, "(Finance Department)", ln=True, align="R")
 
     # Output as binary data
-    return pdf.output(dest='S').encode('latin1')
+    return pdf_bytes(pdf)
 
 def get_all_services():
+    """
+    Retrieves all service records, from the reference-data cache when it is fresh.
+    """
+    return get_reference_data('services')[0]
+
+def _load_all_services():
     """
     Retrieves all service records from the database using corrected case.
     """
@@ -1947,6 +2427,7 @@ def add_new_service(service_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('services')
         return True, "Service added successfully!"
     except Exception as e:
         conn.rollback()
@@ -1970,6 +2451,7 @@ def delete_service(service_id):
         cursor.execute(sql_delete, (service_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('services')
             return True, "Service deleted successfully!"
         else:
             return False, "Service not found."
@@ -2003,11 +2485,12 @@ def add_existing_services():
         if count == 0:
             cursor.executemany(sql_insert, existing_services)
             conn.commit()
+            table_versions.bump('services')
             print(f"Successfully added {cursor.rowcount} existing services.")
         else:
             print("Services table is not empty. Skipping population.")
         return True, "Existing services processed."
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         return False, str(err)
     finally:
@@ -2040,18 +2523,25 @@ def add_existing_materials():
         if count == 0:
             cursor.executemany(sql_insert, existing_materials)
             conn.commit()
+            table_versions.bump('materials')
             print(f"Successfully added {cursor.rowcount} existing materials.")
         else:
             print("Materials table is not empty. Skipping population.")
         return True, "Existing materials processed."
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         conn.rollback()
         return False, str(err)
     finally:
         cursor.close()
         conn.close()
 
-def get_all_materials():
+def get_all_materials(limit=None, page_cursor=None, sort=None, filters=None):
+    """Retrieves all material records, from the reference-data cache when it is fresh."""
+    if limit or page_cursor or sort or filters:
+        return get_records_page('materials', limit, page_cursor, sort, filters)
+    return get_reference_data('materials')[0]
+
+def _load_all_materials():
     """Retrieves all material records from the database."""
     conn = get_db_connection()
     if conn is None:
@@ -2071,6 +2561,22 @@ def get_all_materials():
         cursor.close()
         conn.close()
 
+# Small, rarely changing tables served through reference_cache
+REFERENCE_LOADERS = {
+    'services': _load_all_services,
+    'materials': _load_all_materials,
+    'suppliers': _load_all_suppliers,
+}
+
+def get_reference_data(table):
+    """
+    Returns (payload, etag) for a reference table: the same payload as its
+    get_all_* function and a hash of its content (None on errors). Entries are
+    reloaded when the table's version changes.
+    """
+    version, _ = table_versions.current((table,))
+    return reference_cache.get(table, REFERENCE_LOADERS[table], version)
+
 def add_new_material(material_data):
     """Handles the logic for adding a new material."""
     conn = get_db_connection()
@@ -2095,6 +2601,7 @@ def add_new_material(material_data):
         
         cursor.execute(sql_insert, values)
         conn.commit()
+        table_versions.bump('materials')
         return True, "Material added successfully!"
     except Exception as e:
         conn.rollback()
@@ -2116,6 +2623,7 @@ def delete_material(material_id):
         cursor.execute(sql_delete, (material_id,))
         conn.commit()
         if cursor.rowcount > 0:
+            table_versions.bump('materials')
             return True, "Material deleted successfully!"
         else:
             return False, "Material not found."
@@ -2155,6 +2663,8 @@ def get_material_details(material_id):
         cursor.close()
         conn.close()
         
+@traced('render')
+@cached_pdf('material')
 def generate_material_pdf(material_data):
     """Generates a professional single-material PDF report."""
     if not material_data:
@@ -2163,27 +2673,10 @@ def generate_material_pdf(material_data):
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(False)
-    
-    # --- COMPANY HEADER ---
-    pdf.set_fill_color(0, 77, 153)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 20)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_font("Arial", '', 10)
-    pdf.cell(0, 5, 'Material Inventory Profile', 0, 1, 'C', 0)
-    pdf.ln(10)
+    company_header(pdf, 'Material Inventory Profile', title_size=20, subtitle_size=10)
     
     # --- MATERIAL IDENTIFICATION ---
-    pdf.set_text_color(0, 0, 0)
-    material_name = material_data.get('material_name', 'N/A')
-    
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, f"MATERIAL: {material_name.upper()}", 0, 1, 'L')
-    pdf.set_line_width(0.5)
-    pdf.set_draw_color(0, 77, 153)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
+    section_title(pdf, f"MATERIAL: {material_data.get('material_name', 'N/A').upper()}")
 
     # --- DETAILS TABLE (Two Columns) ---
     
@@ -2210,12 +2703,8 @@ def generate_material_pdf(material_data):
     print_detail_row('Supplier ID:', material_data.get('supplier_id', 'N/A'))
 
     pdf.ln(15)
-
-    # --- FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
-    return pdf.output(dest='S').encode('latin1')
+    report_footer(pdf)
+    return pdf_bytes(pdf)
 
 def get_all_materials_data():
     """Fetches all material records to generate a PDF."""
@@ -2230,14 +2719,8 @@ def get_all_materials_data():
         cursor.execute(sql_query)
         materials_data = cursor.fetchall()
         
-        # --- FIX: Safe Type Conversion ---
         for material in materials_data:
-            for key, value in material.items():
-                if isinstance(value, (date, decimal.Decimal, int)): # Ensure all numeric types are covered
-                    material[key] = str(value)
-                elif value is None:
-                    material[key] = 'N/A'
-        # --- END FIX ---
+            _stringify_material(material)
         
         return materials_data, "Success"
     except Exception as e:
@@ -2247,63 +2730,87 @@ def get_all_materials_data():
         cursor.close()
         conn.close()
 
+def _stringify_material(material):
+    """Converts a materials row to the printable strings the material PDFs expect."""
+    # --- FIX: Safe Type Conversion ---
+    for key, value in material.items():
+        if isinstance(value, (date, decimal.Decimal, int)): # Ensure all numeric types are covered
+            material[key] = str(value)
+        elif value is None:
+            material[key] = 'N/A'
+    # --- END FIX ---
+    return material
+
 def generate_all_materials_pdf(materials_data):
     """Generates a single, professional PDF report for all materials."""
     if not materials_data:
         return None
+    return render_pdf_bytes(_render_all_materials, materials_data)
 
-    pdf = FPDF()
+
+MATERIAL_ROSTER_TABLE = TableLayout([
+    Column('ID', 15, 'material_id', 'C'),
+    Column('Material Name', 45, 'material_name'),
+    Column('Manufacturer', 30, 'manufacturer'),
+    Column('Price (Rs)', 25, lambda material: f"Rs. {material.get('unit_price', '0.00')}", 'R'),
+    Column('Stock Qty', 25, 'stock_quantity', 'R', default='0'),
+    Column('Supplier ID', 30, 'supplier_id'),
+], header_font=('Arial', 'B', 9), body_font=('Arial', '', 8))
+
+def _render_all_materials(pdf, materials_data):
+    """Draws the material inventory, yielding after each row so pages can be streamed."""
     pdf.add_page()
     pdf.set_auto_page_break(True, margin=15)
-    
-    # --- GLOBAL HEADER ---
-    pdf.set_fill_color(0, 77, 153)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 24)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 5, 'Comprehensive Material Inventory Report', 0, 1, 'C', 0)
-    pdf.ln(10)
-    
-    pdf.set_text_color(0, 0, 0)
-    
-    # --- TABLE SETUP ---
-    pdf.set_font('Arial', 'B', 9)
-    pdf.set_fill_color(220, 220, 220)
-    
-    # Define Column Widths
-    col_widths = [15, 45, 30, 25, 25, 30] 
-    
-    # Table Headers
-    pdf.cell(col_widths[0], 7, 'ID', 1, 0, 'C', 1)
-    pdf.cell(col_widths[1], 7, 'Material Name', 1, 0, 'L', 1)
-    pdf.cell(col_widths[2], 7, 'Manufacturer', 1, 0, 'L', 1)
-    pdf.cell(col_widths[3], 7, 'Price (Rs)', 1, 0, 'R', 1)
-    pdf.cell(col_widths[4], 7, 'Stock Qty', 1, 0, 'R', 1)
-    pdf.cell(col_widths[5], 7, 'Supplier ID', 1, 1, 'L', 1)
-
-    # --- TABLE BODY ---
-    pdf.set_font('Arial', '', 8)
-    pdf.set_fill_color(255, 255, 255)
-    
-    for material in materials_data:
-        # Data conversion is handled in the fetching function
-        pdf.cell(col_widths[0], 6, material.get('material_id', 'N/A'), 1, 0, 'C', 0)
-        pdf.cell(col_widths[1], 6, material.get('material_name', 'N/A'), 1, 0, 'L', 0)
-        pdf.cell(col_widths[2], 6, material.get('manufacturer', 'N/A'), 1, 0, 'L', 0)
-        pdf.cell(col_widths[3], 6, f"Rs. {material.get('unit_price', '0.00')}", 1, 0, 'R', 0)
-        pdf.cell(col_widths[4], 6, material.get('stock_quantity', '0'), 1, 0, 'R', 0)
-        pdf.cell(col_widths[5], 6, material.get('supplier_id', 'N/A'), 1, 1, 'L', 0)
-        
+    company_header(pdf, 'Comprehensive Material Inventory Report')
+    # Data conversion is handled by _stringify_material
+    yield from MATERIAL_ROSTER_TABLE.render(pdf, materials_data)
     pdf.ln(10)
+    report_footer(pdf)
+
+# --- Streaming roster PDFs ---
+# table -> (page renderer, per-row preparation)
+ROSTER_PDF_RENDERERS = {
+    'clients': (_render_all_clients, None),
+    'projects': (_render_all_projects, None),
+    'employees': (_render_all_employees, None),
+    'suppliers': (_render_all_suppliers, None),
+    'materials': (_render_all_materials, _stringify_material),
+}
+
+def stream_roster_pdf(table):
+    """
+    Renders the roster PDF for `table` while reading its rows from a streaming cursor,
+    yielding each page's bytes as soon as it is finished.
+    Returns (byte chunk generator, "Success") or (None, error message).
+    """
+    if table not in ROSTER_PDF_RENDERERS:
+        return None, f"No roster PDF for '{table}'."
+    render, prepare = ROSTER_PDF_RENDERERS[table]
+
+    rows, message = stream_all_records(table)
+    if rows is None:
+        return None, message
+    first = next(rows, None)
+    if first is None:
+        rows.close()
+        return None, "No records found."
+
+    def records():
+        yield first
+        yield from rows
+
+    def chunks():
+        # Closing the generator (end of response or client disconnect) releases the connection
+        try:
+            source = map(prepare, records()) if prepare else records()
+            yield from stream_pdf(render, source)
+        except Exception as e:
+            print(f"Logic Handler Error (stream_roster_pdf {table}): {e}")
+            raise
+        finally:
+            rows.close()
 
-    # --- FINAL FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
-    # FIX: Remove the redundant .encode('latin1')
-    return pdf.output(dest='S').encode('latin1')
+    return chunks(), "Success"
 
 def get_employee_details(employee_id):
     """Fetches details of a single employee to generate a PDF."""
@@ -2325,6 +2832,7 @@ def get_employee_details(employee_id):
         cursor.close()
         conn.close()
         
+@traced('render')
 def generate_employee_pdf(employee_data):
     """Generates an employee details PDF."""
     if not employee_data:
@@ -2348,7 +2856,7 @@ def generate_employee_pdf(employee_data):
     pdf.cell(200, 10, txt=f"Salary: {employee_data.get('salary', 'N/A')}", ln=True, align="L")
     pdf.cell(200, 10, txt=f"Status: {employee_data.get('status', 'N/A')}", ln=True, align="L")
     
-    return pdf.output(dest='S').encode('latin1')
+    return pdf_bytes(pdf)
 
 
 def verify_admin_credentials(username, password):
@@ -2403,35 +2911,31 @@ def get_all_employees_data_for_report():
         conn.close()
 
 
-def generate_master_pdf_report():
-    """
-    Generates a single, professional PDF report containing data from Clients, Projects, and Employees.
-    """
-    projects_data, msg_p = get_all_projects_data()
-    clients_data = get_all_clients_data_for_report()
-    employees_data = get_all_employees_data_for_report()
+# --- Master report ---
+# Every section is rendered into its own FPDF document (possibly in another process)
+# and the finished page streams are spliced into one output document. Fonts are
+# registered in the same order in every document so the /F<n> references in the
+# page streams stay valid after merging. Splicing relies on FPDF internals
+# (_endpage, the pages table, font numbering), so with an untested FPDF version
+# (see report_layout.FAST_PATH) the sections are drawn into one document instead.
+MASTER_REPORT_FONTS = (('Arial', 'B'), ('Arial', ''), ('Arial', 'I'))
+# Below this many rows, process start-up costs more than rendering the sections serially
+MASTER_REPORT_PARALLEL_ROWS = int(os.getenv("MASTER_REPORT_PARALLEL_ROWS", "1000"))
+_master_section_executor = None
 
+def _new_master_pdf():
     pdf = FPDF()
-    pdf.add_page()
-    
-    # --- GLOBAL HEADER ---
-    pdf.set_fill_color(0, 77, 153)
-    pdf.set_text_color(255, 255, 255)
-    pdf.set_font("Arial", 'B', 24)
-    pdf.cell(0, 15, 'OM Enterprises', 0, 1, 'C', 1)
-    
-    pdf.set_font("Arial", '', 12)
-    pdf.cell(0, 5, 'Comprehensive CMS Master Report', 0, 1, 'C', 0)
-    pdf.ln(15)
-    
-    pdf.set_text_color(0, 0, 0)
-    
+    for family, style in MASTER_REPORT_FONTS:
+        pdf.set_font(family, style, 10)
+    return pdf
+
+
+def _render_master_header(pdf):
+    company_header(pdf, 'Comprehensive CMS Master Report', gap=15)
+
+def _render_master_projects(pdf, projects_data):
     # --- 1. PROJECTS SECTION ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, '1. Projects Overview', 0, 1, 'L')
-    pdf.set_line_width(0.4)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
+    section_title(pdf, '1. Projects Overview', line_width=0.4, color=(0, 0, 0))
     
     if projects_data:
         for project in projects_data:
@@ -2445,126 +2949,425 @@ def generate_master_pdf_report():
             pdf.cell(0, 5, f"Value: Rs. {project.get('contract_value', '0.00')}", 0, 1)
             
             pdf.cell(5, 5, '', 0, 0) # Indent
-            pdf.multi_cell(0, 5, f"Description: {project.get('description', 'N/A')[:50]}...", 0, 'L')
+            pdf.multi_cell(0, 5, f"Description: {(project.get('description') or 'N/A')[:50]}...", 0, 'L')
             pdf.ln(2)
     else:
         pdf.set_font("Arial", 'I', 10)
         pdf.cell(0, 5, 'No active project data found.', 0, 1, 'L')
     pdf.ln(10)
-    
+
+
+MASTER_CLIENTS_TABLE = TableLayout([
+    Column('ID', 20, 'client_id', 'C'),
+    Column('Name', 50, 'client_name'),
+    Column('Contact Person', 40, 'contact_person'),
+    Column('Phone', 40, 'phone'),
+], body_font=('Arial', '', 10), header_fill=(240, 240, 240))
+
+def _render_master_clients(pdf, clients_data):
     # --- 2. CLIENTS SECTION ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, '2. Clients Summary', 0, 1, 'L')
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
+    pdf.set_text_color(0, 0, 0)
+    section_title(pdf, '2. Clients Summary', line_width=0.4, color=(0, 0, 0))
 
     if clients_data:
-        # Table Headers
-        pdf.set_fill_color(240, 240, 240)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(20, 7, 'ID', 1, 0, 'C', 1)
-        pdf.cell(50, 7, 'Name', 1, 0, 'L', 1)
-        pdf.cell(40, 7, 'Contact Person', 1, 0, 'L', 1)
-        pdf.cell(40, 7, 'Phone', 1, 1, 'L', 1)
-        
-        # Table Data
-        pdf.set_font('Arial', '', 10)
-        for client in clients_data:
-            pdf.cell(20, 6, client.get('client_id', 'N/A'), 1, 0, 'C', 0)
-            pdf.cell(50, 6, client.get('client_name', 'N/A'), 1, 0, 'L', 0)
-            pdf.cell(40, 6, client.get('contact_person', 'N/A'), 1, 0, 'L', 0)
-            pdf.cell(40, 6, client.get('phone', 'N/A'), 1, 1, 'L', 0)
+        for _ in MASTER_CLIENTS_TABLE.render(pdf, clients_data):
+            pass
     else:
         pdf.set_font("Arial", 'I', 10)
         pdf.cell(0, 5, 'No client data found.', 0, 1, 'L')
     pdf.ln(10)
 
+
+MASTER_EMPLOYEES_TABLE = TableLayout([
+    Column('ID', 20, 'employee_id', 'C'),
+    Column('Name', 40, lambda emp: f"{emp.get('first_name', '')} {emp.get('last_name', '')}"),
+    Column('Role', 40, 'role'),
+    Column('Status', 25, 'status', 'C'),
+], body_font=('Arial', '', 10), header_fill=(240, 240, 240))
+
+def _render_master_employees(pdf, employees_data):
     # --- 3. EMPLOYEES SECTION ---
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(0, 10, '3. Employee Roster', 0, 1, 'L')
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(5)
+    pdf.set_text_color(0, 0, 0)
+    section_title(pdf, '3. Employee Roster', line_width=0.4, color=(0, 0, 0))
 
     if employees_data:
-        # Table Headers
-        pdf.set_fill_color(240, 240, 240)
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(20, 7, 'ID', 1, 0, 'C', 1)
-        pdf.cell(40, 7, 'Name', 1, 0, 'L', 1)
-        pdf.cell(40, 7, 'Role', 1, 0, 'L', 1)
-        pdf.cell(25, 7, 'Status', 1, 1, 'C', 1)
-        
-        # Table Data
-        pdf.set_font('Arial', '', 10)
-        for emp in employees_data:
-            name = f"{emp.get('first_name', '')} {emp.get('last_name', '')}"
-            pdf.cell(20, 6, emp.get('employee_id', 'N/A'), 1, 0, 'C', 0)
-            pdf.cell(40, 6, name, 1, 0, 'L', 0)
-            pdf.cell(40, 6, emp.get('role', 'N/A'), 1, 0, 'L', 0)
-            pdf.cell(25, 6, emp.get('status', 'N/A'), 1, 1, 'C', 0)
+        for _ in MASTER_EMPLOYEES_TABLE.render(pdf, employees_data):
+            pass
     else:
         pdf.set_font("Arial", 'I', 10)
         pdf.cell(0, 5, 'No employee data found.', 0, 1, 'L')
 
     # --- FINAL FOOTER ---
-    pdf.set_font("Arial", 'I', 10)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 5, 'Report Generated by CMS System', 0, 1, 'C')
+    report_footer(pdf)
 
-    return pdf.output(dest='S').encode('latin1')
+def render_master_section(section, data):
+    """
+    Renders one master report section into its own document and returns its page streams.
+    Top-level so it can run in a worker process.
+    """
+    pdf = _new_master_pdf()
+    _draw_master_section(pdf, section, data)
+    pdf._endpage()
+    return [pdf.pages[n] for n in range(1, pdf.page + 1)]
 
-def get_dashboard_counts():
+def _draw_master_section(pdf, section, data):
+    """Draws one master report section, starting on a new page of `pdf`."""
+    pdf.add_page()
+    if section == 'projects':
+        _render_master_header(pdf)
+        _render_master_projects(pdf, data)
+    elif section == 'clients':
+        _render_master_clients(pdf, data)
+    else:
+        _render_master_employees(pdf, data)
+
+def _get_master_section_executor():
+    global _master_section_executor
+    if _master_section_executor is None:
+        _master_section_executor = ProcessPoolExecutor(
+            max_workers=3, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _master_section_executor
+
+def fetch_master_report_data():
+    """Fetches projects, clients and employees concurrently, each on its own pooled connection."""
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        projects_future = executor.submit(get_all_projects_data)
+        clients_future = executor.submit(get_all_clients_data_for_report)
+        employees_future = executor.submit(get_all_employees_data_for_report)
+        projects_data, msg_p = projects_future.result()
+        return projects_data, clients_future.result(), employees_future.result()
+
+@traced('render')
+def generate_master_pdf_report():
     """
-    Handles the logic for fetching dashboard counts, including detailed project status data (counts and names).
+    Generates a single, professional PDF report containing data from Clients, Projects, and Employees.
+    Data is fetched concurrently; large reports render their sections in parallel worker processes.
+    Each section starts on a new page.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return {'error': 'Database connection failed'}
+    # The queries run on other threads, which the request's spans do not follow
+    with span('db'):
+        projects_data, clients_data, employees_data = fetch_master_report_data()
+    sections = [
+        ('projects', projects_data),
+        ('clients', clients_data),
+        ('employees', employees_data),
+    ]
 
-    cursor = conn.cursor()
-    counts = {}
+    if not FAST_PATH:
+        pdf = _new_master_pdf()
+        for section, data in sections:
+            _draw_master_section(pdf, section, data)
+        return pdf_bytes(pdf)
+
+    total_rows = sum(len(data or []) for _, data in sections)
+    if total_rows >= MASTER_REPORT_PARALLEL_ROWS:
+        executor = _get_master_section_executor()
+        futures = [executor.submit(render_master_section, section, data) for section, data in sections]
+        section_pages = [future.result() for future in futures]
+    else:
+        section_pages = [render_master_section(section, data) for section, data in sections]
 
+    # Splice the finished page streams into one document
+    pdf = _new_master_pdf()
+    for pages in section_pages:
+        for content in pages:
+            pdf.add_page()
+            pdf.pages[pdf.page] = content
+
+    return pdf_bytes(pdf)
+
+# --- Bulk import ---
+# Per entity: insert columns, required fields, numeric and date fields and the ID prefix
+# used when a row comes without an ID (None means the ID must be supplied).
+BULK_IMPORT_SPECS = {
+    'clients': {
+        'columns': ('client_id', 'client_name', 'contact_person', 'phone', 'email', 'address', 'client_type'),
+        'required': ('client_name',),
+        'numeric': (),
+        'dates': (),
+        'id_prefix': 'C',
+    },
+    'projects': {
+        'columns': ('project_id', 'client_id', 'project_name', 'project_location', 'start_date', 'end_date',
+                    'status', 'budget', 'actual_cost', 'contract_value', 'description'),
+        'required': ('client_id', 'project_name'),
+        'numeric': ('budget', 'actual_cost', 'contract_value'),
+        'dates': ('start_date', 'end_date'),
+        'id_prefix': 'P',
+    },
+    'employees': {
+        'columns': ('employee_id', 'first_name', 'last_name', 'role', 'contact_phone', 'email', 'hire_date',
+                    'salary', 'status'),
+        'required': ('first_name',),
+        'numeric': ('salary',),
+        'dates': ('hire_date',),
+        'id_prefix': 'E',
+    },
+    'materials': {
+        'columns': ('material_id', 'material_name', 'manufacturer', 'unit_price', 'stock_quantity', 'supplier_id'),
+        'required': ('material_id', 'material_name'),
+        'numeric': ('unit_price', 'stock_quantity'),
+        'dates': (),
+        'id_prefix': None,
+    },
+    'invoices': {
+        'columns': ('invoice_id', 'project_id', 'client_id', 'invoice_date', 'due_date', 'bill_amount',
+                    'amount_due', 'amount_paid', 'status'),
+        'required': ('invoice_id', 'project_id', 'client_id', 'amount_due'),
+        'numeric': ('bill_amount', 'amount_due', 'amount_paid'),
+        'dates': ('invoice_date', 'due_date'),
+        'id_prefix': None,
+    },
+}
+BULK_CHUNK_SIZE = 500
+
+def parse_bulk_rows(body, content_type):
+    """
+    Turns an uploaded batch into a list of row dicts.
+    Accepts CSV text (header row with column names) or JSON: a list of objects or {"rows": [...]}.
+    Returns (rows, message); rows is None when the payload cannot be parsed.
+    """
     try:
-        # --- PRIMARY TOTAL COUNTS ---
-        cursor.execute("SELECT COUNT(*) FROM Clients")
-        counts['clients'] = cursor.fetchone()[0]
+        if 'csv' in (content_type or ''):
+            text = body.decode('utf-8-sig') if isinstance(body, bytes) else body
+            return list(csv.DictReader(io.StringIO(text))), "Success"
+
+        data = json.loads(body) if isinstance(body, (bytes, str)) else body
+        if isinstance(data, dict):
+            data = data.get('rows')
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            return None, "JSON payload must be a list of objects or {\"rows\": [...]}."
+        return data, "Success"
+    except (ValueError, UnicodeDecodeError) as e:
+        return None, f"Could not parse payload: {e}"
+
+def _validate_bulk_row(spec, row):
+    """
+    Returns (values tuple, None) for a valid row or (None, error message).
+    The ID is left as None when the row has none; bulk_import() allocates it.
+    """
+    clean = {}
+    for column in spec['columns']:
+        value = row.get(column)
+        if isinstance(value, str):
+            value = value.strip()
+        clean[column] = None if value == '' else value
+
+    missing = [column for column in spec['required'] if clean[column] is None]
+    if missing:
+        return None, f"Missing required field(s): {', '.join(missing)}"
+
+    for column in spec['numeric']:
+        if clean[column] is not None:
+            try:
+                clean[column] = decimal.Decimal(str(clean[column]))
+            except decimal.InvalidOperation:
+                return None, f"{column} must be a number."
+
+    for column in spec['dates']:
+        if clean[column] is not None:
+            try:
+                datetime.strptime(str(clean[column]), '%Y-%m-%d')
+            except ValueError:
+                return None, f"{column} must be a date in YYYY-MM-DD format."
+
+    return tuple(clean[column] for column in spec['columns']), None
+
+def bulk_import(entity, rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validates and inserts a batch of `entity` rows with executemany, one transaction per chunk.
+    If a chunk fails, its rows are retried one at a time so every failing row is reported.
 
-        cursor.execute("SELECT COUNT(*) FROM Projects")
-        counts['projects'] = cursor.fetchone()[0]
+    :return: {'success', 'inserted', 'failed', 'errors': [{'row': n, 'message': ...}]}
+             where n is the 1-based position of the row in the batch.
+    """
+    spec = BULK_IMPORT_SPECS.get(entity)
+    if spec is None:
+        return {'success': False, 'inserted': 0, 'failed': 0,
+                'errors': [{'row': None, 'message': f"Bulk import is not supported for '{entity}'."}]}
+
+    errors = []
+    valid = []
+    for index, row in enumerate(rows, start=1):
+        values, error = _validate_bulk_row(spec, row)
+        if error:
+            errors.append({'row': index, 'message': error})
+        else:
+            valid.append((index, values))
 
-        cursor.execute("SELECT COUNT(*) FROM Employees")
-        counts['employees'] = cursor.fetchone()[0]
+    columns = spec['columns']
+    sql_insert = f"""
+    INSERT INTO {entity} ({', '.join(columns)})
+    VALUES ({', '.join(['%s'] * len(columns))})
+    """
+    inserted = 0
+    failure = None
+
+    for start in range(0, len(valid), chunk_size):
+        # IDs are allocated chunk by chunk, just before the chunk is inserted, so
+        # rejected rows and rows that are never attempted do not use one up. The
+        # connection is checked out only afterwards (see generate_new_id).
+        chunk = []
+        for index, values in valid[start:start + chunk_size]:
+            if values[0] is None:
+                new_id = generate_new_id(spec['id_prefix'], entity)
+                if new_id is None:
+                    errors.append({'row': index, 'message': "Could not allocate a new ID."})
+                    continue
+                values = (new_id,) + values[1:]
+            chunk.append((index, values))
+        if not chunk:
+            continue
+
+        with db_connection() as conn:
+            if conn is None:
+                failure = {'row': None, 'message': 'Database connection failed.'}
+                break
+
+            cursor = conn.cursor()
+            try:
+                values_list = [values for _, values in chunk]
+                try:
+                    cursor.executemany(sql_insert, values_list)
+                    conn.commit()
+                    inserted += len(values_list)
+                    continue
+                except DB_ERRORS:
+                    conn.rollback()
+
+                # Pinpoint the failing rows of this chunk
+                for index, values in chunk:
+                    try:
+                        cursor.execute(sql_insert, values)
+                        conn.commit()
+                        inserted += 1
+                    except DB_ERRORS as err:
+                        conn.rollback()
+                        errors.append({'row': index, 'message': f"Database Error: {err}"})
+            finally:
+                cursor.close()
+
+    if inserted:
+        table_versions.bump(entity)
+
+    errors.sort(key=lambda error: error['row'])
+    if failure:
+        # The rows not inserted by then have no error of their own
+        errors.append(failure)
+    return {'success': not errors, 'inserted': inserted, 'failed': len(rows) - inserted, 'errors': errors}
+
+# --- Dashboard aggregation ---
+# Every dashboard widget is one select expression evaluated in a single pass
+# over the projects table (other tables are counted through scalar subqueries),
+# so /api/counts is always one round trip no matter how many widgets exist.
+PROJECT_STATUSES = ('Working', 'Pending', 'Completed')
+DASHBOARD_WIDGETS = []
+_dashboard_sql = None
+
+def _as_count(value):
+    return int(value or 0)
+
+def _as_names(value):
+    return value if value else 'None'
+
+def register_dashboard_widget(key, expression, transform=_as_count):
+    """
+    Adds a widget to the dashboard query.
 
-        cursor.execute("SELECT COUNT(*) FROM Invoices")
-        counts['invoices'] = cursor.fetchone()[0]
-        
-        # --- NEW PROJECT STATUS COUNTS AND NAMES ---
-        
-        # Working Projects
-        cursor.execute("SELECT COUNT(*), GROUP_CONCAT(project_name SEPARATOR '; ') FROM Projects WHERE status = 'Working'")
-        working_result = cursor.fetchone()
-        counts['projects_working'] = working_result[0]
-        counts['projects_working_names'] = working_result[1] if working_result[1] else 'None'
-
-        # Pending Projects
-        cursor.execute("SELECT COUNT(*), GROUP_CONCAT(project_name SEPARATOR '; ') FROM Projects WHERE status = 'Pending'")
-        pending_result = cursor.fetchone()
-        counts['projects_pending'] = pending_result[0]
-        counts['projects_pending_names'] = pending_result[1] if pending_result[1] else 'None'
-
-        # Completed Projects
-        cursor.execute("SELECT COUNT(*), GROUP_CONCAT(project_name SEPARATOR '; ') FROM Projects WHERE status = 'Completed'")
-        completed_result = cursor.fetchone()
-        counts['projects_completed'] = completed_result[0]
-        counts['projects_completed_names'] = completed_result[1] if completed_result[1] else 'None'
-        
-        return counts
-    except Exception as e:
-        print(f"Logic Handler Error: {e}")
-        return {'error': 'Failed to retrieve counts due to a query error.'}
-    finally:
-        cursor.close()
-        conn.close()
+    :param key: Key the value is returned under in get_dashboard_counts().
+    :param expression: SQL select expression. Rows of the projects table are
+                       available as alias `p`; other tables need a scalar subquery.
+    :param transform: Function applied to the raw column value.
+    """
+    global _dashboard_sql
+    DASHBOARD_WIDGETS.append((key, expression, transform))
+    _dashboard_sql = None
+
+def _build_dashboard_sql():
+    global _dashboard_sql
+    if _dashboard_sql is None:
+        columns = ",\n    ".join(f"{expression} AS {key}" for key, expression, _ in DASHBOARD_WIDGETS)
+        _dashboard_sql = f"SELECT\n    {columns}\nFROM projects p"
+    return _dashboard_sql
+
+# Primary total counts
+register_dashboard_widget('clients', "(SELECT COUNT(*) FROM clients)")
+register_dashboard_widget('projects', "COUNT(*)")
+register_dashboard_widget('employees', "(SELECT COUNT(*) FROM employees)")
+register_dashboard_widget('invoices', "(SELECT COUNT(*) FROM invoices)")
+
+# Project status counts and names
+for _status in PROJECT_STATUSES:
+    register_dashboard_widget(f"projects_{_status.lower()}", f"SUM(p.status = '{_status}')")
+    register_dashboard_widget(
+        f"projects_{_status.lower()}_names",
+        f"GROUP_CONCAT(CASE WHEN p.status = '{_status}' THEN p.project_name END SEPARATOR '; ')",
+        _as_names
+    )
+
+def compute_dashboard_counts():
+    """
+    Computes the dashboard counts, including detailed project status data (counts and names),
+    straight from the tables. All widgets are computed by one aggregate statement.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {'error': 'Database connection failed'}
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_build_dashboard_sql())
+            row = cursor.fetchone()
+            return {
+                key: transform(value)
+                for (key, _, transform), value in zip(DASHBOARD_WIDGETS, row)
+            }
+        except Exception as e:
+            print(f"Logic Handler Error: {e}")
+            return {'error': 'Failed to retrieve counts due to a query error.'}
+        finally:
+            cursor.close()
+
+def get_dashboard_counts():
+    """
+    Returns the dashboard counts from the materialized counter store.
+    The store is recomputed from the database whenever one of the counted
+    tables has been written since, by any worker (see table_versions).
+    """
+    version = table_versions.current(COUNTED_TABLES)[0]
+    stored = counters.get(version)
+    if stored is not None:
+        return stored
+
+    counts = compute_dashboard_counts()
+    if 'error' not in counts:
+        counters.replace(counts, version)
+    return counts
+
+def get_dashboard_counter_status():
+    """Reconciliation status of the counter store, and whether it matches the current table versions."""
+    return counters.status(table_versions.current(COUNTED_TABLES)[0])
+
+def reconcile_dashboard_counters():
+    """
+    Recomputes the dashboard counts from the tables and replaces the counter store.
+    Returns the keys that had drifted as {key: (stored, actual)}, e.g. after a direct MySQL edit.
+    """
+    version = table_versions.current(COUNTED_TABLES)[0]
+    counts = compute_dashboard_counts()
+    if 'error' in counts:
+        print(f"Dashboard reconciliation skipped: {counts['error']}")
+        return {}
+
+    drift = counters.replace(counts, version, reconciled=True)
+    if drift:
+        print(f"Dashboard counters drifted and were corrected: {drift}")
+    return drift
+
+def start_dashboard_reconciler():
+    """Starts the periodic reconciliation job for the dashboard counters."""
+    return start_reconciler(reconcile_dashboard_counters)
 
 # You can run this file directly to add the sample data
 if __name__ == '__main__':
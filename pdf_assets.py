@@ -0,0 +1,104 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+from fpdf import FPDF
+
+from report_layout import FAST_PATH
+
+load_dotenv()
+
+# Directory holding Logo.jpg and other branding images. Defaults to the
+# application directory so PDFs no longer depend on the working directory.
+CMS_ASSET_DIR = os.path.abspath(os.getenv("CMS_ASSET_DIR", os.path.dirname(os.path.abspath(__file__))))
+
+LOGO = 'Logo.jpg'
+# Images decoded when the application starts
+BRANDING_IMAGES = (LOGO,)
+
+
+class ImageRegistry:
+    """
+    Parses each image file once per process and shares the result between
+    FPDF documents.
+
+    FPDF reads and parses an image the first time a document uses it. place()
+    instead gives the document a shallow copy of the already parsed image, so
+    the file is read once no matter how many PDFs are rendered. The copy matters:
+    FPDF numbers images per document and deletes the image data from its own
+    entry when the document is written.
+
+    Sharing relies on FPDF internals (the images table and the _parse* methods),
+    so with an untested FPDF version (see report_layout.FAST_PATH) every document
+    reads and parses its images itself through FPDF.image().
+    """
+
+    def __init__(self, asset_dir=CMS_ASSET_DIR):
+        self.asset_dir = asset_dir
+        self._lock = threading.Lock()
+        self._images = {}   # file name -> parsed image info
+        self.loads = 0
+
+    def path(self, name):
+        return os.path.join(self.asset_dir, name)
+
+    def preload(self, names=BRANDING_IMAGES):
+        """Parses the given images now; returns the names that could not be loaded."""
+        missing = []
+        for name in names:
+            if not FAST_PATH:
+                if not os.path.isfile(self.path(name)):
+                    print(f"Could not preload image {name}: {self.path(name)} does not exist")
+                    missing.append(name)
+                continue
+            try:
+                self.get(name)
+            except RuntimeError as e:
+                print(f"Could not preload image {name}: {e}")
+                missing.append(name)
+        return missing
+
+    def get(self, name):
+        """Returns the parsed image info, raising RuntimeError if the file is missing or invalid."""
+        info = self._images.get(name)
+        if info is not None:
+            return info
+        with self._lock:
+            info = self._images.get(name)
+            if info is None:
+                info = self._parse(self.path(name))
+                self._images[name] = info
+                self.loads += 1
+            return info
+
+    def register(self, pdf, name):
+        """Adds the image to the document's image table (without drawing it) and returns its key."""
+        key = self.path(name)
+        if not FAST_PATH:
+            return key   # FPDF.image() parses the file on first use
+        info = self.get(name)
+        if key not in pdf.images:
+            pdf.images[key] = dict(info, i=len(pdf.images) + 1)
+        return key
+
+    def place(self, pdf, name, x=None, y=None, w=0, h=0):
+        """Draws a registered image on the current page, like FPDF.image()."""
+        pdf.image(self.register(pdf, name), x, y, w, h)
+
+    def stats(self):
+        return {'asset_dir': self.asset_dir, 'images': sorted(self._images), 'loads': self.loads}
+
+    @staticmethod
+    def _parse(path):
+        parsers = {'.jpg': '_parsejpg', '.jpeg': '_parsejpg', '.png': '_parsepng', '.gif': '_parsegif'}
+        method = parsers.get(os.path.splitext(path)[1].lower())
+        if method is None:
+            raise RuntimeError(f"Unsupported image type: {path}")
+        try:
+            return getattr(FPDF(), method)(path)
+        except OSError as e:
+            # FPDF reports a bad JPEG as RuntimeError but lets file errors through for PNGs
+            raise RuntimeError(f"Missing or incorrect image file: {path}. error: {e}")
+
+
+images = ImageRegistry()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bump whenever a PDF layout changes so documents rendered by the old layout are not served
+PDF_TEMPLATE_VERSION = "3"
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "cms_pdf_cache"))
+PDF_CACHE_MEMORY_BYTES = int(os.getenv("PDF_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+PDF_CACHE_DISK_BYTES = int(os.getenv("PDF_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+# Seconds between scans of the cache directory for files written by other processes
+PDF_CACHE_SCAN_INTERVAL = float(os.getenv("PDF_CACHE_SCAN_INTERVAL", "60"))
+
+
+class PdfCache:
+    """
+    Content-addressed cache for generated PDFs.
+
+    The key is a SHA-256 of the template version, the report name and the
+    source row(s), so a changed row simply produces a new key, in every
+    process alike. Old entries are never served and age out of the LRU.
+
+    Entries live in a size-bounded in-memory LRU per process, backed by a
+    directory shared by every worker process using the same PDF_CACHE_DIR. The
+    directory itself is the disk index: a file's modification time is its last
+    use, refreshed on every hit, and the disk budget is enforced over all its
+    files, whichever process wrote them.
+    """
+
+    def __init__(self, cache_dir=PDF_CACHE_DIR, memory_bytes=PDF_CACHE_MEMORY_BYTES,
+                 disk_bytes=PDF_CACHE_DISK_BYTES, scan_interval=PDF_CACHE_SCAN_INTERVAL):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.scan_interval = scan_interval
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> bytes
+        self._memory_size = 0
+        # Directory totals as of the last scan, plus what this process wrote since
+        self._disk_entries = 0
+        self._disk_size = 0
+        self._last_scan = None
+        self.hits = 0
+        self.misses = 0
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
+            print(f"PDF cache directory unavailable, caching in memory only: {e}")
+
+    @staticmethod
+    def make_key(report, data):
+        payload = json.dumps([PDF_TEMPLATE_VERSION, report, data], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+        if content is not None:
+            self._touch_file(key)
+            return content
+
+        content = self._read_file(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember_memory(key, content)
+        self._touch_file(key)
+        return content
+
+    def put(self, key, content):
+        if len(content) > self.memory_bytes and len(content) > self.disk_bytes:
+            return
+
+        written = self._write_file(key, content)
+        with self._lock:
+            self._remember_memory(key, content)
+            if written:
+                self._disk_entries += 1
+                self._disk_size += len(content)
+            scan = (written and self._disk_size > self.disk_bytes) or self._scan_due()
+            if scan:
+                self._last_scan = time.monotonic()
+        if scan:
+            self._evict_disk()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': self._disk_entries,
+                'disk_bytes': self._disk_size,
+            }
+
+    # --- LRU bookkeeping ---
+    def _remember_memory(self, key, content):
+        # Caller holds the lock
+        if len(content) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = content
+        self._memory_size += len(content)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _scan_due(self):
+        return self._last_scan is None or time.monotonic() - self._last_scan >= self.scan_interval
+
+    def _evict_disk(self):
+        """Scans the directory and removes the least recently used files over the disk budget."""
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.pdf'):
+                    try:
+                        stat = os.stat(os.path.join(self.cache_dir, name))
+                    except FileNotFoundError:
+                        continue   # removed by another process meanwhile
+                    entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        except OSError as e:
+            print(f"Error scanning PDF cache directory: {e}")
+            return
+
+        total = sum(size for _, _, size in entries)
+        count = len(entries)
+        entries.sort()
+        for _, key, size in entries:
+            if total <= self.disk_bytes:
+                break
+            self._remove_file(key)
+            total -= size
+            count -= 1
+        with self._lock:
+            self._disk_entries = count
+            self._disk_size = total
+
+    # --- Disk storage ---
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _read_file(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _touch_file(self, key):
+        # Marks the file as recently used for every process's eviction scan
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def _write_file(self, key, content):
+        if len(content) > self.disk_bytes:
+            return False
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self._path(key))
+            return True
+        except OSError as e:
+            print(f"Error writing PDF cache entry: {e}")
+            return False
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+pdf_cache = PdfCache()
+
+
+def cached_pdf(report, extra_key=None):
+    """
+    Decorator for generate_*_pdf(data) functions: serves the PDF from the cache
+    when an identical document was rendered before.
+
+    :param report: Name of the report, part of the cache key.
+    :param extra_key: Optional callable whose result is added to the key, for
+                      documents that also depend on something besides the row.
+    """
+    def decorator(generate):
+        @wraps(generate)
+        def wrapper(data):
+            if not data:
+                return generate(data)
+
+            key_data = [data, extra_key()] if extra_key else data
+            key = pdf_cache.make_key(report, key_data)
+            content = pdf_cache.get(key)
+            if content is not None:
+                return content
+
+            content = generate(data)
+            if content:
+                pdf_cache.put(key, content)
+            return content
+        return wrapper
+    return decorator
@@ -0,0 +1,463 @@
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", str(os.cpu_count() or 2)))
+# Finished jobs (and their PDFs) are kept this many seconds for download
+PDF_JOB_RESULT_TTL = int(os.getenv("PDF_JOB_RESULT_TTL", "900"))
+# Jobs a process accepts at once (queued or running); further submissions are refused
+PDF_JOB_QUEUE_LIMIT = int(os.getenv("PDF_JOB_QUEUE_LIMIT", "50"))
+# Job state and finished PDFs. Every worker process of the application must use
+# the same directory, since a status request may reach any of them.
+PDF_JOB_DIR = os.getenv("PDF_JOB_DIR", os.path.join(tempfile.gettempdir(), "cms_pdf_jobs"))
+# Seconds between heartbeats of a process with pending jobs. Queued or running
+# jobs whose process missed several heartbeats (it exited or was killed) are
+# marked failed instead of staying pending forever.
+PDF_JOB_HEARTBEAT = float(os.getenv("PDF_JOB_HEARTBEAT", "15"))
+PDF_JOB_OWNER_TIMEOUT = 4 * PDF_JOB_HEARTBEAT
+
+# report type -> (max concurrent jobs, render timeout in seconds, needs an object id)
+REPORT_TYPES = {
+    'client': (4, 30, True),
+    'project': (4, 30, True),
+    'employee': (4, 30, True),
+    'supplier': (4, 30, True),
+    'invoice': (4, 30, True),
+    'payment': (4, 30, True),
+    'material': (4, 30, True),
+    'all_clients': (2, 120, False),
+    'all_projects': (2, 120, False),
+    'all_employees': (2, 120, False),
+    'all_suppliers': (2, 120, False),
+    'all_materials': (2, 120, False),
+    'master': (1, 300, False),
+}
+
+
+def render_report(report_type, object_id=None):
+    """
+    Fetches the data for one report and renders it. Runs inside a worker process.
+    Returns (pdf bytes, filename); raises RuntimeError if the data or PDF is unavailable.
+    """
+    import logic_handler as lh
+
+    single = {
+        'client': (lh.get_client_details, lh.generate_client_pdf, "client_profile_{}.pdf"),
+        'project': (lh.get_project_details, lh.generate_project_pdf, "project_report_{}.pdf"),
+        'employee': (lh.get_employee_details, lh.generate_employee_pdf, "employee_profile_{}.pdf"),
+        'supplier': (lh.get_supplier_details, lh.generate_supplier_pdf, "supplier_{}.pdf"),
+        'invoice': (lh.get_invoice_details, lh.generate_invoice_pdf, "invoice_{}.pdf"),
+        'payment': (lh.get_payment_details, lh.generate_payment_pdf, "PaymentReceipt_{}.pdf"),
+        'material': (lh.get_material_details, lh.generate_material_pdf, "material_{}.pdf"),
+    }
+    roster = {
+        'all_clients': (lh.get_all_clients_data, lh.generate_all_clients_pdf, "client_roster_report.pdf"),
+        'all_projects': (lh.get_all_projects_data, lh.generate_all_projects_pdf, "all_projects_report.pdf"),
+        'all_employees': (lh.get_all_employees_data, lh.generate_all_employees_pdf,
+                          f"Employee_Roster_{datetime.now().strftime('%Y%m%d')}.pdf"),
+        'all_suppliers': (lh.get_all_suppliers_data, lh.generate_all_suppliers_pdf, "all_suppliers_data.pdf"),
+        'all_materials': (lh.get_all_materials_data, lh.generate_all_materials_pdf, "all_materials_data.pdf"),
+    }
+
+    if report_type == 'master':
+        pdf_content = lh.generate_master_pdf_report()
+        filename = "CMS_Master_Report.pdf"
+    elif report_type in single:
+        fetch, generate, filename = single[report_type]
+        data, message = fetch(object_id)
+        if not data:
+            raise RuntimeError(message if message != "Success" else "Record not found.")
+        pdf_content = generate(data)
+        filename = filename.format(object_id)
+    else:
+        fetch, generate, filename = roster[report_type]
+        data, message = fetch()
+        if not data:
+            raise RuntimeError(message if message != "Success" else "No records found.")
+        pdf_content = generate(data)
+
+    if not pdf_content:
+        raise RuntimeError("Failed to generate PDF.")
+    return pdf_content, filename
+
+
+_JOB_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit() when PDF_JOB_QUEUE_LIMIT jobs are already pending."""
+
+
+class Job:
+    FIELDS = ('id', 'report_type', 'object_id', 'owner', 'status', 'error', 'filename',
+              'created', 'started', 'finished')
+
+    def __init__(self, report_type, object_id, owner=None):
+        self.id = uuid.uuid4().hex
+        self.report_type = report_type
+        self.object_id = object_id
+        self.owner = owner
+        self.status = 'queued'
+        self.error = None
+        self.filename = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @classmethod
+    def from_state(cls, state):
+        job = cls.__new__(cls)
+        for field in cls.FIELDS:
+            setattr(job, field, state.get(field))
+        return job
+
+    def state(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def to_dict(self):
+        def stamp(value):
+            return datetime.fromtimestamp(value).isoformat(timespec='seconds') if value else None
+        return {
+            'job_id': self.id,
+            'report': self.report_type,
+            'id': self.object_id,
+            'status': self.status,
+            'error': self.error,
+            'filename': self.filename,
+            'created': stamp(self.created),
+            'started': stamp(self.started),
+            'finished': stamp(self.finished),
+        }
+
+
+class JobStore:
+    """
+    Job state shared by every process through a directory: <id>.json holds the
+    job's fields and <id>.pdf its result. Files are written under a temporary
+    name and renamed into place, so readers never see a partial file.
+
+    Each JobManager also keeps <owner>.alive fresh while it has pending jobs; a
+    queued or running job whose owner stopped beating is failed on the next
+    purge() or load_current().
+    """
+
+    def __init__(self, directory=PDF_JOB_DIR, owner_timeout=PDF_JOB_OWNER_TIMEOUT):
+        self.directory = directory
+        self.owner_timeout = owner_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id, suffix):
+        return os.path.join(self.directory, f"{job_id}{suffix}")
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def save(self, job, result=None):
+        # The PDF goes first so a job reads as 'done' only once its result exists
+        if result is not None:
+            self._write(self._path(job.id, '.pdf'), result)
+        self._write(self._path(job.id, '.json'), json.dumps(job.state()).encode('utf-8'))
+
+    def load(self, job_id):
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id, '.json'), 'rb') as f:
+                return Job.from_state(json.loads(f.read()))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def result(self, job_id):
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id, '.pdf'), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def beat(self, owner):
+        """Records that the process owning `owner`'s jobs is alive."""
+        self._write(self._path(owner, '.alive'), b'')
+
+    def owner_alive(self, owner):
+        try:
+            return time.time() - os.path.getmtime(self._path(owner, '.alive')) < self.owner_timeout
+        except OSError:
+            return False
+
+    def load_current(self, job_id):
+        """Like load(), but a pending job whose owner is gone is marked failed first."""
+        job = self.load(job_id)
+        if job is not None and job.status in ('queued', 'running') and not self.owner_alive(job.owner):
+            job.status = 'failed'
+            job.error = "Abandoned: the process that accepted the job stopped."
+            job.finished = time.time()
+            self.save(job)
+        return job
+
+    def purge(self, finished_before):
+        """
+        Fails the pending jobs of owners that are gone, and removes the jobs that
+        finished (and the heartbeats that stopped) before the given time.
+        """
+        for name in os.listdir(self.directory):
+            job_id, suffix = os.path.splitext(name)
+            if suffix == '.alive':
+                try:
+                    if os.path.getmtime(self._path(job_id, suffix)) < finished_before:
+                        os.remove(self._path(job_id, suffix))
+                except OSError:
+                    pass
+                continue
+            if suffix != '.json':
+                continue
+            job = self.load_current(job_id)
+            if job is not None and job.finished and job.finished < finished_before:
+                for path in (self._path(job_id, '.json'), self._path(job_id, '.pdf')):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+
+
+class JobManager:
+    """
+    Runs PDF render jobs on a process pool so requests never block on FPDF.
+
+    A job stays 'queued' until both a worker process and a slot of its report
+    type's concurrency limit are free, and only then becomes 'running'; its
+    timeout counts from that moment. One dispatcher thread starts queued jobs
+    in submission order, collects results and enforces the timeouts. At most
+    `queue_limit` jobs are pending in a process; submit() refuses more.
+
+    Job state lives in a JobStore, so any worker process can report on or
+    serve a job accepted by another.
+
+    A timed-out job is marked failed. Running futures cannot be cancelled, so
+    the pool is recycled: its worker processes are terminated and a new pool is
+    started, and the other jobs that were running on it go back to the front of
+    the queue.
+
+    While it has pending jobs the manager beats a heartbeat in the JobStore, so
+    the jobs of a process that exits or is killed do not stay pending forever.
+    """
+
+    def __init__(self, max_workers=PDF_JOB_WORKERS, result_ttl=PDF_JOB_RESULT_TTL,
+                 queue_limit=PDF_JOB_QUEUE_LIMIT, job_dir=PDF_JOB_DIR, heartbeat=PDF_JOB_HEARTBEAT):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.queue_limit = queue_limit
+        self.heartbeat = heartbeat
+        self.store = JobStore(job_dir, owner_timeout=4 * heartbeat)
+        self.owner = uuid.uuid4().hex
+        self._executor = None
+        self._cond = threading.Condition()
+        self._queued = deque()
+        self._running = {}     # job id -> (job, future, deadline)
+        self._active = {name: 0 for name in REPORT_TYPES}
+        self._changed = False
+        self._dispatcher = None
+        self._last_beat = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: worker processes must not inherit the server's threads and locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    def submit(self, report_type, object_id=None):
+        """
+        Queues a render job. Returns (job, message); job is None if the request is
+        invalid. Raises JobQueueFull when the process already has queue_limit jobs.
+        """
+        if report_type not in REPORT_TYPES:
+            return None, f"Unknown report type '{report_type}'."
+        if REPORT_TYPES[report_type][2] and not object_id:
+            return None, f"Report type '{report_type}' needs an id."
+
+        self.store.purge(time.time() - self.result_ttl)
+        with self._cond:
+            if len(self._queued) + len(self._running) >= self.queue_limit:
+                raise JobQueueFull(f"{self.queue_limit} PDF jobs are already pending; try again later.")
+            job = Job(report_type, object_id, self.owner)
+            self._beat(force=True)
+            self.store.save(job)
+            self._queued.append(job)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="pdf-job-dispatcher", daemon=True)
+                self._dispatcher.start()
+        self._notify()
+        return job, "Job queued."
+
+    def get(self, job_id):
+        return self.store.load_current(job_id)
+
+    def result(self, job_id):
+        """The PDF of a finished job, or None."""
+        return self.store.result(job_id)
+
+    # --- Dispatcher thread ---
+    def _notify(self, *args):
+        with self._cond:
+            self._changed = True
+            self._cond.notify()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                if not self._changed:
+                    self._cond.wait(self._next_wakeup())
+                self._changed = False
+                finished = [entry for entry in self._running.values() if entry[1].done()]
+                for job, _, _ in finished:
+                    del self._running[job.id]
+                    self._active[job.report_type] -= 1
+                now = time.monotonic()
+                expired = [entry for entry in self._running.values() if entry[2] <= now]
+                for job, future, _ in expired:
+                    del self._running[job.id]
+                    self._active[job.report_type] -= 1
+                retired, requeued = self._recycle_pool() if expired else (None, [])
+                started = self._start_queued()
+                pending = bool(self._queued or self._running)
+
+            # Job files are written outside the lock
+            if retired is not None:
+                _terminate_pool(retired)
+            if pending:
+                self._beat()
+            for job, future, _ in finished:
+                self._finish(job, future)
+            for job in requeued:
+                self._save(job)
+            for job, future, _ in expired:
+                job.status = 'failed'
+                job.error = f"Timed out after {REPORT_TYPES[job.report_type][1]}s."
+                job.finished = time.time()
+                self._save(job)
+            for job in started:
+                self._save(job)
+
+    def _next_wakeup(self):
+        """
+        Seconds until the next running job times out or the next heartbeat is due;
+        None to wait for a notification.
+        """
+        if not self._queued and not self._running:
+            return None
+        wakeup = self.heartbeat
+        if self._running:
+            wakeup = min(wakeup, min(deadline for _, _, deadline in self._running.values()) - time.monotonic())
+        return max(0.0, wakeup)
+
+    def _beat(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_beat is not None and now - self._last_beat < self.heartbeat:
+            return
+        self._last_beat = now
+        try:
+            self.store.beat(self.owner)
+        except OSError as e:
+            print(f"Could not record the PDF job heartbeat: {e}")
+
+    def _recycle_pool(self):
+        """
+        Detaches the pool after a timeout (lock held) and puts the jobs still
+        running on it back at the front of the queue, in their original order.
+        Returns (old pool, requeued jobs); the caller terminates the old pool.
+        """
+        retired, self._executor = self._executor, None
+        requeued = sorted((job for job, _, _ in self._running.values()), key=lambda job: job.created)
+        self._running.clear()
+        for job in reversed(requeued):
+            self._active[job.report_type] -= 1
+            job.status = 'queued'
+            job.started = None
+            self._queued.appendleft(job)
+        return retired, requeued
+
+    def _start_queued(self):
+        """
+        Starts queued jobs in order while workers and type slots are free (lock held).
+        Returns the jobs taken off the queue: running, or failed if they could not start.
+        """
+        started = []
+        for job in list(self._queued):
+            if len(self._running) >= self.max_workers:
+                break
+            limit, timeout, _ = REPORT_TYPES[job.report_type]
+            if self._active[job.report_type] >= limit:
+                continue
+            self._queued.remove(job)
+            started.append(job)
+            job.started = time.time()
+            try:
+                future = self._get_executor().submit(render_report, job.report_type, job.object_id)
+            except Exception as e:
+                print(f"PDF job {job.id} ({job.report_type}) could not start: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    # A worker process died; the next job gets a new pool
+                    self._executor = None
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished = job.started
+                continue
+            job.status = 'running'
+            self._active[job.report_type] += 1
+            self._running[job.id] = (job, future, time.monotonic() + timeout)
+            future.add_done_callback(self._notify)
+        return started
+
+    def _finish(self, job, future):
+        job.finished = time.time()
+        try:
+            pdf_content, filename = future.result()
+        except Exception as e:
+            print(f"PDF job {job.id} ({job.report_type}) failed: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+            self._save(job)
+            return
+        job.status = 'done'
+        job.filename = filename
+        self._save(job, result=pdf_content)
+
+    def _save(self, job, result=None):
+        try:
+            self.store.save(job, result)
+        except OSError as e:
+            print(f"Could not save PDF job {job.id}: {e}")
+
+
+def _terminate_pool(executor):
+    """Stops a pool's worker processes, abandoning whatever they are rendering."""
+    terminate = getattr(executor, 'terminate_workers', None)   # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+jobs = JobManager()
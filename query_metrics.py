@@ -0,0 +1,269 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from request_tracing import add_span
+
+load_dotenv()
+
+# Statements slower than this (seconds) are logged with their EXPLAIN plan; 0 disables
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", "0.5"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") not in ("0", "false", "False")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_LABEL_LENGTH = 200
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_IN_LIST = re.compile(r"\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Reduces a statement to its shape, used as the metrics label: whitespace
+    collapsed, literals and IN lists replaced, so every call of the same query
+    lands in the same series whatever its parameters.
+    """
+    if isinstance(sql, (bytes, bytearray)):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _SPACE.sub(' ', sql).strip()
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return sql[:STATEMENT_LABEL_LENGTH]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (not thread-safe on its own)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class QueryMetrics:
+    """
+    Per-process statement statistics: latency histograms, rows returned or
+    affected and errors per normalised statement, plus connection-acquire times.
+    render() writes them in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}     # statement -> Histogram
+        self._rows = {}        # statement -> rows fetched or affected
+        self._errors = {}      # statement -> failed executions
+        self._acquire = Histogram()
+        self._acquire_failures = 0
+        self.slow_queries = 0
+        self._explainer = None
+
+    def observe_query(self, statement, seconds, error=False):
+        with self._lock:
+            histogram = self._latency.get(statement)
+            if histogram is None:
+                histogram = self._latency[statement] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                self._errors[statement] = self._errors.get(statement, 0) + 1
+
+    def add_rows(self, statement, rows):
+        if rows > 0:
+            with self._lock:
+                self._rows[statement] = self._rows.get(statement, 0) + rows
+
+    def observe_acquire(self, seconds, ok=True):
+        with self._lock:
+            self._acquire.observe(seconds)
+            if not ok:
+                self._acquire_failures += 1
+
+    # --- Slow-query log ---
+    def slow_query(self, sql, params, seconds, explain=True):
+        with self._lock:
+            self.slow_queries += 1
+        print(f"Slow query ({seconds:.3f}s): {normalize_sql(sql)}")
+        if explain and SLOW_QUERY_EXPLAIN and normalize_sql(sql).upper().startswith(EXPLAINABLE):
+            # Off the request thread and on another connection: the slow
+            # statement's results may still be unread on the caller's cursor.
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+            self._explainer.submit(_print_explain, sql, params)
+
+    # --- Exposition ---
+    def render(self, pool_stats=None):
+        with self._lock:
+            lines = []
+            _histogram_lines(lines, 'cms_db_query_duration_seconds',
+                             'Time spent executing each statement.',
+                             [({'statement': s}, h) for s, h in sorted(self._latency.items())])
+            _counter_lines(lines, 'cms_db_query_rows_total', 'Rows fetched or affected per statement.',
+                           [({'statement': s}, n) for s, n in sorted(self._rows.items())])
+            _counter_lines(lines, 'cms_db_query_errors_total', 'Statements that raised an error.',
+                           [({'statement': s}, n) for s, n in sorted(self._errors.items())])
+            _counter_lines(lines, 'cms_db_slow_queries_total',
+                           f'Statements slower than {SLOW_QUERY_SECONDS}s.', [({}, self.slow_queries)])
+            _histogram_lines(lines, 'cms_db_connection_acquire_seconds',
+                             'Time to obtain a database connection from the pool.', [({}, self._acquire)])
+            _counter_lines(lines, 'cms_db_connection_acquire_failures_total',
+                           'Connection requests that got no connection.', [({}, self._acquire_failures)])
+
+        for key, value in sorted((pool_stats or {}).items()):
+            if key in ('pool_size', 'max_overflow'):
+                continue
+            name = f"cms_db_pool_{key}"
+            if key in ('open', 'active', 'idle'):
+                lines += [f"# TYPE {name} gauge", f"{name} {value}"]
+            else:
+                name = name.replace('_seconds', '_seconds_total') if key.endswith('_seconds') else f"{name}_total"
+                lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _print_explain(sql, params):
+    from database_connector import db_connection
+
+    try:
+        with db_connection() as conn:
+            if conn is None:
+                return
+            cursor = conn.cursor()
+            try:
+                cursor.execute("EXPLAIN " + sql, params or None)
+                columns = [column[0] for column in cursor.description]
+                plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        print(f"EXPLAIN for slow query {normalize_sql(sql)}:")
+        for row in plan:
+            print(f"    {row}")
+    except Exception as e:
+        print(f"Could not EXPLAIN slow query: {e}")
+
+
+def _label_text(labels, extra=None):
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ''
+    escaped = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{key}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _histogram_lines(lines, name, help_text, series):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series:
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"{name}_bucket{_label_text(labels, ('le', repr(bound)))} {count}")
+        lines.append(f"{name}_bucket{_label_text(labels, ('le', '+Inf'))} {histogram.count}")
+        lines.append(f"{name}_sum{_label_text(labels)} {histogram.total:.6f}")
+        lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+
+
+def _counter_lines(lines, name, help_text, series):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for labels, value in series:
+        lines.append(f"{name}{_label_text(labels)} {value}")
+
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that times every execute()/executemany(), counts the rows
+    fetched (or affected, for writes) and reports slow statements. Everything
+    else is passed through to the real cursor.
+    """
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._statement = None
+
+    def _run(self, method, sql, params, *args, many=False, **kwargs):
+        statement = normalize_sql(sql)
+        self._statement = statement
+        # Only pass params on when given: with params the driver expands %s and
+        # would choke on a literal % in a parameterless statement
+        call_args = (sql,) if params is None else (sql, params)
+        started = time.perf_counter()
+        try:
+            result = method(*call_args, *args, **kwargs)
+        except Exception:
+            elapsed = time.perf_counter() - started
+            self._metrics.observe_query(statement, elapsed, error=True)
+            add_span('db', elapsed)
+            raise
+        elapsed = time.perf_counter() - started
+        self._metrics.observe_query(statement, elapsed)
+        add_span('db', elapsed)
+        if self._cursor.description is None:
+            # No result set: rowcount is the number of rows written
+            self._metrics.add_rows(statement, max(self._cursor.rowcount or 0, 0))
+        if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+            self._metrics.slow_query(sql, params, elapsed, explain=not many)
+        return result
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, sql, params, *args, **kwargs)
+
+    def executemany(self, sql, seq_params, *args, **kwargs):
+        return self._run(self._cursor.executemany, sql, seq_params, *args, many=True, **kwargs)
+
+    # Fetching reads the result from the server, so it counts as database time
+    # of the request (see request_tracing), but not as statement latency.
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        add_span('db', time.perf_counter() - started)
+        if row is not None:
+            self._metrics.add_rows(self._statement, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        add_span('db', time.perf_counter() - started)
+        self._metrics.add_rows(self._statement, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        add_span('db', time.perf_counter() - started)
+        self._metrics.add_rows(self._statement, len(rows))
+        return rows
+
+    def __iter__(self):
+        rows = iter(self._cursor)
+        while True:
+            started = time.perf_counter()
+            row = next(rows, None)
+            add_span('db', time.perf_counter() - started)
+            if row is None:
+                return
+            self._metrics.add_rows(self._statement, 1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+query_metrics = QueryMetrics()
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds a cached table stays fresh. Writes through the application are seen at
+# once through the table version; the TTL bounds how long changes made outside
+# the application can go unnoticed.
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+
+def make_etag(data):
+    """Strong ETag for a JSON-serialisable payload, identical in every process for the same data."""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+class ReferenceCache:
+    """
+    Read-through cache for small, rarely changing tables (services, materials,
+    suppliers).
+
+    get() returns the cached payload and its ETag, loading it on first use, once
+    it is older than the TTL, or when the table's version (see table_versions)
+    differs from the one it was loaded at. invalidate() drops a table in this
+    process only.
+
+    A load that was already running when the table was invalidated is returned
+    to its caller but not kept, so a write is never hidden by an older read.
+    """
+
+    def __init__(self, ttl=REFERENCE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}       # name -> (payload, etag, loaded_at, version)
+        self._generations = {}   # name -> number of invalidations so far
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, load, version=None):
+        """
+        Returns (payload, etag). `load()` fetches the payload; a payload with an
+        'error' key is passed through uncached with an ETag of None. `version`
+        identifies the table state; a cached entry from another version is reloaded.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[3] == version and time.monotonic() - entry[2] < self.ttl:
+                self.hits += 1
+                return entry[0], entry[1]
+            self.misses += 1
+            generation = self._generations.get(name, 0)
+
+        payload = load()
+        if 'error' in payload:
+            return payload, None
+
+        etag = make_etag(payload)
+        with self._lock:
+            if self._generations.get(name, 0) == generation:
+                self._entries[name] = (payload, etag, time.monotonic(), version)
+        return payload, etag
+
+    def invalidate(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+            self._generations[name] = self._generations.get(name, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ttl': self.ttl,
+                'cached': sorted(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+reference_cache = ReferenceCache()
@@ -0,0 +1,243 @@
+"""
+Shared building blocks for the branded PDF reports: banner, section titles,
+labelled fields and TableLayout, a declarative table renderer.
+
+TableLayout has a fast path that writes the page operators of body rows
+itself. It relies on internals of PyFPDF 1.7.2 (FPDF._out, FPDF._escape, the
+ws, unifontsubset and color_flag attributes, fonts.fpdf_charwidths), so it is
+only enabled when exactly that version is installed (FAST_PATH). With any
+other version every cell goes through the public FPDF.cell() API instead,
+slower but unaffected by changes to those internals. Check the fast path
+against the new version's source before adding it to FAST_PATH_FPDF_VERSIONS.
+
+The same flag gates the other code that reaches into FPDF: the page splicing
+of the master report and of the merged invoice batch (logic_handler) falls back
+to drawing everything into one document, and pdf_assets stops sharing parsed
+images between documents.
+"""
+from functools import lru_cache
+
+import fpdf
+from fpdf import FPDF
+
+FAST_PATH_FPDF_VERSIONS = ('1.7.2',)
+FAST_PATH = getattr(fpdf, 'FPDF_VERSION', None) in FAST_PATH_FPDF_VERSIONS
+if FAST_PATH:
+    from fpdf.fonts import fpdf_charwidths
+
+COMPANY_NAME = 'OM Enterprises'
+BRAND_COLOR = (0, 77, 153)
+HEADER_FILL = (220, 220, 220)
+FOOTER_COLOR = (100, 100, 100)
+FOOTER_TEXT = 'Report Generated by CMS System'
+
+# Layouts are measured in FPDF's default unit, the millimetre
+SCALE_FACTOR = 72 / 25.4
+
+
+@lru_cache(maxsize=None)
+def char_widths(family, style):
+    """
+    Glyph widths (in 1/1000 of the font size) of a core font, looked up once per
+    process for each font used by a layout.
+    """
+    fontkey = family.lower().replace('arial', 'helvetica') + style.upper()
+    if fontkey not in fpdf_charwidths:
+        # FPDF loads the metric file into its module-level table on first use
+        FPDF().set_font(family, style)
+    return fpdf_charwidths[fontkey]
+
+
+def text_width(widths, font_size, text):
+    """
+    Width in mm of `text` at `font_size` (in mm), computed exactly as
+    FPDF.get_string_width() does.
+    """
+    try:
+        units = sum(map(widths.__getitem__, text))
+    except KeyError:
+        units = sum(widths.get(char, 0) for char in text)
+    return units * font_size / 1000.0
+
+
+def company_header(pdf, subtitle, title_size=24, subtitle_style='', subtitle_size=12, gap=10):
+    """Draws the blue 'OM Enterprises' banner with a subtitle and leaves black text selected."""
+    pdf.set_fill_color(*BRAND_COLOR)
+    pdf.set_text_color(255, 255, 255)
+    pdf.set_font("Arial", 'B', title_size)
+    pdf.cell(0, 15, COMPANY_NAME, 0, 1, 'C', 1)
+
+    pdf.set_font("Arial", subtitle_style, subtitle_size)
+    pdf.cell(0, 5, subtitle, 0, 1, 'C', 0)
+    pdf.ln(gap)
+    pdf.set_text_color(0, 0, 0)
+
+
+def section_title(pdf, title, size=16, height=10, line_width=0.5, color=BRAND_COLOR, gap=5):
+    """Draws a bold title underlined across the page."""
+    pdf.set_font("Arial", 'B', size)
+    pdf.cell(0, height, title, 0, 1, 'L')
+    pdf.set_line_width(line_width)
+    pdf.set_draw_color(*color)
+    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+    pdf.ln(gap)
+
+
+def report_footer(pdf, text=FOOTER_TEXT):
+    pdf.set_font("Arial", 'I', 10)
+    pdf.set_text_color(*FOOTER_COLOR)
+    pdf.cell(0, 5, text, 0, 1, 'C')
+
+
+def field(pdf, label, value, label_width=50, height=7, size=12, value_width=0, ln=1, value_style=''):
+    """Draws a bold 'Label:' followed by its value on the current line."""
+    pdf.set_font("Arial", 'B', size)
+    pdf.cell(label_width, height, label, 0, 0, 'L')
+    pdf.set_font("Arial", value_style, size)
+    pdf.cell(value_width, height, _text(value), 0, ln, 'L')
+
+
+def _text(value, default='N/A'):
+    return default if value is None else str(value)
+
+
+class Column:
+    """
+    One table column.
+
+    :param value: Row key, or a callable taking the row and returning the cell text.
+    :param default: Text printed when the row has no value for the column.
+    """
+
+    def __init__(self, title, width, value, align='L', header_align=None, default='N/A'):
+        self.title = title
+        self.width = width
+        self.align = align
+        self.header_align = header_align or align
+        self.default = default
+        if callable(value):
+            self.get = value
+        else:
+            self.get = lambda row, key=value: row.get(key)
+
+
+class TableLayout:
+    """
+    Declarative bordered table: a header row repeated at the top of every page and
+    one body row per record. Column positions and font metrics are worked out when
+    the layout is created, so a module-level layout costs nothing per request.
+
+    On the fast path (see FAST_PATH) body rows are written straight to the page
+    stream with the precomputed text widths, producing the same operators as
+    FPDF.cell() without its per-cell bookkeeping. On both paths, text wider than
+    its column runs past the border, as with FPDF.cell().
+    """
+
+    def __init__(self, columns, header_font=('Arial', 'B', 10), body_font=('Arial', '', 9),
+                 header_height=7, row_height=6, header_fill=HEADER_FILL, page_bottom=270):
+        self.columns = list(columns)
+        self.header_font = header_font
+        self.body_font = body_font
+        self.header_height = header_height
+        self.row_height = row_height
+        self.header_fill = header_fill
+        self.page_bottom = page_bottom
+        self.width = sum(column.width for column in self.columns)
+        self._last = len(self.columns) - 1
+
+        family, style, size = body_font
+        self._font_size = size / SCALE_FACTOR
+        self._widths = char_widths(family, style) if FAST_PATH else None
+        # FPDF leaves a cell margin of page margin / 10 on each side of the text
+        self._cell_margin = (28.35 / SCALE_FACTOR) / 10
+        offsets, x = [], 0
+        for column in self.columns:
+            offsets.append(x)
+            x += column.width
+        self._offsets = offsets
+
+    def draw_header(self, pdf):
+        pdf.set_font(*self.header_font)
+        pdf.set_fill_color(*self.header_fill)
+        for i, column in enumerate(self.columns):
+            pdf.cell(column.width, self.header_height, column.title, 1,
+                     1 if i == self._last else 0, column.header_align, 1)
+        pdf.set_font(*self.body_font)
+
+    def draw_row(self, pdf, row):
+        if self._can_write_directly(pdf):
+            pdf._out(self._row_stream(pdf, row))
+        else:
+            self._draw_row_cells(pdf, row)
+
+    def _can_write_directly(self, pdf):
+        return FAST_PATH and not (pdf.unifontsubset or pdf.ws or pdf.underline) and pdf.k == SCALE_FACTOR
+
+    def _row_stream(self, pdf, row):
+        """Returns the page-stream operators for one body row and moves to the next line."""
+        k = SCALE_FACTOR
+        h = self.row_height
+        top = (pdf.h - pdf.y) * k
+        baseline = (pdf.h - (pdf.y + .5 * h + .3 * self._font_size)) * k
+        colour = ('q ' + pdf.text_color + ' ', ' Q') if pdf.color_flag else ('', '')
+        margin = self._cell_margin
+        left = pdf.x
+        out = []
+        for column, offset in zip(self.columns, self._offsets):
+            x = left + offset
+            w = column.width
+            op = '%.2f %.2f %.2f %.2f re S ' % (x * k, top, w * k, -h * k)
+            text = self._cell_text(column, row)
+            if text:
+                text_w = text_width(self._widths, self._font_size, text)
+                if column.align == 'R':
+                    dx = w - margin - text_w
+                elif column.align == 'C':
+                    dx = (w - text_w) / 2.0
+                else:
+                    dx = margin
+                op += '%sBT %.2f %.2f Td (%s) Tj ET%s' % (
+                    colour[0], (x + dx) * k, baseline, pdf._escape(text), colour[1])
+            out.append(op)
+        pdf.lasth = h
+        pdf.y += h
+        pdf.x = pdf.l_margin
+        return '\n'.join(out)
+
+    def _draw_row_cells(self, pdf, row):
+        for i, column in enumerate(self.columns):
+            pdf.cell(column.width, self.row_height, self._cell_text(column, row), 1,
+                     1 if i == self._last else 0, column.align, 0)
+
+    @staticmethod
+    def _cell_text(column, row):
+        value = column.get(row)
+        return column.default if value is None else str(value)
+
+    def render(self, pdf, rows):
+        """
+        Draws the header and every row, starting a new page (with the header repeated)
+        whenever a row would pass `page_bottom` or the automatic page-break line.
+        Yields after each row so callers can stream finished pages.
+
+        The rows of a page are written to it in one piece when the page is full:
+        FPDF appends to a page by string concatenation, so per-cell writes copy
+        the page content over and over.
+        """
+        self.draw_header(pdf)
+        pending = []
+        for row in rows:
+            y = pdf.get_y()
+            if y > self.page_bottom or (pdf.auto_page_break and y + self.row_height > pdf.page_break_trigger):
+                if pending:
+                    pdf._out('\n'.join(pending))
+                    pending = []
+                pdf.add_page()
+                self.draw_header(pdf)
+            if self._can_write_directly(pdf):
+                pending.append(self._row_stream(pdf, row))
+            else:
+                self._draw_row_cells(pdf, row)
+            yield
+        if pending:
+            pdf._out('\n'.join(pending))
@@ -0,0 +1,233 @@
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import wraps
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set to 0 to turn request tracing off entirely
+REQUEST_TIMING = os.getenv("REQUEST_TIMING", "1") not in ("0", "false", "False")
+# How many of the slowest requests are kept per route, and for how long (seconds)
+REQUEST_TIMING_SLOWEST = int(os.getenv("REQUEST_TIMING_SLOWEST", "10"))
+REQUEST_TIMING_WINDOW = float(os.getenv("REQUEST_TIMING_WINDOW", "3600"))
+
+_current = ContextVar('request_trace', default=None)
+
+
+class RequestTrace:
+    """
+    Time spent by one request, broken down by named spans (db, render,
+    serialize, compress, send).
+
+    Spans may nest; each one is charged its own time only, without the time of
+    the spans inside it, so the figures add up to no more than the total.
+    Whatever no span covers is reported as 'other'.
+    """
+
+    def __init__(self, method, path):
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started = time.perf_counter()
+        self.at = datetime.now(timezone.utc)
+        self.spans = {}      # name -> seconds
+        self._stack = []     # [name, start, seconds spent in nested spans]
+
+    def add(self, name, seconds):
+        """Charges `seconds` to span `name`, e.g. for work timed by the caller."""
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+        if self._stack:
+            self._stack[-1][2] += seconds
+
+    @contextmanager
+    def span(self, name):
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.spans[name] = self.spans.get(name, 0.0) + elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Server-Timing header value (milliseconds) for the time spent so far."""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(parts)
+
+
+def current_trace():
+    """The trace of the request being handled in this context, or None."""
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Times the block as span `name` of the current request; a no-op outside one."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(name):
+        yield
+
+
+def add_span(name, seconds):
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def traced(name):
+    """
+    Decorator that times each call as span `name`. For a generator function
+    the time of every step is counted, so streamed output is covered too.
+    """
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                steps = func(*args, **kwargs)
+                try:
+                    while True:
+                        with span(name):
+                            try:
+                                item = next(steps)
+                            except StopIteration as stop:
+                                return stop.value
+                        yield item
+                finally:
+                    steps.close()
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SlowRequestLog:
+    """
+    The slowest requests per route over the last REQUEST_TIMING_WINDOW seconds,
+    kept in memory (per process). Each entry has the total, the span breakdown
+    and what was asked for.
+    """
+
+    def __init__(self, keep=REQUEST_TIMING_SLOWEST, window=REQUEST_TIMING_WINDOW):
+        self.keep = keep
+        self.window = window
+        self._lock = threading.Lock()
+        self._routes = {}   # route -> [(total seconds, recorded at, entry)], slowest first
+
+    def record(self, trace):
+        total = trace.elapsed()
+        route = f"{trace.method} {trace.route or '<unmatched>'}"
+        now = time.monotonic()
+        with self._lock:
+            entries = [e for e in self._routes.get(route, []) if now - e[1] < self.window]
+            if len(entries) >= self.keep and total <= entries[-1][0]:
+                if len(entries) != len(self._routes.get(route, [])):
+                    self._routes[route] = entries
+                return
+            spans = {name: round(seconds * 1000, 1) for name, seconds in trace.spans.items()}
+            spans['other'] = round(max(total - sum(trace.spans.values()), 0) * 1000, 1)
+            entry = {
+                'path': trace.path,
+                'status': trace.status,
+                'at': trace.at.isoformat(timespec='seconds'),
+                'total_ms': round(total * 1000, 1),
+                'spans_ms': spans,
+            }
+            entries.append((total, now, entry))
+            entries.sort(key=lambda e: e[0], reverse=True)
+            self._routes[route] = entries[:self.keep]
+
+    def slowest(self, route=None):
+        """Returns {route: [entries, slowest first]}, optionally for one route only."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: [e[2] for e in entries if now - e[1] < self.window]
+                for name, entries in sorted(self._routes.items())
+                if route is None or name.split(' ', 1)[1] == route
+            }
+
+
+slow_requests = SlowRequestLog()
+
+
+class TracingMiddleware:
+    """
+    WSGI middleware that opens a RequestTrace for every request and records it
+    in slow_requests once the response has been sent. Sending the body is
+    timed as the 'send' span; the body of a streamed response is produced
+    while it is sent, and its db and render time is still charged to those spans.
+    """
+
+    def __init__(self, wsgi_app, log=slow_requests):
+        self.wsgi_app = wsgi_app
+        self.log = log
+
+    def __call__(self, environ, start_response):
+        trace = RequestTrace(environ.get('REQUEST_METHOD'), environ.get('PATH_INFO'))
+        _current.set(trace)
+
+        def traced_start_response(status, headers, exc_info=None):
+            trace.status = int(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        try:
+            body = self.wsgi_app(environ, traced_start_response)
+        except BaseException:
+            self._finish(trace)
+            raise
+        return _TracedBody(body, trace, self)
+
+    def _finish(self, trace):
+        _current.set(None)
+        try:
+            self.log.record(trace)
+        except Exception as e:
+            print(f"Request tracing error: {e}")
+
+
+class _TracedBody:
+    def __init__(self, body, trace, middleware):
+        self._body = body
+        self._trace = trace
+        self._middleware = middleware
+        self._chunks = None
+
+    def __iter__(self):
+        self._chunks = self._iterate()
+        return self._chunks
+
+    def _iterate(self):
+        # The span stays open while suspended at yield, which is when the
+        # server writes the chunk to the client
+        with self._trace.span('send'):
+            yield from self._body
+
+    def close(self):
+        try:
+            if self._chunks is not None:
+                self._chunks.close()
+            if hasattr(self._body, 'close'):
+                self._body.close()
+        finally:
+            self._middleware._finish(self._trace)
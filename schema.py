@@ -0,0 +1,329 @@
+"""
+Versioned database schema for the CMS.
+
+Each migration is applied once, in order, and recorded in schema_migrations.
+Every step is idempotent (CREATE TABLE IF NOT EXISTS, indexes created only when
+missing), so a database created by hand before this module existed is brought
+up to date without touching its data. The same migrations create the embedded
+database when DB_BACKEND=sqlite (see sqlite_backend).
+
+Run at application start-up (see app.py) or from the command line:
+
+    python schema.py            apply pending migrations
+    python schema.py --status   list applied and pending migrations
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from database_connector import db_connection, DB_BACKEND, DB_ERRORS
+from id_allocator import CREATE_SEQUENCES_TABLE
+
+load_dotenv()
+
+# Seconds to wait for another process that is migrating at the same moment
+SCHEMA_LOCK_TIMEOUT = int(os.getenv("SCHEMA_LOCK_TIMEOUT", "60"))
+SCHEMA_LOCK_NAME = 'cms_schema_migrate'
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+TABLE_OPTIONS = "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+
+CREATE_TABLES = [
+    f"""
+    CREATE TABLE IF NOT EXISTS clients (
+        client_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        client_name VARCHAR(255) NOT NULL,
+        contact_person VARCHAR(255),
+        phone VARCHAR(30),
+        email VARCHAR(255),
+        address TEXT,
+        client_type VARCHAR(50)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS projects (
+        project_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        client_id VARCHAR(20),
+        project_name VARCHAR(255) NOT NULL,
+        project_location VARCHAR(255),
+        start_date DATE,
+        end_date DATE,
+        status VARCHAR(30),
+        budget DECIMAL(14, 2),
+        actual_cost DECIMAL(14, 2),
+        contract_value DECIMAL(14, 2),
+        description TEXT
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS employees (
+        employee_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        first_name VARCHAR(100) NOT NULL,
+        last_name VARCHAR(100),
+        role VARCHAR(100),
+        experience_years VARCHAR(30),
+        contact_phone VARCHAR(30),
+        email VARCHAR(255),
+        hire_date DATE,
+        salary DECIMAL(12, 2),
+        status VARCHAR(30)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS project_assignments (
+        assignment_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        project_id VARCHAR(20) NOT NULL,
+        employee_id VARCHAR(20) NOT NULL,
+        assignment_role VARCHAR(100),
+        assignment_start_date DATE,
+        assignment_end_date DATE
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS suppliers (
+        supplier_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        supplier_name VARCHAR(255),
+        contact_person VARCHAR(255),
+        phone VARCHAR(30),
+        email VARCHAR(255),
+        address TEXT,
+        supplier_type VARCHAR(50)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS invoices (
+        invoice_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        project_id VARCHAR(20),
+        client_id VARCHAR(20),
+        invoice_date DATE,
+        due_date DATE,
+        bill_amount DECIMAL(14, 2),
+        amount_due DECIMAL(14, 2) DEFAULT 0,
+        amount_paid DECIMAL(14, 2) DEFAULT 0,
+        status VARCHAR(30)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS payments (
+        payment_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        invoice_id VARCHAR(20),
+        payment_date DATETIME,
+        amount DECIMAL(14, 2),
+        payment_method VARCHAR(50),
+        transaction_id VARCHAR(100)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS services (
+        service_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        service_name VARCHAR(255),
+        unit_price DECIMAL(12, 2)
+    ) {TABLE_OPTIONS}
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS materials (
+        material_id VARCHAR(20) NOT NULL PRIMARY KEY,
+        material_name VARCHAR(255),
+        supplier_id VARCHAR(20),
+        manufacturer VARCHAR(255),
+        unit_price DECIMAL(12, 2),
+        unit_of_measure VARCHAR(30),
+        stock_quantity DECIMAL(12, 2),
+        description TEXT
+    ) {TABLE_OPTIONS}
+    """,
+    CREATE_SEQUENCES_TABLE,
+]
+
+# (table, index name, columns) for the columns queries join or filter on
+LOOKUP_INDEXES = [
+    ('projects', 'idx_projects_client', '(client_id)'),
+    ('projects', 'idx_projects_status', '(status)'),
+    ('invoices', 'idx_invoices_client', '(client_id)'),
+    ('invoices', 'idx_invoices_project', '(project_id)'),
+    # Also covers the per-invoice payment sums of the reconciliation and aging report
+    ('payments', 'idx_payments_invoice_amount', '(invoice_id, amount)'),
+    ('project_assignments', 'idx_assignments_employee', '(employee_id)'),
+    ('project_assignments', 'idx_assignments_project', '(project_id)'),
+    ('materials', 'idx_materials_supplier', '(supplier_id)'),
+    # Covering index for the receivables aging report: open invoices are found
+    # and summed from the index alone, however much paid history there is
+    ('invoices', 'idx_invoices_aging',
+     '(status, due_date, invoice_date, client_id, bill_amount, amount_due, amount_paid)'),
+]
+
+# (sort column, primary key) for each sortable column of the paginated lists,
+# so a keyset page is an index range scan instead of a sort of the whole table.
+# Leading columns also serve the equality filters on the same columns.
+SORT_INDEXES = [
+    ('clients', 'idx_clients_name_key', '(client_name, client_id)'),
+    ('clients', 'idx_clients_type_key', '(client_type, client_id)'),
+    ('projects', 'idx_projects_name_key', '(project_name, project_id)'),
+    ('projects', 'idx_projects_start_key', '(start_date, project_id)'),
+    ('projects', 'idx_projects_end_key', '(end_date, project_id)'),
+    ('projects', 'idx_projects_status_key', '(status, project_id)'),
+    ('projects', 'idx_projects_value_key', '(contract_value, project_id)'),
+    ('employees', 'idx_employees_first_key', '(first_name, employee_id)'),
+    ('employees', 'idx_employees_last_key', '(last_name, employee_id)'),
+    ('employees', 'idx_employees_role_key', '(role, employee_id)'),
+    ('employees', 'idx_employees_hired_key', '(hire_date, employee_id)'),
+    ('employees', 'idx_employees_salary_key', '(salary, employee_id)'),
+    ('employees', 'idx_employees_status_key', '(status, employee_id)'),
+    ('invoices', 'idx_invoices_date_key', '(invoice_date, invoice_id)'),
+    ('invoices', 'idx_invoices_due_key', '(due_date, invoice_id)'),
+    ('invoices', 'idx_invoices_amount_key', '(amount_due, invoice_id)'),
+    ('invoices', 'idx_invoices_status_key', '(status, invoice_id)'),
+    ('payments', 'idx_payments_date_key', '(payment_date, payment_id)'),
+    ('payments', 'idx_payments_amount_key', '(amount, payment_id)'),
+    ('materials', 'idx_materials_name_key', '(material_name, material_id)'),
+    ('materials', 'idx_materials_price_key', '(unit_price, material_id)'),
+    ('materials', 'idx_materials_stock_key', '(stock_quantity, material_id)'),
+    ('suppliers', 'idx_suppliers_name_key', '(supplier_name, supplier_id)'),
+]
+
+
+def _create_tables(cursor):
+    for statement in CREATE_TABLES:
+        cursor.execute(statement)
+
+
+if DB_BACKEND == 'sqlite':
+    INDEX_EXISTS_SQL = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND name = %s"
+else:
+    INDEX_EXISTS_SQL = (
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1"
+    )
+
+
+def _index_creator(indexes):
+    def create(cursor):
+        for table, name, columns in indexes:
+            cursor.execute(INDEX_EXISTS_SQL, (table, name))
+            if cursor.fetchone() is None:
+                cursor.execute(f"CREATE INDEX {name} ON {table} {columns}")
+                print(f"Created index {name} on {table}.")
+    return create
+
+
+# (version, description, step). Append new migrations; never edit applied ones.
+MIGRATIONS = [
+    (1, "Create tables", _create_tables),
+    (2, "Indexes on join and filter columns", _index_creator(LOOKUP_INDEXES)),
+    (3, "Composite indexes for list sort keys", _index_creator(SORT_INDEXES)),
+]
+
+
+def _applied_versions(cursor):
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _acquire_migration_lock(cursor):
+    """Waits until no other process is migrating. Returns False on timeout."""
+    if DB_BACKEND == 'sqlite':
+        # The database write lock, held until commit; waits up to the busy timeout
+        cursor.execute("BEGIN IMMEDIATE")
+        return True
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (SCHEMA_LOCK_NAME, SCHEMA_LOCK_TIMEOUT))
+    return cursor.fetchone()[0] == 1
+
+
+def _release_migration_lock(cursor):
+    if DB_BACKEND != 'sqlite':
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (SCHEMA_LOCK_NAME,))
+        cursor.fetchone()
+
+
+def migrate():
+    """
+    Applies every pending migration in order.
+    Returns (list of versions applied, "Success") or (None, error message).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None, "Database connection failed."
+
+        cursor = conn.cursor()
+        applied = []
+        try:
+            # Workers starting together would otherwise race on the same DDL
+            if not _acquire_migration_lock(cursor):
+                return None, "Timed out waiting for another schema migration."
+            try:
+                done = _applied_versions(cursor)
+                for version, description, step in MIGRATIONS:
+                    if version in done:
+                        continue
+                    step(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (version, description)
+                    )
+                    # SQLite DDL is transactional: everything commits at once below,
+                    # since committing would also give up the lock
+                    if DB_BACKEND != 'sqlite':
+                        conn.commit()
+                    applied.append(version)
+                    print(f"Applied schema migration {version}: {description}")
+                conn.commit()
+            finally:
+                _release_migration_lock(cursor)
+            return applied, "Success"
+        except DB_ERRORS as err:
+            conn.rollback()
+            print(f"Schema migration failed: {err}")
+            return None, f"Database Error: {err}"
+        finally:
+            cursor.close()
+
+
+def migration_status():
+    """Returns ([(version, description, applied?)], "Success") or (None, error message)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None, "Database connection failed."
+
+        cursor = conn.cursor()
+        try:
+            done = _applied_versions(cursor)
+            return [(version, description, version in done) for version, description, _ in MIGRATIONS], "Success"
+        except DB_ERRORS as err:
+            return None, f"Database Error: {err}"
+        finally:
+            cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the CMS database schema.")
+    parser.add_argument('--status', action='store_true', help="list migrations without applying any")
+    args = parser.parse_args()
+
+    if args.status:
+        status, message = migration_status()
+        if status is None:
+            print(message)
+            return 1
+        for version, description, applied in status:
+            print(f"{version:>4}  {'applied' if applied else 'pending':<8} {description}")
+        return 0
+
+    applied, message = migrate()
+    if applied is None:
+        print(message)
+        return 1
+    print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,188 @@
+import re
+import sqlite3
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# The application's SQL is written for MySQL. This module runs it on SQLite:
+# statements are rewritten on the fly (see translate_sql) and the MySQL
+# functions it calls are registered on every connection.
+
+_PARAM = re.compile(r"%s")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_UNSIGNED_CAST = re.compile(r"\bAS\s+(UN)?SIGNED\b", re.IGNORECASE)
+_GROUP_CONCAT = re.compile(r"GROUP_CONCAT\((.*?)\s+SEPARATOR\s+('[^']*')\)", re.IGNORECASE | re.DOTALL)
+_LIKE_PARAM = re.compile(r"\bLIKE\s+\?", re.IGNORECASE)
+_AUTO_INCREMENT = re.compile(r"\bINT\s+NOT\s+NULL\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_TABLE_OPTIONS = re.compile(r"\)\s*ENGINE=\w+(\s+DEFAULT\s+CHARSET=\w+)?", re.IGNORECASE)
+_UNSIGNED_TYPE = re.compile(r"\s+UNSIGNED\b", re.IGNORECASE)
+_EXPLAIN = re.compile(r"^\s*EXPLAIN\s+(?!QUERY\s+PLAN\b)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def translate_sql(sql, with_params):
+    """
+    Rewrites the MySQL constructs the application uses into their SQLite form.
+    Returns (statement, locks): `locks` is True for SELECT ... FOR UPDATE.
+    """
+    if with_params:
+        sql = _PARAM.sub('?', sql).replace('%%', '%')
+        # MySQL's LIKE escapes with a backslash by default; SQLite has no default
+        sql = _LIKE_PARAM.sub(r"LIKE ? ESCAPE '\\'", sql)
+    locks = _FOR_UPDATE.search(sql) is not None
+    sql = _FOR_UPDATE.sub('', sql)
+    sql = _INSERT_IGNORE.sub('INSERT OR IGNORE', sql)
+    sql = _UNSIGNED_CAST.sub('AS INTEGER', sql)
+    sql = _GROUP_CONCAT.sub(r"GROUP_CONCAT(\1, \2)", sql)
+    sql = _AUTO_INCREMENT.sub('INTEGER PRIMARY KEY AUTOINCREMENT', sql)
+    sql = _TABLE_OPTIONS.sub(')', sql)
+    sql = _UNSIGNED_TYPE.sub('', sql)
+    sql = _EXPLAIN.sub('EXPLAIN QUERY PLAN ', sql)
+    return sql, locks
+
+
+def _as_date(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _datediff(a, b):
+    a, b = _as_date(a), _as_date(b)
+    return None if a is None or b is None else (a - b).days
+
+
+def _greatest(*values):
+    return None if any(v is None for v in values) else max(values)
+
+
+def _least(*values):
+    return None if any(v is None for v in values) else min(values)
+
+
+def _concat(*values):
+    return None if any(v is None for v in values) else ''.join(str(v) for v in values)
+
+
+# Values go in and come out with the types mysql.connector uses
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=' '))
+sqlite3.register_converter('DATE', lambda b: date.fromisoformat(b.decode()[:10]))
+sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter('DECIMAL', lambda b: Decimal(b.decode()))
+
+
+class SqliteCursor:
+    """DB-API cursor with the mysql.connector behaviour the application relies on."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=None):
+        statement, locks = translate_sql(sql, params is not None)
+        if locks and not self._conn.in_transaction:
+            # No row locks in SQLite: take the database write lock up front,
+            # which serialises writers the way FOR UPDATE does
+            self._cursor.execute("BEGIN IMMEDIATE")
+        self._cursor.execute(statement, params or ())
+
+    def executemany(self, sql, seq_params):
+        self._cursor.executemany(translate_sql(sql, True)[0], seq_params)
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((c[0] for c in self._cursor.description), row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """
+    Connection to a SQLite database file in WAL mode, with the interface of a
+    mysql.connector connection: cursor(dictionary=True), commit(), rollback(),
+    ping(). The MySQL functions the application calls (DATEDIFF, GREATEST,
+    LAST_INSERT_ID(expr), ...) are provided as SQL functions.
+    """
+
+    def __init__(self, path, timeout=30):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                     check_same_thread=False, timeout=timeout)
+        # WAL lets readers run while a write is in progress
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._last_insert_id = 0
+
+        def last_insert_id(*value):
+            if value:
+                self._last_insert_id = value[0]
+            return self._last_insert_id
+
+        self._conn.create_function('LAST_INSERT_ID', -1, last_insert_id)
+        self._conn.create_function('DATEDIFF', 2, _datediff, deterministic=True)
+        self._conn.create_function('GREATEST', -1, _greatest, deterministic=True)
+        self._conn.create_function('LEAST', -1, _least, deterministic=True)
+        self._conn.create_function('CONCAT', -1, _concat, deterministic=True)
+        self._conn.create_function('NOW', 0, lambda: datetime.now().isoformat(sep=' ', timespec='seconds'))
+        self._conn.create_function('CURDATE', 0, lambda: date.today().isoformat())
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SqliteCursor(self._conn, dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, *args, **kwargs):
+        self._conn.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
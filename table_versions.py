@@ -0,0 +1,68 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory holding one version file per table. Every worker process of the
+# application must use the same directory so they all see each other's writes.
+TABLE_VERSIONS_DIR = os.getenv("TABLE_VERSIONS_DIR", os.path.join(tempfile.gettempdir(), "cms_table_versions"))
+
+
+class TableVersions:
+    """
+    Per-table version counters shared by every process through small files.
+
+    bump() appends one byte to the table's file, an atomic operation for
+    concurrent writers, so the file's size counts the writes made through the
+    application. Reading a version is a single stat() call with no database
+    round trip. Together with the file's identity and modification time, the
+    size yields a token that changes on every write, including after the file
+    was removed and created again.
+    """
+
+    def __init__(self, directory=TABLE_VERSIONS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, table):
+        return os.path.join(self.directory, f"{table}.version")
+
+    def bump(self, *tables):
+        """Marks the tables as changed; call after the write has committed."""
+        for table in tables:
+            fd = os.open(self._path(table), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                os.write(fd, b'.')
+            finally:
+                os.close(fd)
+
+    def _stat(self, table):
+        try:
+            return os.stat(self._path(table))
+        except FileNotFoundError:
+            # Never seen (or cleaned up): start a fresh version
+            self.bump(table)
+            return os.stat(self._path(table))
+
+    def current(self, tables):
+        """
+        Returns (token, last_modified) for the given tables: an opaque string that
+        changes whenever any of them is written, and the time of the latest write
+        as an aware datetime truncated to whole seconds.
+        """
+        parts = []
+        latest = 0
+        for table in tables:
+            st = self._stat(table)
+            parts.append(f"{table}:{st.st_ino}:{st.st_mtime_ns}:{st.st_size}")
+            latest = max(latest, st.st_mtime_ns)
+        token = hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+        last_modified = datetime.fromtimestamp(latest // 1_000_000_000, tz=timezone.utc)
+        return token, last_modified
+
+
+table_versions = TableVersions()
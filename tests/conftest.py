@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The modules read their settings at import time, so the environment is set
+# before any of them is imported: every test runs on a scratch SQLite database
+# with its own table versions, PDF cache and job directories.
+_TMP = tempfile.mkdtemp(prefix="cms_tests_")
+os.environ.update({
+    "DB_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(_TMP, "cms.db"),
+    "TABLE_VERSIONS_DIR": os.path.join(_TMP, "table_versions"),
+    "PDF_CACHE_DIR": os.path.join(_TMP, "pdf_cache"),
+    "PDF_JOB_DIR": os.path.join(_TMP, "pdf_jobs"),
+    "DASHBOARD_RECONCILE_INTERVAL": "0",
+    "SLOW_QUERY_SECONDS": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_connector import db_connection  # noqa: E402
+from schema import migrate  # noqa: E402
+from table_versions import table_versions  # noqa: E402
+
+DATA_TABLES = ('project_assignments', 'payments', 'invoices', 'materials', 'services',
+               'suppliers', 'employees', 'projects', 'clients')
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    versions, message = migrate()
+    assert versions is not None, message
+
+
+@pytest.fixture
+def db():
+    """Empties the data tables before the test and returns a helper for raw SQL."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        for table in DATA_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        conn.commit()
+        cursor.close()
+    table_versions.bump(*DATA_TABLES)
+    return execute
+
+
+def execute(sql, params=None, many=False):
+    """Runs one statement in its own transaction; returns the rows of a SELECT."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            rows = cursor.fetchall() if cursor.description else None
+            conn.commit()
+            return rows
+        finally:
+            cursor.close()
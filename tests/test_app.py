@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from app import app
+from table_versions import table_versions
+
+
+@pytest.fixture
+def client(db):
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['logged_in'] = True
+        yield client
+
+
+def test_list_response_carries_validators(client):
+    response = client.get('/api/clients')
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('W/"')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_matching_etag_gets_304(client):
+    etag = client.get('/api/clients').headers['ETag']
+    response = client.get('/api/clients', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_write_changes_the_etag(client):
+    etag = client.get('/api/clients').headers['ETag']
+    response = client.post('/api/addClient', json={'client_name': 'Kirdak Constructions'})
+    assert response.status_code in (200, 201)
+
+    response = client.get('/api/clients', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [row['client_name'] for row in response.get_json()['clients']] == ['Kirdak Constructions']
+
+
+def test_write_to_another_table_keeps_the_etag(client):
+    etag = client.get('/api/clients').headers['ETag']
+    table_versions.bump('projects')
+    assert client.get('/api/clients', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_depends_on_the_query_string(client):
+    first = client.get('/api/clients?limit=1').headers['ETag']
+    second = client.get('/api/clients?limit=2').headers['ETag']
+    assert first != second
+    assert client.get('/api/clients?limit=2', headers={'If-None-Match': first}).status_code == 200
+
+
+def test_anonymous_request_is_never_304(db):
+    with app.test_client() as anonymous:
+        etag = anonymous.get('/api/clients').headers.get('ETag')
+        response = anonymous.get('/api/clients', headers={'If-None-Match': etag or '*'})
+        assert response.status_code == 302
+
+
+def test_invalid_list_arguments_get_400(client):
+    assert client.get('/api/clients?sort=phone').status_code == 400
+    assert client.get('/api/clients?limit=-1').status_code == 400
+    assert client.get('/api/clients?cursor=bogus').status_code == 400
+    # Unknown parameters, such as a cache-buster, are ignored
+    assert client.get('/api/clients?_=123').status_code == 200
+
+
+def test_invoice_details_use_iso_dates_and_decimal_strings(client, db):
+    db("INSERT INTO invoices (invoice_id, invoice_date, due_date, bill_amount, amount_due, amount_paid) "
+       "VALUES ('INV_001', '2026-01-01', '2026-01-31', 500, 590, 0)")
+    invoice = client.get('/api/invoices/INV_001').get_json()
+    assert (invoice['invoice_date'], invoice['due_date']) == ('2026-01-01', '2026-01-31')
+    assert (invoice['bill_amount'], invoice['financials']['total']) == ('500.00', '590.00')
+
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson'])
+def test_streamed_invoices_carry_financials(client, db, fmt):
+    db("INSERT INTO invoices (invoice_id, invoice_date, due_date, bill_amount, amount_due, amount_paid) "
+       "VALUES ('INV_001', '2026-01-01', '2026-01-31', 500, 590, 0)")
+    paged = client.get('/api/invoices').get_json()['invoices']
+    body = client.get(f'/api/invoices?stream={fmt}').get_data(as_text=True)
+    streamed = json.loads(body)['invoices'] if fmt == 'json' else [json.loads(line) for line in body.splitlines()]
+    assert [row['financials'] for row in streamed] == [row['financials'] for row in paged]
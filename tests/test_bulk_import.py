@@ -0,0 +1,51 @@
+import logic_handler
+
+
+class NoConnection:
+    """Stands in for db_connection() when the database is unreachable."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_rejected_rows_do_not_use_up_ids(db):
+    result = logic_handler.bulk_import('employees', [
+        {'first_name': 'Ravi', 'salary': '30000'},
+        {'first_name': 'Suresh', 'salary': 'thirty thousand'},
+        {'first_name': 'Anita', 'hire_date': '2026-01-01'},
+    ])
+    assert (result['inserted'], result['failed']) == (2, 1)
+    assert result['errors'] == [{'row': 2, 'message': "salary must be a number."}]
+    ids = [employee_id for employee_id, in db("SELECT employee_id FROM employees ORDER BY employee_id")]
+    # Consecutive IDs: the invalid row in between did not consume one
+    first = int(ids[0].split('_')[1])
+    assert ids == [f"E_{first:03d}", f"E_{first + 1:03d}"]
+
+
+def test_connection_failure_keeps_validation_errors(db, monkeypatch):
+    monkeypatch.setattr(logic_handler, 'db_connection', lambda: NoConnection())
+    result = logic_handler.bulk_import('clients', [{'client_name': ''}, {'client_name': 'Patil Builders'}])
+    assert (result['inserted'], result['failed']) == (0, 2)
+    assert result['errors'] == [
+        {'row': 1, 'message': "Missing required field(s): client_name"},
+        {'row': None, 'message': 'Database connection failed.'},
+    ]
+
+
+def test_rows_after_a_lost_connection_get_no_ids(db, monkeypatch):
+    connections = iter([logic_handler.db_connection(), NoConnection()])
+    monkeypatch.setattr(logic_handler, 'db_connection', lambda: next(connections))
+    allocated = []
+    generate_new_id = logic_handler.generate_new_id
+    monkeypatch.setattr(logic_handler, 'generate_new_id',
+                        lambda *args: allocated.append(generate_new_id(*args)) or allocated[-1])
+
+    result = logic_handler.bulk_import('employees', [{'first_name': name} for name in ('A', 'B', 'C', 'D', 'E')],
+                                       chunk_size=2)
+    assert (result['inserted'], result['failed']) == (2, 3)
+    assert result['errors'] == [{'row': None, 'message': 'Database connection failed.'}]
+    # The first chunk was inserted, the second lost its connection, the third was never allocated
+    assert len(allocated) == 4
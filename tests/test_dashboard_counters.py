@@ -0,0 +1,20 @@
+import logic_handler
+
+
+def test_dashboard_counts_are_recomputed_after_a_write(db):
+    assert logic_handler.get_dashboard_counts()['clients'] == 0
+    assert logic_handler.get_dashboard_counter_status()['current']
+
+    ok, message = logic_handler.add_new_client({'client_name': 'Gharat Constructions'})
+    assert ok, message
+    assert not logic_handler.get_dashboard_counter_status()['current']
+    assert logic_handler.get_dashboard_counts()['clients'] == 1
+
+
+def test_reconcile_reports_drift_from_direct_edits(db):
+    assert logic_handler.get_dashboard_counts()['clients'] == 0
+    # A direct edit does not bump a table version, so the stale value is still served
+    db("INSERT INTO clients (client_id, client_name) VALUES ('C_900', 'Direct Edit')")
+    assert logic_handler.get_dashboard_counts()['clients'] == 0
+    assert logic_handler.reconcile_dashboard_counters() == {'clients': (0, 1)}
+    assert logic_handler.get_dashboard_counts()['clients'] == 1
@@ -0,0 +1,77 @@
+import gc
+
+import logic_handler
+from database_connector import ConnectionPool, get_pool_stats
+
+
+def small_pool(**settings):
+    settings.setdefault('pool_size', 1)
+    settings.setdefault('max_overflow', 0)
+    settings.setdefault('timeout', 0.05)
+    return ConnectionPool(**settings)
+
+
+def test_released_connection_is_reused():
+    pool = small_pool()
+    conn = pool.acquire()
+    assert pool.stats()['active'] == 1
+    conn.close()
+    conn.close()   # a second close() must not release it twice
+    assert pool.stats()['idle'] == 1
+
+    with pool.acquire() as conn:
+        assert conn is not None
+    stats = pool.stats()
+    assert (stats['connects'], stats['checkouts'], stats['active'], stats['idle']) == (1, 2, 0, 1)
+
+
+def test_checkout_times_out_when_pool_is_exhausted():
+    pool = small_pool()
+    held = pool.acquire()
+    assert pool.acquire() is None
+    assert pool.stats()['timeouts'] == 1
+    held.close()
+    assert pool.acquire() is not None
+
+
+def test_overflow_connections_are_closed_on_release():
+    pool = small_pool(max_overflow=1)
+    first, second = pool.acquire(), pool.acquire()
+    assert pool.stats()['open'] == 2
+    first.close()
+    second.close()
+    assert (pool.stats()['open'], pool.stats()['idle']) == (1, 1)
+
+
+def test_open_transaction_is_rolled_back_on_release(db):
+    pool = small_pool()
+    conn = pool.acquire()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO clients (client_id, client_name) VALUES (%s, %s)", ('C_900', 'Uncommitted'))
+    cursor.close()
+    conn.close()
+    assert db("SELECT client_id FROM clients WHERE client_id = 'C_900'") == []
+
+
+def test_unclosed_connection_is_reclaimed(capsys):
+    pool = small_pool()
+    conn = pool.acquire()
+    del conn
+    gc.collect()
+    stats = pool.stats()
+    assert (stats['reclaimed'], stats['active'], stats['idle']) == (1, 0, 1)
+    assert "never closed" in capsys.readouterr().out
+    assert pool.acquire() is not None
+
+
+def test_add_new_client_early_return_does_not_leak(db):
+    before = get_pool_stats()['active']
+    for _ in range(20):
+        ok, message = logic_handler.add_new_client({})
+        assert not ok and message == "Client Name is a required field."
+    assert get_pool_stats()['active'] == before
+
+    ok, _ = logic_handler.add_new_client({'client_name': 'Gharat Constructions'})
+    assert ok
+    assert get_pool_stats()['active'] == before
+    assert db("SELECT client_name FROM clients") == [('Gharat Constructions',)]
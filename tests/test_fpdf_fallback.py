@@ -0,0 +1,49 @@
+import re
+
+import pytest
+
+import logic_handler
+import pdf_assets
+
+
+def page_count(pdf):
+    return int(re.search(rb'/Count (\d+)', pdf).group(1))
+
+
+@pytest.fixture
+def master_data(db):
+    db("INSERT INTO clients (client_id, client_name) VALUES (%s, %s)",
+       [(f"C_{n:03d}", f"Client {n}") for n in range(1, 121)], many=True)
+    db("INSERT INTO employees (employee_id, first_name, last_name) VALUES ('E_001', 'Ravi', 'Patil')")
+
+
+def test_master_report_without_splicing(master_data, monkeypatch):
+    spliced = logic_handler.generate_master_pdf_report()
+    monkeypatch.setattr(logic_handler, 'FAST_PATH', False)
+    plain = logic_handler.generate_master_pdf_report()
+    assert plain.startswith(b'%PDF')
+    assert page_count(plain) == page_count(spliced) > 3
+
+
+def test_invoice_logo_without_shared_images(db, monkeypatch):
+    monkeypatch.setattr(pdf_assets, 'FAST_PATH', False)
+    registry = pdf_assets.ImageRegistry()
+    monkeypatch.setattr(logic_handler, 'images', registry)
+    invoice = {'invoice_id': 'INV_001', 'client_id': 'C_001', 'invoice_date': '2026-01-01',
+               'due_date': '2026-01-31', 'bill_amount': 500, 'amount_due': 590, 'amount_paid': 0}
+    pdf = logic_handler.generate_invoice_pdf.__wrapped__(invoice)   # bypass the PDF cache
+    assert b'/Subtype /Image' in pdf
+    # The document parsed the logo itself; nothing was shared through the registry
+    assert registry.loads == 0
+    assert registry.preload() == []
+
+
+def test_invoice_batch_without_splicing(db, monkeypatch):
+    invoices = [{'invoice_id': f"INV_{n:03d}", 'client_id': 'C_001', 'invoice_date': '2026-01-01',
+                 'due_date': '2026-01-31', 'bill_amount': 500 + n, 'amount_due': 590, 'amount_paid': 0}
+                for n in range(1, 4)]
+    merged = b''.join(logic_handler.stream_invoice_batch_pdf(invoices))
+    monkeypatch.setattr(logic_handler, 'FAST_PATH', False)
+    plain = b''.join(logic_handler.stream_invoice_batch_pdf(invoices))
+    assert plain.startswith(b'%PDF')
+    assert page_count(plain) == page_count(merged) == 3
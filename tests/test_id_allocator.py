@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import logic_handler
+from database_connector import init_pool, get_pool_stats
+from id_allocator import IdAllocator
+
+
+def allocate_concurrently(allocators, prefix, calls=160, threads=16):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(allocators[i % len(allocators)].allocate, prefix, 'clients', 'client_id')
+                   for i in range(calls)]
+        return [future.result() for future in futures]
+
+
+@pytest.mark.parametrize('block_size', [1, 3, 20])
+def test_concurrent_allocations_are_unique(db, block_size):
+    prefix = f"T{block_size}"
+    ids = allocate_concurrently([IdAllocator(block_size)], prefix)
+    assert None not in ids
+    assert sorted(ids) == [f"{prefix}_{n:03d}" for n in range(1, 161)]
+
+
+def test_allocators_in_separate_processes_share_the_sequence(db):
+    # One allocator per worker process, all reserving from the same id_sequences row
+    ids = allocate_concurrently([IdAllocator(block_size) for block_size in (1, 2, 5, 7)], 'TS')
+    assert None not in ids
+    assert len(set(ids)) == len(ids)
+
+
+def test_sequence_starts_after_existing_ids(db):
+    db("INSERT INTO clients (client_id, client_name) VALUES (%s, %s)",
+       [('TE_004', 'Existing'), ('TE_017', 'Existing')], many=True)
+    assert IdAllocator(5).allocate('TE', 'clients', 'client_id') == 'TE_018'
+
+
+@pytest.fixture
+def tiny_pool():
+    # One pooled connection plus one overflow, so an insert that held its
+    # connection while reserving IDs would wait on itself
+    init_pool(pool_size=1, max_overflow=1, timeout=5)
+    yield
+    init_pool()
+
+
+def test_concurrent_inserts_do_not_exhaust_the_pool(db, tiny_pool, monkeypatch):
+    monkeypatch.setattr(logic_handler, 'allocator', IdAllocator(block_size=1))
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(
+            lambda i: logic_handler.add_new_project({'project_name': f"Site {i}"}), range(16)))
+    assert all(ok for ok, _ in results), results
+    assert get_pool_stats()['timeouts'] == 0
+    assert len(db("SELECT project_id FROM projects")) == 16
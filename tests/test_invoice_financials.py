@@ -0,0 +1,26 @@
+from datetime import date
+from decimal import Decimal
+
+import invoice_financials
+from invoice_financials import compute_financials, json_value
+
+
+def test_total_is_net_plus_tax():
+    figures = compute_financials('1234.50', '100')
+    assert figures['cgst'] == figures['sgst'] == Decimal('111.11')
+    assert figures['total'] == Decimal('1456.72')
+    assert figures['round_off'] == Decimal('0.00')
+    assert figures['balance_due'] == Decimal('1356.72')
+
+
+def test_rounding_to_the_rupee_is_opt_in(monkeypatch):
+    monkeypatch.setattr(invoice_financials, 'ROUND_TO_RUPEE', True)
+    figures = compute_financials('1234.50')
+    assert figures['total'] == Decimal('1457.00')
+    assert figures['round_off'] == Decimal('0.28')
+
+
+def test_json_value():
+    assert json_value({'due_date': date(2026, 1, 31), 'amount': Decimal('1000'), 'rate': Decimal('0.09'),
+                       'nested': {'tax': Decimal('12.345')}, 'status': 'Paid'}) == \
+        {'due_date': '2026-01-31', 'amount': '1000.00', 'rate': '0.09', 'nested': {'tax': '12.345'}, 'status': 'Paid'}
@@ -0,0 +1,71 @@
+from datetime import date
+
+import pytest
+
+from logic_handler import get_records_page
+
+# 30 projects: every third has no end date, the rest share five end dates
+END_DATES = [None if i % 3 == 0 else date(2026, 1 + i % 5, 1) for i in range(30)]
+
+
+@pytest.fixture
+def projects(db):
+    db("INSERT INTO projects (project_id, project_name, end_date) VALUES (%s, %s, %s)",
+       [(f"P_{i:03d}", f"Project {i}", end) for i, end in enumerate(END_DATES)], many=True)
+    return {f"P_{i:03d}": end for i, end in enumerate(END_DATES)}
+
+
+def expected_order(projects, sort):
+    column_descending = sort.startswith('-')
+    if sort.lstrip('-') == 'project_id':
+        return sorted(projects, reverse=column_descending)
+    # NULLs sort first ascending and last descending; the key breaks ties in the same direction
+    return sorted(projects, key=lambda key: (projects[key] is not None, projects[key] or date.min, key),
+                  reverse=column_descending)
+
+
+def walk(sort, limit):
+    ids, page_cursor = [], None
+    while True:
+        page = get_records_page('projects', limit=limit, page_cursor=page_cursor, sort=sort)
+        assert 'error' not in page, page
+        assert len(page['projects']) <= limit
+        ids += [row['project_id'] for row in page['projects']]
+        page_cursor = page['next_cursor']
+        if page_cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('sort', ['end_date', '-end_date', 'project_id', '-project_id'])
+@pytest.mark.parametrize('limit', [1, 2, 3, 7, 50])
+def test_pages_cover_every_row_once_in_order(projects, sort, limit):
+    assert walk(sort, limit) == expected_order(projects, sort)
+
+
+def test_filter_applies_to_every_page(db):
+    db("INSERT INTO projects (project_id, project_name, status) VALUES (%s, %s, %s)",
+       [(f"P_{i:03d}", f"Project {i}", 'Working' if i % 2 else 'Pending') for i in range(10)], many=True)
+    page = get_records_page('projects', limit=2, filters={'status': 'Working'})
+    ids = [row['project_id'] for row in page['projects']]
+    page = get_records_page('projects', limit=10, page_cursor=page['next_cursor'], filters={'status': 'Working'})
+    ids += [row['project_id'] for row in page['projects']]
+    assert ids == ['P_001', 'P_003', 'P_005', 'P_007', 'P_009']
+    assert page['next_cursor'] is None
+
+
+@pytest.mark.parametrize('arguments', [
+    {'limit': 0},
+    {'limit': 'ten'},
+    {'sort': 'budget'},
+    {'filters': {'budget': '1'}},
+    {'page_cursor': 'not-a-cursor'},
+])
+def test_invalid_arguments_are_flagged(db, arguments):
+    result = get_records_page('projects', **arguments)
+    assert result['invalid'] is True and result['error']
+
+
+def test_cursor_must_match_the_sort(projects):
+    page = get_records_page('projects', limit=2, sort='end_date')
+    result = get_records_page('projects', limit=2, sort='-end_date', page_cursor=page['next_cursor'])
+    assert result['invalid'] is True
@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+import logic_handler
+from invoice_financials import compute_financials
+
+
+@pytest.fixture
+def invoice(db):
+    """An invoice with a net amount of 500 (total 590 with tax) and a larger amount_due."""
+    db("INSERT INTO clients (client_id, client_name) VALUES ('C_001', 'Gharat Constructions')")
+    ok, message = logic_handler.generate_new_invoice({
+        'invoice_id': 'INV_001', 'client_id': 'C_001', 'invoice_date': '2026-01-01',
+        'due_date': '2026-01-31', 'bill_amount': '500', 'amount_due': '1000',
+        'amount_paid': '0', 'status': 'Unpaid',
+    })
+    assert ok, message
+    assert compute_financials(500, 0)['total'] == Decimal('590.00')
+    return 'INV_001'
+
+
+def invoice_state(db, invoice_id='INV_001'):
+    (paid, status), = db("SELECT amount_paid, status FROM invoices WHERE invoice_id = %s", (invoice_id,))
+    return Decimal(paid), status
+
+
+def pay(invoice_id, amount):
+    ok, message = logic_handler.record_new_payment({
+        'invoice_id': invoice_id, 'amount': amount, 'payment_date': '2026-02-01', 'payment_method': 'UPI',
+    })
+    assert ok, message
+
+
+def test_payments_update_paid_amount_and_status(db, invoice):
+    pay(invoice, '200')
+    assert invoice_state(db) == (Decimal('200'), 'Partially Paid')
+    # Paid once the total printed on the invoice is covered, not amount_due
+    pay(invoice, '390')
+    assert invoice_state(db) == (Decimal('590'), 'Paid')
+
+
+def test_deleting_a_payment_re_reconciles(db, invoice):
+    pay(invoice, '590')
+    (payment_id,), = db("SELECT payment_id FROM payments")
+    assert logic_handler.delete_payment(payment_id) == (True, "Payment deleted successfully!")
+    assert invoice_state(db) == (Decimal('0'), 'Unpaid')
+    assert logic_handler.delete_payment(payment_id) == (False, "Payment not found.")
+
+
+def test_concurrent_payments_are_all_counted(db, invoice):
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: pay(invoice, '10'), range(20)))
+    assert invoice_state(db) == (Decimal('200'), 'Partially Paid')
+
+
+def test_reconcile_all_matches_single_invoice_reconciliation(db, invoice):
+    pay(invoice, '200')
+    single = invoice_state(db)
+    # Payments changed behind the application's back, and a stale amount_paid
+    # on an invoice without payments
+    db("UPDATE invoices SET amount_paid = 0, status = 'Unpaid' WHERE invoice_id = 'INV_001'")
+    db("INSERT INTO invoices (invoice_id, client_id, amount_due, amount_paid, status) "
+       "VALUES ('INV_002', 'C_001', 100, 50, 'Partially Paid')")
+
+    changed, message = logic_handler.reconcile_all_invoices()
+    assert message == "Success" and changed == 2
+    assert invoice_state(db) == single
+    # Never lowered below the stored amount; amount_due is the gross total here
+    assert invoice_state(db, 'INV_002') == (Decimal('50'), 'Partially Paid')
+
+
+@pytest.fixture
+def gross_invoice(db):
+    """An invoice recorded by its gross amount only, already paid in full (and more)."""
+    ok, message = logic_handler.generate_new_invoice({
+        'invoice_id': 'INV_100', 'invoice_date': '2026-01-01', 'due_date': '2026-01-31',
+        'amount_due': '1000', 'amount_paid': '1180', 'status': 'Paid',
+    })
+    assert ok, message
+    return 'INV_100'
+
+
+def test_payment_never_lowers_the_stored_amount_paid(db, gross_invoice):
+    pay(gross_invoice, '10')
+    assert invoice_state(db, gross_invoice) == (Decimal('1180'), 'Paid')
+    (payment_id,), = db("SELECT payment_id FROM payments")
+    assert logic_handler.delete_payment(payment_id)[0]
+    assert invoice_state(db, gross_invoice) == (Decimal('1180'), 'Paid')
+    logic_handler.reconcile_all_invoices()
+    assert invoice_state(db, gross_invoice) == (Decimal('1180'), 'Paid')
+
+
+def test_seed_invoices_keep_their_status(db):
+    for seed in ('invoices', 'payments'):
+        ok, message = getattr(logic_handler, f"add_existing_{seed}")()
+        assert ok, message
+    before = db("SELECT invoice_id, amount_paid, status FROM invoices ORDER BY invoice_id")
+    logic_handler.reconcile_all_invoices()
+    assert db("SELECT invoice_id, amount_paid, status FROM invoices ORDER BY invoice_id") == before
+
+
+def test_aging_uses_the_net_amount(db, invoice):
+    pay(invoice, '90')
+    report, message = logic_handler.get_ar_aging(as_of='2026-02-15')
+    assert message == "Success"
+    (row,) = report['clients']
+    assert row['client_id'] == 'C_001'
+    assert row['days_1_30'] == row['total'] == Decimal('500.00')
+
+
+def test_aging_balance_is_the_same_before_and_after_reconciling(db, invoice, gross_invoice):
+    db("UPDATE invoices SET status = 'Partially Paid'")
+    db("INSERT INTO payments (payment_id, invoice_id, amount) VALUES ('PY_900', 'INV_001', 100)")
+    before, _ = logic_handler.get_ar_aging(as_of='2026-02-15')
+    logic_handler.reconcile_all_invoices()
+    after, _ = logic_handler.get_ar_aging(as_of='2026-02-15')
+    # INV_001: 590 - 100 outstanding; INV_100: its gross 1000 is paid, nothing is added on top
+    assert before['totals']['total'] == after['totals']['total'] == Decimal('490.00')
+
+
+def test_aging_of_paid_seed_invoices_is_empty(db):
+    for seed in ('invoices', 'payments'):
+        assert getattr(logic_handler, f"add_existing_{seed}")()[0]
+    db("UPDATE invoices SET status = NULL")
+    report, _ = logic_handler.get_ar_aging(as_of='2026-12-31')
+    paid = db("SELECT client_id FROM invoices WHERE amount_paid >= amount_due")
+    assert not {row['client_id'] for row in report['clients']} & {client_id for client_id, in paid}
@@ -0,0 +1,37 @@
+from pdf_cache import cached_pdf, pdf_cache
+from table_versions import table_versions
+
+
+def counting_report(name, **kwargs):
+    calls = []
+
+    @cached_pdf(name, **kwargs)
+    def generate(data):
+        calls.append(data)
+        return f"pdf {len(calls)}".encode()
+
+    return generate, calls
+
+
+def test_cached_pdf_is_keyed_on_the_row():
+    generate, calls = counting_report('test-row')
+    row = {'client_id': 'C_001', 'client_name': 'Gharat Constructions'}
+    first = generate(row)
+    # Writes elsewhere in the table do not retire the copy of an unchanged row
+    table_versions.bump('clients', 'invoices')
+    assert generate(dict(row)) == first
+    assert len(calls) == 1
+    assert generate({**row, 'client_name': 'Gharat & Sons'}) != first
+    assert len(calls) == 2
+
+
+def test_extra_key_is_part_of_the_key():
+    day = ['2026-01-01']
+    generate, calls = counting_report('test-extra', extra_key=lambda: day[0])
+    row = {'payment_id': 'PAY_001'}
+    generate(row)
+    generate(row)
+    day[0] = '2026-01-02'
+    generate(row)
+    assert len(calls) == 2
+    assert pdf_cache.hits >= 1
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import pdf_jobs
+from pdf_jobs import Job, JobManager
+
+
+def fake_render(report_type, object_id=None):
+    """Stands in for render_report in the worker processes."""
+    if report_type == 'all_clients':
+        time.sleep(60)
+    return b'%PDF-1.4 test', f"{report_type}.pdf"
+
+
+def wait_for(manager, job, statuses=('done', 'failed'), timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        current = manager.get(job.id)
+        if current.status in statuses:
+            return current
+        time.sleep(0.05)
+    pytest.fail(f"job {job.report_type} still {current.status}")
+
+
+def test_timed_out_job_frees_its_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_jobs, 'render_report', fake_render)
+    monkeypatch.setitem(pdf_jobs.REPORT_TYPES, 'all_clients', (1, 1, False))
+    manager = JobManager(max_workers=1, job_dir=str(tmp_path))
+
+    stuck, _ = manager.submit('all_clients')
+    queued, _ = manager.submit('client', 'C_001')
+
+    stuck = wait_for(manager, stuck)
+    assert (stuck.status, stuck.error) == ('failed', "Timed out after 1s.")
+    # The only worker was busy with the stuck render; the job behind it still runs
+    queued = wait_for(manager, queued)
+    assert queued.status == 'done'
+    assert manager.result(queued.id) == b'%PDF-1.4 test'
+
+
+def test_jobs_of_a_stopped_process_are_failed(tmp_path):
+    manager = JobManager(job_dir=str(tmp_path), heartbeat=0.05)
+    orphan = Job('client', 'C_001', owner='stopped-process')
+    orphan.status = 'running'
+    manager.store.save(orphan)
+    assert manager.get(orphan.id).status == 'failed'
+
+    live = Job('client', 'C_002', owner=manager.owner)
+    manager.store.save(live)
+    manager.store.beat(manager.owner)
+    assert manager.get(live.id).status == 'queued'
+    # A process that stops beating loses its pending jobs too
+    time.sleep(0.25)
+    manager.store.purge(time.time() - 900)
+    assert manager.get(live.id).status == 'failed'
@@ -0,0 +1,59 @@
+import logic_handler
+
+
+class MidResultCursor:
+    """A cursor that, like mysql.connector's, refuses to close before the result is drained."""
+
+    def __init__(self):
+        self.closes = 0
+
+    def fetchmany(self, size):
+        return [{'n': 1}]
+
+    def close(self):
+        self.closes += 1
+        if self.closes == 1:
+            raise RuntimeError("Unread result found")
+
+
+class Connection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class MysqlConnection(Connection):
+    def __init__(self):
+        super().__init__()
+        self.drained = False
+
+    def consume_results(self):
+        self.drained = True
+
+
+def test_closing_mid_result_drains_mysql_connections():
+    conn, cursor = MysqlConnection(), MidResultCursor()
+    stream = logic_handler.RecordStream(conn, cursor, 10)
+    next(stream)
+    stream.close()
+    assert (conn.drained, cursor.closes, conn.closed) == (True, 2, True)
+
+
+def test_closing_mid_result_without_consume_results():
+    # SqliteConnection has no consume_results(); the connection is still returned
+    conn = Connection()
+    stream = logic_handler.RecordStream(conn, MidResultCursor(), 10)
+    next(stream)
+    stream.close()
+    assert conn.closed
+
+
+def test_sqlite_stream_can_stop_early(db):
+    db("INSERT INTO clients (client_id, client_name) VALUES (%s, %s)",
+       [(f"C_{n:03d}", f"Client {n}") for n in range(1, 6)], many=True)
+    stream, message = logic_handler.stream_all_records('clients', batch_size=2)
+    assert next(stream)['client_id'] == 'C_001'
+    stream.close()
+    assert list(stream) == []
@@ -0,0 +1,29 @@
+import pytest
+from fpdf import FPDF
+
+import report_layout
+from report_layout import Column, TableLayout
+
+LAYOUT = TableLayout([
+    Column('ID', 20, 'id'),
+    Column('Name', 40, 'name'),
+    Column('Amount', 30, 'amount', align='R'),
+])
+ROW = {'id': 'C_001', 'name': 'A client name far too long for its forty millimetre column', 'amount': '1,500.00'}
+
+
+def page_content(draw):
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font(*LAYOUT.body_font)
+    draw(pdf)
+    return pdf.pages[pdf.page]
+
+
+@pytest.mark.skipif(not report_layout.FAST_PATH, reason="fast path needs a tested fpdf version")
+def test_fast_path_matches_fpdf_cell():
+    fast = page_content(lambda pdf: pdf._out(LAYOUT._row_stream(pdf, ROW)))
+    cells = page_content(lambda pdf: LAYOUT._draw_row_cells(pdf, ROW))
+    assert fast == cells
+    # Long text is drawn in full, as FPDF.cell() does, not shortened
+    assert ROW['name'] in fast
@@ -0,0 +1,58 @@
+import pytest
+
+from sqlite_backend import translate_sql, SqliteConnection
+
+
+@pytest.mark.parametrize('sql, with_params, expected', [
+    ("SELECT * FROM clients WHERE client_id = %s", True,
+     "SELECT * FROM clients WHERE client_id = ?"),
+    ("SELECT * FROM clients WHERE client_name LIKE %s", True,
+     "SELECT * FROM clients WHERE client_name LIKE ? ESCAPE '\\'"),
+    ("SELECT DATE_FORMAT(d, '%%Y') FROM t WHERE a = %s", True,
+     "SELECT DATE_FORMAT(d, '%Y') FROM t WHERE a = ?"),
+    # Without parameters, %s and %% are literal text and stay as they are
+    ("SELECT '%s', '%%' FROM t", False, "SELECT '%s', '%%' FROM t"),
+    ("INSERT IGNORE INTO id_sequences (prefix) VALUES (%s)", True,
+     "INSERT OR IGNORE INTO id_sequences (prefix) VALUES (?)"),
+    ("SELECT CAST(x AS UNSIGNED), CAST(y AS SIGNED) FROM t", False,
+     "SELECT CAST(x AS INTEGER), CAST(y AS INTEGER) FROM t"),
+    ("SELECT GROUP_CONCAT(name SEPARATOR '; ') FROM t", False,
+     "SELECT GROUP_CONCAT(name, '; ') FROM t"),
+    ("CREATE TABLE t (id INT NOT NULL AUTO_INCREMENT PRIMARY KEY, n BIGINT UNSIGNED) "
+     "ENGINE=InnoDB DEFAULT CHARSET=utf8mb4", False,
+     "CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, n BIGINT)"),
+    ("EXPLAIN SELECT 1", False, "EXPLAIN QUERY PLAN SELECT 1"),
+    ("EXPLAIN QUERY PLAN SELECT 1", False, "EXPLAIN QUERY PLAN SELECT 1"),
+])
+def test_translate_sql(sql, with_params, expected):
+    assert translate_sql(sql, with_params) == (expected, False)
+
+
+def test_for_update_is_stripped_and_reported():
+    assert translate_sql("SELECT 1 FROM invoices WHERE invoice_id = %s FOR UPDATE", True) == \
+        ("SELECT 1 FROM invoices WHERE invoice_id = ?", True)
+
+
+def test_mysql_functions(tmp_path):
+    conn = SqliteConnection(str(tmp_path / "functions.db"))
+    cursor = conn.cursor()
+    cursor.execute("SELECT DATEDIFF('2026-03-01', '2026-02-01'), GREATEST(1, 3, 2), LEAST(1, NULL), "
+                   "CONCAT('C', '_', 1), LAST_INSERT_ID(41 + 1), LAST_INSERT_ID()")
+    assert cursor.fetchone() == (28, 3, None, 'C_1', 42, 42)
+    conn.close()
+
+
+def test_for_update_takes_the_write_lock(tmp_path):
+    path = str(tmp_path / "locks.db")
+    first, second = SqliteConnection(path), SqliteConnection(path, timeout=0.05)
+    first.cursor().execute("CREATE TABLE t (id INTEGER)")
+    first.commit()
+    first.cursor().execute("SELECT id FROM t FOR UPDATE")
+    assert first.in_transaction
+
+    cursor = second.cursor()
+    with pytest.raises(Exception, match="locked"):
+        cursor.execute("SELECT id FROM t FOR UPDATE")
+    first.rollback()
+    cursor.execute("SELECT id FROM t FOR UPDATE")
+    second.rollback()